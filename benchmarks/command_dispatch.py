@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: the cost of finding the command (and subcommand) for a message, before and after the command
+registry. It doesn't run the commands themselves.
+
+    python -m benchmarks.command_dispatch [--iterations N]
+"""
+import argparse
+import importlib
+import inspect
+import timeit
+
+from src.bot import MeshtasticBot
+from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.factory import CommandFactory, CommandRegistry
+
+MESSAGES = ["!ping", "!nodes busy", "!help tr", "!admin users", "!status", "!unknown thing"]
+
+
+def dispatch_per_message(bot, message: str):
+    """
+    As it was: import and instantiate the command for every message, and inspect the subcommand's signature
+    every time it's called (instantiating now inspects every subcommand's signature too, so this is a little
+    slower than it really was)
+    """
+    words = message.split()
+    command_info = CommandFactory.commands.get(words[0])
+    if not command_info:
+        return None
+    module_name, class_name = command_info["class"].rsplit('.', 1)
+    command = getattr(importlib.import_module(module_name), class_name)(bot, *command_info["args"])
+    if isinstance(command, AbstractCommandWithSubcommands):
+        sub_command = command.sub_commands.get(words[1] if len(words) > 1 else '')
+        if sub_command:
+            len(inspect.signature(sub_command).parameters)
+    return command
+
+
+def dispatch_with_registry(registry: CommandRegistry, message: str):
+    words = message.split()
+    command = registry.get(words[0])
+    if isinstance(command, AbstractCommandWithSubcommands):
+        name = words[1] if len(words) > 1 else ''
+        if command.sub_commands.get(name):
+            command.sub_commands.arity[name]
+    return command
+
+
+def run(iterations: int) -> dict:
+    bot = MeshtasticBot('localhost')
+    registry = bot.commands
+
+    def per_message():
+        for message in MESSAGES:
+            dispatch_per_message(bot, message)
+
+    def registered():
+        for message in MESSAGES:
+            dispatch_with_registry(registry, message)
+
+    dispatched = iterations * len(MESSAGES)
+    before = min(timeit.repeat(per_message, number=iterations, repeat=3)) / dispatched
+    after = min(timeit.repeat(registered, number=iterations, repeat=3)) / dispatched
+    return {
+        "messages": dispatched,
+        "before_us": round(before * 1e6, 2),
+        "after_us": round(after * 1e6, 2),
+        "speedup": round(before / after, 1) if after else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message command dispatch")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    result = run(args.iterations)
+    print(f"Per message, over {result['messages']} messages:")
+    print(f"  importlib + new instance + inspect.signature: {result['before_us']:.2f}us")
+    print(f"  command registry + precomputed arity:         {result['after_us']:.2f}us")
+    print(f"  {result['speedup']}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: storing the radio's whole NodeDB in SQLite when connecting, a node at a time (as each
+meshtastic.node.updated was handled) and in one transaction (as sync_nodes does).
+
+    python -m benchmarks.node_sync [--nodes N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.data_classes import MeshNode
+from src.persistence.node_db import SqliteNodeDB
+
+
+def build_nodes(count: int) -> list[MeshNode]:
+    return [
+        MeshNode.from_dict({
+            'user': {'id': f'!{i:08x}', 'longName': f'Node {i}', 'shortName': f'N{i % 10000}'},
+            'position': {'latitude': 51.5 + i / 10000, 'longitude': -0.1, 'time': 1700000000},
+            'deviceMetrics': {'batteryLevel': i % 100, 'voltage': 3.9},
+        })
+        for i in range(count)
+    ]
+
+
+def time_store(store, db_path: str, nodes: list[MeshNode]) -> float:
+    db = SqliteNodeDB(db_path)
+    start = time.perf_counter()
+    store(db, nodes)
+    return time.perf_counter() - start
+
+
+def run(count: int) -> dict:
+    nodes = build_nodes(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        before = time_store(lambda db, nodes: [db.store_node(node) for node in nodes],
+                            os.path.join(tmp, 'per_node.sqlite'), nodes)
+        after = time_store(lambda db, nodes: db.store_nodes(nodes), os.path.join(tmp, 'bulk.sqlite'), nodes)
+    return {
+        "nodes": count,
+        "before_secs": round(before, 3),
+        "after_secs": round(after, 3),
+        "speedup": round(before / after, 1) if after else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark storing a NodeDB in SQLite")
+    parser.add_argument('--nodes', type=int, default=500)
+    args = parser.parse_args()
+
+    result = run(args.nodes)
+    print(f"Storing {result['nodes']} nodes:")
+    print(f"  a node at a time:   {result['before_secs']:.3f}s")
+    print(f"  in one transaction: {result['after_secs']:.3f}s")
+    print(f"  {result['speedup']}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: the cost of finding the responder for a public message, with thousands of trigger patterns, before
+and after the triggers were indexed in a prefix trie. It doesn't run the responders themselves.
+
+    python -m benchmarks.responder_matching [--patterns N] [--iterations N]
+"""
+import argparse
+import re
+import timeit
+
+from src.bot import MeshtasticBot
+from src.responders.responder_factory import ResponderFactory, ResponderRegistry
+
+REACTION = "src.responders.message_reaction_responder.MessageReactionResponder"
+
+
+def build_responders(patterns: int) -> list[dict]:
+    """
+    One responder per keyword, each triggered (like the test responder) by the keyword alone or followed by more
+    """
+    return [
+        {
+            "class": REACTION,
+            "trigger_regex": [
+                re.compile(rf"^keyword{i}$", re.IGNORECASE),
+                re.compile(rf"^keyword{i} .*$", re.IGNORECASE),
+            ],
+            "args": ["👍"],
+        }
+        for i in range(patterns // 2)
+    ]
+
+
+def match_per_pattern(responders: list[dict], message: str, bot):
+    """
+    As it was: try every pattern of every responder in turn, then import and instantiate the responder
+    """
+    for responder_info in responders:
+        for pattern in responder_info["trigger_regex"]:
+            if pattern.match(message):
+                return ResponderFactory.create_responder(responder_info, bot)
+    return None
+
+
+def run(patterns: int, iterations: int) -> dict:
+    bot = MeshtasticBot('localhost')
+    responders = build_responders(patterns)
+    registry = ResponderRegistry(bot, responders)
+    # an early match, a late match, and (like most messages) no match at all
+    messages = ["keyword1 hello", f"keyword{len(responders) - 1}", "good morning mesh"]
+
+    def per_pattern():
+        for message in messages:
+            match_per_pattern(responders, message, bot)
+
+    def indexed():
+        for message in messages:
+            registry.match(message)
+
+    matched = iterations * len(messages)
+    before = min(timeit.repeat(per_pattern, number=iterations, repeat=3)) / matched
+    after = min(timeit.repeat(indexed, number=iterations, repeat=3)) / matched
+    return {
+        "patterns": len(responders) * 2,
+        "messages": matched,
+        "before_us": round(before * 1e6, 2),
+        "after_us": round(after * 1e6, 2),
+        "speedup": round(before / after, 1) if after else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark matching public messages to responders")
+    parser.add_argument('--patterns', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    result = run(args.patterns, args.iterations)
+    print(f"Per message, {result['patterns']} patterns, over {result['messages']} messages:")
+    print(f"  pattern by pattern + new instance: {result['before_us']:.2f}us")
+    print(f"  prefix trie:                       {result['after_us']:.2f}us")
+    print(f"  {result['speedup']}x faster")
+
+
+if __name__ == '__main__':
+    main()
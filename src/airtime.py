@@ -0,0 +1,148 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from meshtastic.protobuf import config_pb2, mesh_pb2
+
+# modem preset -> (bandwidth kHz, spreading factor, coding rate denominator), as set by the firmware
+MODEM_PRESETS = {
+    'SHORT_TURBO': (500, 7, 5),
+    'SHORT_FAST': (250, 7, 5),
+    'SHORT_SLOW': (250, 8, 5),
+    'MEDIUM_FAST': (250, 9, 5),
+    'MEDIUM_SLOW': (250, 10, 5),
+    'LONG_TURBO': (500, 11, 8),
+    'LONG_FAST': (250, 11, 5),
+    'LONG_MODERATE': (125, 11, 8),
+    'LONG_SLOW': (125, 12, 8),
+    'VERY_LONG_SLOW': (62.5, 12, 8),
+}
+DEFAULT_PRESET = 'LONG_FAST'
+PREAMBLE_SYMBOLS = 16
+# the unencrypted header in front of every packet on air: to, from, id, flags, channel hash, next hop, relay node
+MESH_HEADER_LEN = 16
+
+
+def lora_airtime(payload_bytes: int, bandwidth_khz: float, spread_factor: int, coding_rate: int,
+                 preamble_symbols: int = PREAMBLE_SYMBOLS) -> float:
+    """
+    Seconds on air for a LoRa packet (explicit header, CRC on), per the Semtech SX126x datasheet formula
+    :param coding_rate: the denominator, e.g. 5 for 4/5
+    """
+    symbol_time = (2 ** spread_factor) / (bandwidth_khz * 1000)
+    low_data_rate_optimise = 1 if symbol_time > 0.016 else 0
+    payload_symbols = 8 + max(
+        math.ceil((8 * payload_bytes - 4 * spread_factor + 28 + 16) / (4 * (spread_factor - 2 * low_data_rate_optimise)))
+        * coding_rate, 0)
+    return (preamble_symbols + 4.25 + payload_symbols) * symbol_time
+
+
+def data_payload_size(payload: bytes, reply_id: int = 0, emoji: bool = False) -> int:
+    """
+    Size of the Data protobuf a text message or reaction is sent as
+    """
+    return mesh_pb2.Data(portnum=1, payload=payload, reply_id=reply_id, emoji=int(emoji)).ByteSize()
+
+
+class AirtimeBudget:
+    """
+    Estimates how long the bot's transmissions are on air, and keeps a running total over a sliding window
+    (an hour by default) against a duty cycle limit, e.g. 10% as in the EU 868MHz band.
+
+    Airtime is estimated from the radio's LoRa settings (its modem preset, or custom bandwidth/spreading
+    factor/coding rate) once the bot is connected; until then the LONG_FAST preset is assumed.
+    """
+
+    def __init__(self, duty_cycle: float = 0.1, window: float = 3600.0, preset: str = DEFAULT_PRESET):
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.preset = preset
+        self.bandwidth_khz, self.spread_factor, self.coding_rate = MODEM_PRESETS[preset]
+        self.total_secs = 0.0
+        self.sends = 0
+        # (time sent, seconds on air), oldest first
+        self._sent: deque[tuple[float, float]] = deque()
+        self._used = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit_secs(self) -> float:
+        return self.window * self.duty_cycle
+
+    def set_lora_config(self, lora: config_pb2.Config.LoRaConfig) -> None:
+        if lora.use_preset:
+            preset = config_pb2.Config.LoRaConfig.ModemPreset.Name(lora.modem_preset)
+            if preset not in MODEM_PRESETS:
+                logging.warning(f"Unknown modem preset {preset}, estimating airtime as {DEFAULT_PRESET}")
+                preset = DEFAULT_PRESET
+            self.preset = preset
+            self.bandwidth_khz, self.spread_factor, self.coding_rate = MODEM_PRESETS[preset]
+        elif lora.bandwidth and lora.spread_factor and lora.coding_rate:
+            self.preset = 'custom'
+            self.bandwidth_khz, self.spread_factor, self.coding_rate = lora.bandwidth, lora.spread_factor, lora.coding_rate
+        logging.info(f"Estimating airtime for {self.preset} ({self.bandwidth_khz}kHz, SF{self.spread_factor}, "
+                     f"CR4/{self.coding_rate})")
+
+    def estimate(self, data_size: int) -> float:
+        """
+        Seconds on air for a packet carrying a Data protobuf of data_size bytes
+        """
+        return lora_airtime(MESH_HEADER_LEN + data_size, self.bandwidth_khz, self.spread_factor, self.coding_rate)
+
+    def estimate_packet(self, packet: mesh_pb2.MeshPacket) -> float:
+        if packet.HasField('encrypted'):
+            return self.estimate(len(packet.encrypted))
+        return self.estimate(packet.decoded.ByteSize())
+
+    def _expire(self, now: float) -> None:
+        while self._sent and self._sent[0][0] <= now - self.window:
+            self._used -= self._sent.popleft()[1]
+
+    def record(self, airtime: float, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._sent.append((now, airtime))
+            self._used += airtime
+            self.total_secs += airtime
+            self.sends += 1
+
+    def used_secs(self, now: float = None) -> float:
+        with self._lock:
+            self._expire(time.monotonic() if now is None else now)
+            return max(0.0, self._used)
+
+    def wait_time(self, airtime: float, share: float = 1.0, now: float = None) -> float:
+        """
+        How long until airtime more seconds fit in the budget
+        :param share: the fraction of the budget this send may use, e.g. to keep some back for replies
+        :return: 0 if it fits now, math.inf if it never will
+        """
+        allowed = self.limit_secs * share
+        if airtime > allowed:
+            return math.inf
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            excess = self._used + airtime - allowed
+            if excess <= 0:
+                return 0.0
+            for sent_at, secs in self._sent:
+                excess -= secs
+                if excess <= 0:
+                    return sent_at + self.window - now
+        return math.inf
+
+    def status(self) -> dict:
+        used = self.used_secs()
+        return {
+            "preset": self.preset,
+            "used_secs": round(used, 1),
+            "limit_secs": round(self.limit_secs, 1),
+            "used_percent": round(used / self.limit_secs * 100, 1) if self.limit_secs else 0.0,
+            "window_secs": self.window,
+            "total_secs": round(self.total_secs, 1),
+            "sends": self.sends,
+        }
@@ -28,8 +28,11 @@ class BaseAPIWrapper(ABC):
 
         return response
 
-    def _post(self, url: str, json: dict) -> requests.Response:
+    def _post(self, url: str, json: dict, session: requests.Session = None) -> requests.Response:
+        """
+        :param session: to reuse its connection, e.g. when posting many things in a row
+        """
         full_url = f"{self.base_url}/{url.lstrip('/')}"
-        response = requests.post(full_url, json=json, headers=self._get_headers())
+        response = (session or requests).post(full_url, json=json, headers=self._get_headers())
         response.raise_for_status()
         return response
@@ -9,10 +9,12 @@ from pathlib import Path
 from typing import Union
 
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
+import requests
 from requests import HTTPError
 
 from src.api.BaseAPIWrapper import BaseAPIWrapper
 from src.api.serializers import MeshNodeSerializer
+from src.commands.parsed_command import ParsedCommand
 from src.data_classes import MeshNode
 
 
@@ -36,7 +38,8 @@ class StorageAPIWrapper(BaseAPIWrapper):
                 'node_by_id': f'/api/nodes/{args.get("node_id", "")}',
             }
         else:
-            my_nodenum = self.bot.my_nodenum
+            # packets are filed under the radio that heard them
+            my_nodenum = args.get('my_nodenum') or self.bot.my_nodenum
             api_paths = {
                 'raw_packet': f'/api/packets/{my_nodenum}/ingest/',
                 'nodes': f'/api/packets/{my_nodenum}/nodes/',
@@ -49,11 +52,9 @@ class StorageAPIWrapper(BaseAPIWrapper):
     @classmethod
     def _sanitise_raw_packet(cls, data):
         if isinstance(data, dict):
-            # We never want these pesky raw fields
-            if 'raw' in data:
-                data.pop('raw')
-
-            return {key: cls._sanitise_raw_packet(value) for key, value in data.items()}
+            # We never want these pesky raw fields. Leave the packet itself alone though: the bot may still be
+            # handling it on another thread
+            return {key: cls._sanitise_raw_packet(value) for key, value in data.items() if key != 'raw'}
         elif isinstance(data, list):
             return [cls._sanitise_raw_packet(item) for item in data]
         elif isinstance(data, bytes):
@@ -80,9 +81,14 @@ class StorageAPIWrapper(BaseAPIWrapper):
                 logging.debug("Skipping unsupported TELEMETRY packet (missing deviceMetrics/localStats)")
                 return
 
+        gateway = self.bot.get_gateway(name=packet['gateway']) if 'gateway' in packet else None
+        url_args = {'my_nodenum': gateway.my_nodenum} if gateway else None
+
         # Convert bytes to Base64-encoded strings recursively
         raw_packet: MeshPacket = packet.get('raw')
         packet = StorageAPIWrapper._sanitise_raw_packet(packet)
+        packet.pop('gateway', None)
+        packet.pop(ParsedCommand.PACKET_KEY, None)
 
         # Some fields are not present in the packet if they're a nullish value, so we need to get them from the raw packet
         if raw_packet:
@@ -91,7 +97,7 @@ class StorageAPIWrapper(BaseAPIWrapper):
 
         logging.debug(f"Storing packet: {packet}")
         try:
-            response = self._post(self._get_url('raw_packet'), json=packet)
+            response = self._post(self._get_url('raw_packet', url_args), json=packet)
         except HTTPError as ex:
             logging.error(f"Error storing packet: {ex.response.text}")
             logging.error(f"Packet: {packet}")
@@ -130,6 +136,26 @@ class StorageAPIWrapper(BaseAPIWrapper):
         response = self._post(self._get_url('nodes'), json=node_data)
         return response.json()
 
+    def store_nodes_one_by_one(self, nodes: list[MeshNode]) -> int:
+        """
+        Create or update many nodes. The API has no bulk endpoint, so each node is still its own POST, but they all
+        go over one connection. A node that fails is logged and skipped, rather than stopping the rest
+
+        @return: how many were stored
+        """
+        stored = 0
+        url = self._get_url('nodes')
+        with requests.Session() as session:
+            for node in nodes:
+                try:
+                    self._post(url, json=MeshNodeSerializer.to_api_dict(node), session=session)
+                    stored += 1
+                except HTTPError as ex:
+                    logging.warning(f"Error storing node {node.user.id}: {ex.response.text}")
+                except Exception as ex:
+                    logging.warning(f"Error storing node {node.user.id}: {ex}")
+        return stored
+
     def get_node_by_id(self, node_id: Union[int, str], include_positions=0, include_metrics=0) -> MeshNode | None:
         """
         Get a node by the int or hex representation of its ID
@@ -1,17 +1,23 @@
 import logging
-import time
 from abc import ABC
 
-from meshtastic.protobuf.mesh_pb2 import MeshPacket
+from meshtastic.protobuf.mesh_pb2 import MeshPacket, Constants
 
+from src.airtime import data_payload_size
 from src.bot import MeshtasticBot
+from src.helpers import split_message
+from src.transmit_scheduler import Priority
 
 
 class AbstractBaseFeature(ABC):
     """
     This class represents base functionality for commands, responders, etc
+
+    Messages longer than a single packet can carry are split between lines into numbered parts, which go out
+    one after another (paced by the bot's transmit scheduler, if it has one).
     """
     bot: MeshtasticBot
+    MAX_MESSAGE_BYTES = Constants.DATA_PAYLOAD_LEN
 
     def __init__(self, bot: MeshtasticBot):
         self.bot = bot
@@ -21,29 +27,43 @@ class AbstractBaseFeature(ABC):
         Reply to a message in the same channel
         """
         channel = packet['channel'] if 'channel' in packet else 0
-        self.message_in_channel(channel, message, want_ack)
+        self.message_in_channel(channel, message, want_ack, gateway=packet.get('gateway'))
 
-    def message_in_channel(self, channel: int, message: str, want_ack=False) -> None:
+    def message_in_channel(self, channel: int, message: str, want_ack=False, gateway: str = None) -> None:
         """
         Send a message in a channel
+        :param gateway: the radio to send it from (defaults to the primary one)
         """
         logging.debug(f"Sending message: '{message}'")
-        self.bot.interface.sendText(message, channelIndex=channel, wantAck=want_ack)
+        for part in split_message(message, self.MAX_MESSAGE_BYTES):
+            self.bot.transmit(
+                lambda part=part: self.bot.get_interface(gateway).sendText(part, channelIndex=channel,
+                                                                           wantAck=want_ack),
+                description=f"message in channel {channel}", data_size=data_payload_size(part.encode('utf-8')))
 
     def reply_in_dm(self, packet: MeshPacket, message: str, want_ack=True) -> None:
         """
         Reply in a direct message to a user
         """
         destination_id = packet['fromId']
-        self.message_in_dm(destination_id, message, want_ack)
+        self.message_in_dm(destination_id, message, want_ack, gateway=packet.get('gateway'))
 
-    def message_in_dm(self, destination_id: str, message: str, want_ack=True) -> None:
+    def message_in_dm(self, destination_id: str, message: str, want_ack=True, gateway: str = None) -> None:
         """
         Reply in a direct message to a user
+        :param gateway: the radio to send it from (defaults to the primary one)
         """
         logging.debug(f"Sending DM: '{message}'")
-        time.sleep(1) # Wait a second to let the radio settle
-        self.bot.interface.sendText(message, destinationId=destination_id, wantAck=want_ack)
+        priority = Priority.ADMIN if destination_id in self.bot.admin_nodes else Priority.COMMAND_REPLY
+        for part in split_message(message, self.MAX_MESSAGE_BYTES):
+            def send(part=part):
+                return self.bot.get_interface(gateway).sendText(part, destinationId=destination_id, wantAck=want_ack)
+
+            data_size = data_payload_size(part.encode('utf-8'))
+            if want_ack:
+                self.bot.transmit_tracked(send, destination_id, priority, f"DM to {destination_id}", data_size)
+            else:
+                self.bot.transmit(send, priority, f"DM to {destination_id}", data_size)
 
     def react_in_channel(self, packet: MeshPacket, emoji: str) -> None:
         """
@@ -54,7 +74,10 @@ class AbstractBaseFeature(ABC):
         reply_id = packet['id']
         channel = packet['channel'] if 'channel' in packet else 0
 
-        self.bot.interface.sendReaction(emoji, messageId=reply_id, channelIndex=channel)
+        self.bot.transmit(
+            lambda: self.bot.interface_for(packet).sendReaction(emoji, messageId=reply_id, channelIndex=channel),
+            description=f"reaction in channel {channel}",
+            data_size=data_payload_size(emoji.encode('utf-8'), reply_id, emoji=True))
 
     def react_in_dm(self, packet: MeshPacket, emoji: str) -> None:
         """
@@ -65,4 +88,7 @@ class AbstractBaseFeature(ABC):
         reply_id = packet['id']
         sender = packet['fromId']
 
-        self.bot.interface.sendReaction(emoji, messageId=reply_id, destinationId=sender)
+        self.bot.transmit(
+            lambda: self.bot.interface_for(packet).sendReaction(emoji, messageId=reply_id, destinationId=sender),
+            description=f"reaction to {sender}",
+            data_size=data_payload_size(emoji.encode('utf-8'), reply_id, emoji=True))
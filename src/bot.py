@@ -1,7 +1,9 @@
 import logging
+import math
 import sys
 import time
 import threading
+import weakref
 from datetime import datetime, timezone
 
 import schedule
@@ -9,23 +11,37 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 from pubsub import pub
 from requests import HTTPError
 
+from src.airtime import AirtimeBudget, data_payload_size
 from src.api.StorageAPI import StorageAPIWrapper
-from src.commands.factory import CommandFactory
+from src.commands.factory import CommandRegistry
+from src.commands.parsed_command import ParsedCommand
 from src.data_classes import MeshNode
+from src.delivery_tracker import Delivery, DeliveryTracker
+from src.duplicate_filter import DuplicateFilter
+from src.gateway import Gateway
 from src.helpers import pretty_print_last_heard, safe_encode_node_name
+from src.ingest_queue import IngestQueue
+from src.pipeline import PacketContext, Pipeline, StageConfig
 from src.persistence.commands_logger import AbstractCommandLogger
-from src.persistence.node_db import AbstractNodeDB
+from src.persistence.node_db import AbstractNodeDB, CachedNodeDB
 from src.persistence.node_info import AbstractNodeInfoStore
 from src.persistence.packet_dump import dump_packet
 from src.persistence.user_prefs import AbstractUserPrefsPersistence
-from src.responders.responder_factory import ResponderFactory
-from src.tcp_interface import AutoReconnectTcpInterface, SupportsMessageReactionInterface
+from src.rate_limiter import CommandRateLimiter
+from src.responders.responder_factory import ResponderRegistry
+from src.tcp_interface import AutoReconnectTcpInterface, LocalProxyInterface, SupportsMessageReactionInterface
+from src.traceroute_manager import TracerouteManager
+from src.transmit_scheduler import Priority, TransmitScheduler
 
 
 class MeshtasticBot:
+    # commands that can be used in a channel, as well as in a DM
+    PUBLIC_COMMANDS = frozenset({"!tr", "!ping", "!hello", "!nodes", "!status", "!whoami"})
+
     admin_nodes: list[str]
 
     interface: SupportsMessageReactionInterface
+    gateways: list[Gateway]
     init_complete: bool
 
     my_id: str
@@ -37,15 +53,29 @@ class MeshtasticBot:
     user_prefs_persistence: AbstractUserPrefsPersistence
 
     storage_apis: list[StorageAPIWrapper]
+    transmit_scheduler: TransmitScheduler | None
+    airtime_budget: AirtimeBudget | None
+    delivery_tracker: DeliveryTracker | None
+    ingest_queue: IngestQueue | None
+    rate_limiter: CommandRateLimiter | None
+    commands: CommandRegistry
+    responders: ResponderRegistry
+    pipeline: Pipeline
+    duplicate_filter: DuplicateFilter
 
     def __init__(self, address: str):
         self.address = address
         self.start_time = datetime.now(timezone.utc)
         self.proxy = None
+        # talk to the radio through self.proxy directly, rather than connecting to it over TCP
+        self.attach_to_proxy = False
 
         self.admin_nodes = []
 
+        # the primary gateway's interface, used for anything not in reply to a packet
         self.interface = None
+        # the radios this bot is connected to; if none are set up, connect() makes one from address/proxy
+        self.gateways = []
         self.init_complete = False
 
         self.my_id = None
@@ -55,33 +85,159 @@ class MeshtasticBot:
         self.command_logger = None
         self.user_prefs_persistence = None
         self.storage_apis = []
-        self.pending_traces = {}
+        # if set, everything the bot sends is paced through this rather than sent straight away
+        self.transmit_scheduler = None
+        # if set, the airtime of everything sent is tracked against a duty cycle (and enforced by the scheduler)
+        self.airtime_budget = None
+        # if set, DMs sent with wantAck are followed through to their ACK, and resent if they don't get one
+        self.delivery_tracker = None
+        # if set, received packets are handled on its workers rather than on the thread they arrived on
+        self.ingest_queue = None
+        # if set, commands beyond each sender's (and channel's) rate are throttled
+        self.rate_limiter = None
+        # every command and responder, ready to handle messages
+        self.commands = CommandRegistry(self)
+        self.responders = ResponderRegistry(self)
+        # the stages received packets and node updates go through
+        self.pipeline = self.build_pipeline()
+        # packets already seen, so copies of them can be dropped
+        self.duplicate_filter = DuplicateFilter()
+        # traceroutes in flight, and recent results
+        self.traceroutes = TracerouteManager()
+        # interfaces whose NodeDB has been synced since they connected; until then, node updates from them are
+        # the NodeDB being replayed, which is stored in bulk once they've connected
+        self.synced_interfaces = weakref.WeakSet()
+        # changed nodes are uploaded to the storage APIs this many at a time after syncing
+        self.node_upload_chunk_size = 50
         self.last_report_zero = False
 
-        pub.subscribe(self.on_receive, "meshtastic.receive")
+        # text messages are published on meshtastic.receive.text, a subtopic, so they come through here too
+        pub.subscribe(self._ingest_receive, "meshtastic.receive")
         pub.subscribe(self.on_traceroute, "meshtastic.traceroute")
-        pub.subscribe(self.on_receive_text, "meshtastic.receive.text")
         pub.subscribe(self.on_node_updated, "meshtastic.node.updated")
         pub.subscribe(self.on_connection, "meshtastic.connection.established")
 
     def connect(self):
-        logging.info(f"Connecting to Meshtastic node at {self.address}...")
         self.init_complete = False
+        if not self.gateways:
+            self.gateways.append(Gateway('default', self.address, proxy=self.proxy,
+                                         attach_to_proxy=self.attach_to_proxy))
+
+        for gateway in self.gateways:
+            self.connect_gateway(gateway)
+
+    def connect_gateway(self, gateway: Gateway):
+        if gateway.packet_queue is None and gateway.interface and hasattr(gateway.interface, 'packet_queue'):
+            gateway.packet_queue = gateway.interface.packet_queue
+
+        def error_handler(error):
+            self._handle_interface_error(error, gateway)
+
+        if gateway.proxy and gateway.attach_to_proxy:
+            logging.info(f"Connecting to Meshtastic node '{gateway.name}' through the in-process proxy...")
+            gateway.interface = LocalProxyInterface(
+                gateway.proxy,
+                error_handler=error_handler,
+                packet_queue=gateway.packet_queue,
+                airtime_budget=self.airtime_budget,
+            )
+        else:
+            logging.info(f"Connecting to Meshtastic node '{gateway.name}' at {gateway.address}:{gateway.port}...")
+            gateway.interface = AutoReconnectTcpInterface(
+                hostname=gateway.address,
+                portNumber=gateway.port,
+                error_handler=error_handler,
+                packet_queue=gateway.packet_queue,
+                airtime_budget=self.airtime_budget,
+            )
+        gateway.packet_queue = gateway.interface.packet_queue
+
+        if gateway is self.gateways[0]:
+            self.interface = gateway.interface
+        logging.info(f"Connected to '{gateway.name}'. Listening for messages...")
+
+    def get_gateway(self, interface=None, name: str = None) -> Gateway | None:
+        """
+        Find a gateway by its interface or name
+        """
+        for gateway in self.gateways:
+            if (interface is not None and gateway.interface is interface) or (name is not None and gateway.name == name):
+                return gateway
+        return None
 
-        old_packet_queue = None
-        if self.interface and hasattr(self.interface, 'packet_queue'):
-            old_packet_queue = self.interface.packet_queue
-
-        self.interface = AutoReconnectTcpInterface(
-            hostname=self.address,
-            error_handler=self._handle_interface_error,
-            packet_queue=old_packet_queue,
-        )
-
-        logging.info("Connected. Listening for messages...")
-
-    def _handle_interface_error(self, error):
-        self.disconnect()
+    def get_interface(self, gateway_name: str = None) -> SupportsMessageReactionInterface:
+        """
+        The interface for a gateway, or the primary interface if it isn't known
+        """
+        gateway = self.get_gateway(name=gateway_name) if gateway_name else None
+        if gateway and gateway.interface:
+            return gateway.interface
+        return self.interface
+
+    def interface_for(self, packet: MeshPacket) -> SupportsMessageReactionInterface:
+        """
+        The interface for the gateway that heard a packet, to reply through
+        """
+        return self.get_interface(packet.get('gateway'))
+
+    def transmit(self, send, priority: Priority = Priority.COMMAND_REPLY, description: str = '',
+                 data_size: int = 0) -> None:
+        """
+        Send something now, or hand it to the transmit scheduler if there is one
+        :param send: a callable that does the sending, e.g. lambda: interface.sendText(...)
+        :param data_size: size of the Data protobuf being sent, to check it against the airtime budget
+        """
+        if self.transmit_scheduler:
+            airtime = self.airtime_budget.estimate(data_size) if self.airtime_budget and data_size else 0.0
+            self.transmit_scheduler.submit(send, priority, description, airtime)
+        else:
+            send()
+
+    def transmit_tracked(self, send, destination_id: str, priority: Priority = Priority.COMMAND_REPLY,
+                         description: str = '', data_size: int = 0) -> Delivery | None:
+        """
+        Send something with wantAck, tracking its delivery if there's a delivery tracker
+        :param send: a callable that does the sending and returns the packet
+        :return: the delivery, whose future says whether it arrived, or None if not tracked
+        """
+        if not self.delivery_tracker:
+            self.transmit(send, priority, description, data_size)
+            return None
+        return self.delivery_tracker.send(send, destination_id, description,
+                                          lambda attempt: self.transmit(attempt, priority, description, data_size))
+
+    def get_metrics(self) -> dict:
+        """
+        The bot's own metrics, for the metrics server
+        """
+        metrics = {}
+        if self.ingest_queue:
+            metrics["ingest"] = self.ingest_queue.metrics()
+        metrics["pipeline"] = self.pipeline.metrics()
+        metrics["duplicates"] = self.duplicate_filter.metrics()
+        if self.rate_limiter:
+            metrics["rate_limits"] = self.rate_limiter.metrics()
+        if isinstance(self.node_db, CachedNodeDB):
+            metrics["node_cache"] = self.node_db.metrics()
+        return metrics
+
+    def is_my_id(self, node_id: str) -> bool:
+        """
+        Whether a node id belongs to one of our own radios
+        """
+        return node_id == self.my_id or any(gateway.my_id == node_id for gateway in self.gateways)
+
+    def _tag_gateway(self, packet: MeshPacket, interface) -> None:
+        if 'gateway' not in packet:
+            gateway = self.get_gateway(interface=interface)
+            if gateway:
+                packet['gateway'] = gateway.name
+
+    def _handle_interface_error(self, error, gateway: Gateway = None):
+        if gateway is None or len(self.gateways) <= 1:
+            self.disconnect()
+        else:
+            self.disconnect_gateway(gateway)
 
         logging.error(f"Handling interface error: {error}")
         backoff_time = 5  # Initial back-off time in seconds
@@ -90,7 +246,10 @@ class MeshtasticBot:
 
         while True:
             try:
-                self.connect()
+                if gateway is None or len(self.gateways) <= 1:
+                    self.connect()
+                else:
+                    self.connect_gateway(gateway)
                 self.init_complete = True
                 logging.info("Reconnected successfully")
                 break
@@ -105,16 +264,37 @@ class MeshtasticBot:
 
     def disconnect(self):
         self.init_complete = False
+        interfaces = [gateway.interface for gateway in self.gateways if gateway.interface] or [self.interface]
+        for interface in interfaces:
+            self._close_interface(interface)
+
+    def disconnect_gateway(self, gateway: Gateway):
+        self._close_interface(gateway.interface)
+
+    @staticmethod
+    def _close_interface(interface):
         try:
-            if self.interface:
-                self.interface.close()
-                self.interface._disconnected()
+            if interface:
+                interface.close()
+                interface._disconnected()
         except OSError as ex:
             logging.warning(f"Failed to close connection. Continuing anyway: {ex}")
 
     def on_connection(self, interface, topic=pub.AUTO_TOPIC):
+        gateway = self.get_gateway(interface=interface)
+        if gateway:
+            gateway.my_nodenum = interface.localNode.nodeNum
+            logging.info(f"Connected to Meshtastic node '{gateway.name}' ({gateway.my_id})")
+        self.sync_nodes(interface)
+        self.synced_interfaces.add(interface)
+        if gateway is not None and gateway is not self.gateways[0]:
+            # the primary gateway is the bot's identity; the others just add coverage
+            return
+
         self.my_nodenum = interface.localNode.nodeNum  # in dec
         self.my_id = f"!{hex(self.my_nodenum)[2:]}"
+        if self.airtime_budget:
+            self.airtime_budget.set_lora_config(interface.localNode.localConfig.lora)
 
         self.init_complete = True
         logging.info('Connected to Meshtastic node')
@@ -124,29 +304,40 @@ class MeshtasticBot:
         # We use a timer to delay slightly to ensure everything settles
         threading.Timer(10.0, self.report_node_count).start()
 
+    def _ingest(self, handler, packet: MeshPacket, interface):
+        if self.ingest_queue:
+            self.ingest_queue.submit(packet.get('fromId') or packet.get('from'), handler, packet, interface)
+        else:
+            handler(packet, interface)
+
+    def _ingest_receive(self, packet: MeshPacket, interface):
+        self._ingest(self.on_receive, packet, interface)
+
     def on_receive_text(self, packet: MeshPacket, interface):
-        """Callback function triggered when a text message is received."""
+        """Answers a text message, as a DM or in its channel. Called from the pipeline's respond stage."""
+        self._tag_gateway(packet, interface)
 
         to_id = packet['toId']
 
-        if to_id == self.my_id:
+        if self.is_my_id(to_id):
             self.handle_private_message(packet)
         else:
             self.handle_public_message(packet)
 
     def handle_private_message(self, packet: MeshPacket):
         """Handle private messages."""
-        message = packet['decoded']['text']
-        from_id = packet['fromId']
+        command = ParsedCommand.from_packet(packet)
+        message = command.text
+        from_id = command.sender_id
 
         sender = self.node_db.get_by_id(from_id)
         logging.info(f"Received private message: '{message}' from {sender.long_name if sender else from_id}")
 
-        words = message.split()
-        command_name = words[0]
-        command_instance = CommandFactory.create_command(command_name, self)
+        command_instance = self.commands.get(command.base_command)
         if command_instance:
-            self.command_logger.log_command(from_id, command_instance, message)
+            if not self.allow_command(packet, message):
+                return
+            self.command_logger.log_command(from_id, command_instance, command)
             try:
                 command_instance.handle_packet(packet)
             except Exception as e:
@@ -154,12 +345,37 @@ class MeshtasticBot:
         else:
             self.command_logger.log_unknown_request(from_id, message)
 
+    def allow_command(self, packet: MeshPacket, message: str, channel: int = None) -> bool:
+        """
+        Whether to answer a command, or if the sender (or channel) is over its rate limit, log it as throttled and
+        maybe tell the sender to slow down. Admins are never throttled.
+        :param channel: the channel a public command was sent in; None for a DM
+        """
+        from_id = packet['fromId']
+        if not self.rate_limiter or from_id in self.admin_nodes:
+            return True
+
+        decision = self.rate_limiter.check(from_id, channel)
+        if decision.allowed:
+            return True
+
+        logging.info(f"Throttled {from_id} ({decision.scope} rate limit): {message}")
+        self.command_logger.log_throttled_request(from_id, message, decision.scope, channel)
+        if decision.notify:
+            notice = f"Slow down! Too many commands, try again in {math.ceil(decision.retry_after)}s"
+            reply_interface = self.get_interface(packet.get('gateway'))
+            self.transmit(lambda: reply_interface.sendText(notice, destinationId=from_id),
+                          description=f"cool-down notice to {from_id}",
+                          data_size=data_payload_size(notice.encode('utf-8')))
+        return False
+
     def get_channel_name(self, packet: MeshPacket) -> str:
         """Get the name of the channel for a packet."""
         channel_index = packet.get('channel', 0)
+        interface = self.interface_for(packet)
         try:
-            if self.interface and self.interface.localNode:
-                channel = self.interface.localNode.channels[channel_index]
+            if interface and interface.localNode:
+                channel = interface.localNode.channels[channel_index]
                 if channel and channel.settings and channel.settings.name:
                     return channel.settings.name
         except (AttributeError, IndexError):
@@ -168,8 +384,9 @@ class MeshtasticBot:
 
     def handle_public_message(self, packet: MeshPacket):
         """Handle public (group channel) messages."""
-        message = packet['decoded']['text']
-        from_id = packet['fromId']
+        command = ParsedCommand.from_packet(packet)
+        message = command.text
+        from_id = command.sender_id
         sender = self.node_db.get_by_id(from_id)
         sender_name = sender.long_name if sender else from_id
         channel_name = self.get_channel_name(packet)
@@ -177,13 +394,13 @@ class MeshtasticBot:
         logging.info(f"Received group message on channel '{channel_name}' from {sender_name}: {message}")
 
         # Allow certain commands in public channels
-        words = message.split()
-        if words and words[0].lower() in ["!tr", "!ping", "!hello", "!nodes", "!status", "!whoami"]:
-            command_name = words[0].lower()
+        command_name = command.base_command.lower()
+        if command_name in self.PUBLIC_COMMANDS:
             logging.info(f"Received public {command_name} from {sender_name}")
-            from src.commands.factory import CommandFactory
-            command_instance = CommandFactory.create_command(command_name, self)
+            command_instance = self.commands.get(command_name)
             if command_instance:
+                if not self.allow_command(packet, message, channel=command.channel):
+                    return
                 try:
                     # Commands by default reply via DM (reply_in_dm).
                     command_instance.handle_packet(packet)
@@ -191,7 +408,7 @@ class MeshtasticBot:
                 except Exception as e:
                     logging.error(f"Error handling public command {command_name}: {e}")
 
-        responder = ResponderFactory.match_responder(message, self)
+        responder = self.responders.match(message)
         if responder:
             try:
                 outcome = responder.handle_packet(packet)
@@ -203,118 +420,245 @@ class MeshtasticBot:
             except Exception as e:
                 logging.error(f"Error handling message: {e}")
 
-    def on_traceroute(self, packet, route):
+    def on_traceroute(self, packet, route, interface=None):
         """Callback for when a traceroute response is received."""
+        self._tag_gateway(packet, interface)
+
+        if route is None:
+            target_id = self.traceroutes.target_for(packet.get('decoded', {}).get('requestId'))
+            pending = self.traceroutes.failed(target_id) if target_id else None
+            if pending:
+                for requester_id in pending.requesters:
+                    self._send_traceroute_text(requester_id, f"Traceroute to {target_id} failed",
+                                               packet.get('gateway'))
+            return
+
         target_id = packet.get('fromId')
-        
-        if target_id not in self.pending_traces:
+        pending = self.traceroutes.complete(target_id, route.route, route.route_back)
+        if pending is None:
             logging.debug(f"Received traceroute from {target_id} but no pending request found.")
             return
 
-        requester_id = self.pending_traces.pop(target_id)
-        
-        # Format the OUTBOUND route
-        route_ids = route.route
+        for requester_id in pending.requesters:
+            self.send_traceroute_result(requester_id, target_id, route.route, route.route_back, packet.get('gateway'))
+
+    def _format_route(self, node_nums) -> list[str]:
         hops = []
-        for node_id_int in route_ids:
+        for node_id_int in node_nums:
             # Convert int to !hex string
             node_id_str = f"!{node_id_int:08x}"
             node = self.node_db.get_by_id(node_id_str)
-            if node:
-                 hops.append(f"{node.short_name}")
-            else:
-                 hops.append(f"{node_id_str}")
-
+            hops.append(node.short_name if node else node_id_str)
+        return hops
+
+    def _send_traceroute_text(self, requester_id: str, message: str, gateway: str = None):
+        reply_interface = self.get_interface(gateway)
+        self.transmit(lambda: reply_interface.sendText(message, destinationId=requester_id),
+                      description=f"traceroute result to {requester_id}",
+                      data_size=data_payload_size(message.encode('utf-8')))
+
+    def send_traceroute_result(self, requester_id: str, target_id: str, route: list[int], route_back: list[int],
+                               gateway: str = None, age: float = None):
+        """
+        Send the route to target_id, and back if it's known, to requester_id
+        :param age: seconds since the route was traced, if it's from the cache
+        """
+        hops = self._format_route(route)
         route_str = " -> ".join(hops) if hops else "Direct (or unknown)"
-        
-        response_out = f"Trace TO {target_id} ({len(hops)} hops):\n{route_str}"
+        cached = f" {age / 60:.0f} min ago" if age is not None else ""
+
+        response_out = f"Trace TO {target_id} ({len(hops)} hops{cached}):\n{route_str}"
         logging.info(f"Sending traceroute OUT result to {requester_id}: {response_out}")
-        self.interface.sendText(response_out, destinationId=requester_id)
-        
+        self._send_traceroute_text(requester_id, response_out, gateway)
+
         # Format the INBOUND route (if available)
-        if hasattr(route, 'route_back') and route.route_back:
-            hops_back = []
-            for node_id_int in route.route_back:
-                 node_id_str = f"!{node_id_int:08x}"
-                 node = self.node_db.get_by_id(node_id_str)
-                 if node:
-                     hops_back.append(f"{node.short_name}")
-                 else:
-                     hops_back.append(f"{node_id_str}")
+        if route_back:
+            hops_back = self._format_route(route_back)
             back_str = " -> ".join(hops_back)
-            
-            response_in = f"Trace FROM {target_id} ({len(hops_back)} hops):\n{back_str}"
+
+            response_in = f"Trace FROM {target_id} ({len(hops_back)} hops{cached}):\n{back_str}"
             logging.info(f"Sending traceroute IN result to {requester_id}: {response_in}")
-            # Small delay to ensure order
-            time.sleep(1) 
-            self.interface.sendText(response_in, destinationId=requester_id)
+            # the scheduler keeps these in order and spaces them out
+            self._send_traceroute_text(requester_id, response_in, gateway)
+
+    def expire_traceroutes(self):
+        """
+        Let anyone still waiting on a traceroute that was never answered know it's been given up on
+        """
+        for pending in self.traceroutes.expire():
+            for requester_id in pending.requesters:
+                self._send_traceroute_text(requester_id, f"No answer to the traceroute to {pending.target_id}",
+                                           pending.gateway)
+
+    def build_pipeline(self, config: dict[str, StageConfig] = None) -> Pipeline:
+        """
+        The stages everything received goes through: packets (including text messages, which are answered in
+        the respond stage) and node updates
+        """
+        pipeline = Pipeline(config)
+        pipeline.add_stage('decode', {'packet': self._decode_packet, 'node': self._decode_node}, required=True)
+        pipeline.add_stage('dedupe', {'packet': self._dedupe_packet})
+        pipeline.add_stage('persist', {'packet': self._persist_packet, 'node': self._persist_node})
+        pipeline.add_stage('upload', {'packet': self._upload_packet, 'node': self._upload_node},
+                           default=StageConfig(run_async=True, workers=2))
+        pipeline.add_stage('dispatch', {'packet': self._dispatch_packet})
+        pipeline.add_stage('respond', {'packet': self._respond_to_packet})
+        return pipeline
 
     def on_receive(self, packet: MeshPacket, interface):
+        self.pipeline.process('packet', packet, interface, packet.get('fromId'))
+
+    def sync_nodes(self, interface) -> list[MeshNode]:
+        """
+        Store every node in an interface's NodeDB that's new or changed (heard from since it was last stored), in
+        one transaction, then upload them to the storage APIs in the background. The whole NodeDB is
+        replayed on every (re)connect, so this is much quicker than handling it a node at a time.
+        :return: the nodes that were new or changed
+        """
+        changed = []
+        for node_data in (interface.nodes or {}).values():
+            if not node_data.get('user'):
+                continue
+            node = MeshNode.from_dict(node_data)
+            last_heard = datetime.fromtimestamp(node_data.get('lastHeard', 0), tz=timezone.utc)
+            previously_heard = self.node_info.get_last_heard(node.user.id)
+            if self._user_changed(node.user) or previously_heard is None or last_heard > previously_heard:
+                changed.append(node)
+                self.node_info.update_last_heard(node.user.id, last_heard)
+        if not changed:
+            return changed
+
+        start = time.perf_counter()
+        self.node_db.store_nodes(changed)
+        logging.info(f"Synced {len(changed)} new or changed node(s) in {time.perf_counter() - start:.2f}s")
+        if self.storage_apis:
+            threading.Thread(target=self._upload_nodes, args=(changed,), name="node upload", daemon=True).start()
+        return changed
+
+    def _user_changed(self, user: MeshNode.User) -> bool:
+        known = self.node_db.get_by_id(user.id)
+        return known is None or any(getattr(known, field) != getattr(user, field)
+                                    for field in ('long_name', 'short_name', 'macaddr', 'hw_model', 'public_key'))
+
+    def _upload_nodes(self, nodes: list[MeshNode]):
+        # a node per request, node_upload_chunk_size of them per connection
+        for storage_api in self.storage_apis:
+            stored = 0
+            for i in range(0, len(nodes), self.node_upload_chunk_size):
+                stored += storage_api.store_nodes_one_by_one(nodes[i:i + self.node_upload_chunk_size])
+            logging.info(f"Uploaded {stored} of {len(nodes)} node(s) to {storage_api.base_url}")
+
+    def on_node_updated(self, node, interface):
+        if interface not in self.synced_interfaces:
+            # part of the NodeDB replayed while connecting: sync_nodes stores it once connected
+            return
+        self.pipeline.process('node', node, interface, node.get('user', {}).get('id') if node.get('user') else None)
+
+    def _decode_packet(self, ctx: PacketContext):
+        packet = ctx.packet
+        self._tag_gateway(packet, ctx.interface)
+
         if packet.get('fromId') == '!69828b98':
             logging.debug(f"Received ANY packet from mte4: {packet}")
 
+        ctx.data['portnum'] = packet['decoded']['portnum'] if 'decoded' in packet else 'unknown'
+        if ctx.data['portnum'] == 'TEXT_MESSAGE_APP' and 'text' in packet['decoded']:
+            # parsed here, before any async stage has the packet, for the bot, commands and command logger to share
+            ParsedCommand.from_packet(packet)
+
+    def _dedupe_packet(self, ctx: PacketContext):
+        # the same packet rebroadcast, or heard by more than one of our radios, is only handled once
+        packet = ctx.packet
+        if self.duplicate_filter.is_duplicate(packet.get('from'), packet.get('id'), packet.get('fromId')):
+            logging.debug(f"Dropping duplicate packet {packet.get('id')} from {packet.get('fromId')}")
+            return False
+
+    def _persist_packet(self, ctx: PacketContext):
+        packet = ctx.packet
         # dump the packet to disk (if enabled)
         dump_packet(packet)
 
-        for storage_api in self.storage_apis:
-            try:
-                storage_api.store_raw_packet(packet)
-            except HTTPError as ex:
-                logging.warning(f"Error storing packet: {ex.response.text}")
-                pass
-            except Exception as ex:
-                logging.warning(f"Error storing packet in API: {ex}")
-                pass
-
         sender = packet['fromId']
         node = self.node_db.get_by_id(sender)
         if not node:
             # logging.warning(f"Received packet from unknown sender {sender}")
             return
 
-        if node:
-            portnum = packet['decoded']['portnum'] if 'decoded' in packet else 'unknown'
-            if sender == self.my_id and portnum == 'TELEMETRY_APP':
-                # Ignore telemetry packets sent by self
-                pass
-            else:
-                # Increment packets_today for this node
-                self.node_info.node_packet_received(sender, portnum)
+        portnum = ctx.data['portnum']
+        if self.is_my_id(sender) and portnum == 'TELEMETRY_APP':
+            # Ignore telemetry packets sent by self
+            pass
+        else:
+            # Increment packets_today for this node
+            self.node_info.node_packet_received(sender, portnum)
 
-        if sender == self.my_id:
+        if self.is_my_id(sender):
             recipient_id = packet['toId']
             recipient = self.node_db.get_by_id(recipient_id)
-            portnum = packet['decoded']['portnum']
 
             logging.debug(
                 f"Received packet from self: {recipient.long_name if recipient else recipient_id} (port {portnum})")
 
-    def on_node_updated(self, node, interface):
-        if interface.localNode and self.my_nodenum is None:
+    def _upload_packet(self, ctx: PacketContext):
+        for storage_api in self.storage_apis:
+            try:
+                storage_api.store_raw_packet(ctx.packet)
+            except HTTPError as ex:
+                logging.warning(f"Error storing packet: {ex.response.text}")
+                pass
+            except Exception as ex:
+                logging.warning(f"Error storing packet in API: {ex}")
+                pass
+
+    def _dispatch_packet(self, ctx: PacketContext):
+        packet = ctx.packet
+        decoded = packet.get('decoded', {})
+        if self.delivery_tracker and ctx.data['portnum'] == 'ROUTING_APP' and decoded.get('requestId'):
+            error_reason = decoded.get('routing', {}).get('errorReason', DeliveryTracker.ACK)
+            self.delivery_tracker.on_routing_packet(decoded['requestId'], error_reason,
+                                                    self.is_my_id(packet.get('fromId')))
+
+        if ctx.data['portnum'] == 'TEXT_MESSAGE_APP' and 'text' in decoded:
+            ctx.data['respond'] = True
+
+    def _respond_to_packet(self, ctx: PacketContext):
+        if ctx.data.get('respond'):
+            self.on_receive_text(ctx.packet, ctx.interface)
+
+    def _decode_node(self, ctx: PacketContext):
+        interface = ctx.interface
+        gateway = self.get_gateway(interface=interface)
+        is_primary = gateway is None or gateway is self.gateways[0]
+        if interface.localNode and self.my_nodenum is None and is_primary:
             self.my_nodenum = interface.localNode.nodeNum
             self.my_id = f"!{hex(self.my_nodenum)[2:]}"
 
-        # Check if the node is a new user
-        if node['user'] is not None:
-            mesh_node = MeshNode.from_dict(node)
-            last_heard_int = node.get('lastHeard', 0)
-            last_heard = datetime.fromtimestamp(last_heard_int, tz=timezone.utc)
-            self.node_db.store_node(mesh_node)
-            self.node_info.update_last_heard(mesh_node.user.id, last_heard)
+        # Nothing more to do unless it's a user
+        if ctx.packet['user'] is None:
+            return False
+        ctx.data['node'] = MeshNode.from_dict(ctx.packet)
+        ctx.data['last_heard'] = datetime.fromtimestamp(ctx.packet.get('lastHeard', 0), tz=timezone.utc)
 
-            for storage_api in self.storage_apis:
-                try:
-                    storage_api.store_node(mesh_node)
-                except HTTPError as ex:
-                    logging.warning(f"Error storing node: {ex.response.text}")
-                    pass
-                except Exception as ex:
-                    logging.warning(f"Error storing node: {ex}")
-                    pass
-
-            if self.init_complete:
-                last_heard_str = pretty_print_last_heard(last_heard)
-                logging.info(f"New user: {mesh_node.user.long_name} (last heard {last_heard_str})")
+    def _persist_node(self, ctx: PacketContext):
+        mesh_node = ctx.data['node']
+        last_heard = ctx.data['last_heard']
+        self.node_db.store_node(mesh_node)
+        self.node_info.update_last_heard(mesh_node.user.id, last_heard)
+
+        if self.init_complete:
+            last_heard_str = pretty_print_last_heard(last_heard)
+            logging.info(f"New user: {mesh_node.user.long_name} (last heard {last_heard_str})")
+
+    def _upload_node(self, ctx: PacketContext):
+        for storage_api in self.storage_apis:
+            try:
+                storage_api.store_node(ctx.data['node'])
+            except HTTPError as ex:
+                logging.warning(f"Error storing node: {ex.response.text}")
+                pass
+            except Exception as ex:
+                logging.warning(f"Error storing node: {ex}")
+                pass
 
     def print_nodes(self):
         # filter nodes where last heard is more than 2 hours ago
@@ -353,11 +697,14 @@ class MeshtasticBot:
 
         logging.info(f"Reporting node count: {message}")
         try:
+            data_size = data_payload_size(message.encode('utf-8'))
             if destination:
-                self.interface.sendText(message, destinationId=destination, wantAck=True)
+                self.transmit_tracked(lambda: self.interface.sendText(message, destinationId=destination, wantAck=True),
+                                      destination, description=f"node count to {destination}", data_size=data_size)
             else:
                 # Default to Channel 2 (GregPrivate)
-                self.interface.sendText(message, channelIndex=channel_index, wantAck=True)
+                self.transmit(lambda: self.interface.sendText(message, channelIndex=channel_index, wantAck=True),
+                              Priority.SCHEDULED_REPORT, f"node count report to channel {channel_index}", data_size)
         except Exception as e:
             logging.error(f"Failed to report node count: {e}")
 
@@ -387,6 +734,7 @@ class MeshtasticBot:
         schedule.every().day.at("00:00").do(self.node_info.reset_packets_today)
         schedule.every(3).hours.do(self.report_node_count)
         schedule.every(1).minutes.do(self.check_for_zero_nodes)
+        schedule.every(30).seconds.do(self.expire_traceroutes)
         while True:
             schedule.run_pending()
             try:
@@ -395,7 +743,4 @@ class MeshtasticBot:
                 return
 
     def get_node_by_short_name(self, short_name: str) -> MeshNode.User | None:
-        for node in self.node_db.list_nodes():
-            if node.short_name.lower() == short_name.lower():
-                return node
-        return None
+        return self.node_db.get_by_short_name(short_name)
@@ -4,6 +4,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.parsed_command import ParsedCommand
 from src.data_classes import MeshNode
 
 
@@ -24,11 +25,11 @@ class AdminCommand(AbstractCommandWithSubcommands):
         else:
             super().handle_packet(packet)
 
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "Invalid command format - expected !admin <command> <args>"
         self.reply(packet, response)
 
-    def reset_packets(self, packet: MeshPacket, args: list[str]) -> None:
+    def reset_packets(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         available_options = ['packets']
 
         if not args or len(args) == 0:
@@ -41,7 +42,7 @@ class AdminCommand(AbstractCommandWithSubcommands):
 
         self.reply(packet, response)
 
-    def show_users(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_users(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         # respond to '!admin users <user>' to show user history
         if len(args) > 0:
             req_user_name = args[0]
@@ -134,11 +135,11 @@ class AdminCommand(AbstractCommandWithSubcommands):
 
         return self.reply(packet, response)
 
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         help_text = "!admin: admin commands\n"
         help_text += "!admin reset packets: reset the packet counter\n"
         help_text += "!admin users (user): usage info or user history\n"
         self.reply(packet, help_text)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_onesub_args(message)
@@ -6,6 +6,7 @@ from typing_extensions import deprecated
 
 from src.base_feature import AbstractBaseFeature
 from src.bot import MeshtasticBot
+from src.commands.parsed_command import ParsedCommand
 
 
 class AbstractCommand(AbstractBaseFeature, ABC):
@@ -36,70 +37,80 @@ class AbstractCommand(AbstractBaseFeature, ABC):
         self.message_in_dm(destination_id, message, want_ack)
 
     @abstractmethod
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         """
         Extract the command, subcommands and arguments from a message
-        :param message:
+        :param message: the message, already parsed (or its text)
         :return: Tuple of command name, subcommands, and any arguments
         """
         pass
 
-    def _gcfl_just_base_command(self, _: str) -> (str, list[str] | None, str | None):
+    def _gcfl_just_base_command(self, _: ParsedCommand | str) -> (str, list[str] | None, str | None):
         cmd = self.base_command
         return cmd, None, None
 
-    def _gcfl_base_command_and_args(self, message: str) -> (str, list[str] | None, str | None):
-        cmd = self.base_command
-        if len(message) > len(self.base_command) + 1:
-            args = message[len(self.base_command) + 1:].strip()
-        else:
-            args = None
+    def _gcfl_base_command_and_args(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
+        return self.base_command, None, ParsedCommand.of(message).rest
 
-        return cmd, None, args
+    def _gcfl_base_onesub_args(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
+        command = ParsedCommand.of(message)
+        # the subcommand is logged as it was sent, e.g. with a leading '!'
+        subcommand = [command.raw_sub_command] if command.raw_sub_command else None
+        args = ' '.join(command.args) if command.args else None
+        return self.base_command, subcommand, args
 
-    def _gcfl_base_onesub_args(self, message: str) -> (str, list[str] | None, str | None):
-        tokens = message.split()
-        cmd = self.base_command
-        subcommand = [tokens[1]] if len(tokens) > 1 else None
-        args = ' '.join(tokens[2:]) if len(tokens) > 2 else None
-        return cmd, subcommand, args
+
+class SubCommands(dict):
+    """
+    Subcommand name -> handler, which works out how many arguments each handler takes when it's added, rather
+    than every time it's called: (packet, args), or (packet, args, sub_command_name)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.arity: dict[str, int] = {}
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, name: str, handler: callable):
+        num_args = len(inspect.signature(handler).parameters)
+        if num_args not in (2, 3):
+            raise ValueError(f"Subcommand '{name}' has an unexpected number of arguments")
+        super().__setitem__(name, handler)
+        self.arity[name] = num_args
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        del self.arity[name]
+
+    def update(self, *args, **kwargs):
+        for name, handler in dict(*args, **kwargs).items():
+            self[name] = handler
 
 
 class AbstractCommandWithSubcommands(AbstractCommand, ABC):
-    sub_commands: dict[str, callable]
+    sub_commands: SubCommands
 
     def __init__(self, bot: MeshtasticBot,
                  base_command_str: str,
                  error_on_invalid_subcommand=True):
         super().__init__(bot, base_command_str)
-        self.sub_commands = {
+        self.sub_commands = SubCommands({
             '': self.handle_base_command,
             'help': self.show_help,
-        }
+        })
         self.error_on_invalid_subcommand = error_on_invalid_subcommand
 
     def handle_packet(self, packet: MeshPacket) -> None:
-        message = packet['decoded']['text']
-
-        words = message.split()
-        if len(words) < 2:
-            sub_command_name = ''
-            args = None
-        else:
-            sub_command_name = words[1].lstrip('!')
-            args = words[2:] if len(words) > 2 else []
+        command = ParsedCommand.from_packet(packet)
+        sub_command_name = command.sub_command
+        args = command.args
 
         sub_command = self.sub_commands.get(sub_command_name)
         if sub_command:
-            # Check the number of positional arguments the sub_command takes
-            num_args = len(inspect.signature(sub_command).parameters)
-
-            if num_args == 2:
+            if self.sub_commands.arity[sub_command_name] == 2:
                 sub_command(packet, args)
-            elif num_args == 3:
-                sub_command(packet, args, sub_command_name)
             else:
-                raise ValueError(f"Subcommand '{sub_command_name}' has an unexpected number of arguments")
+                sub_command(packet, args, sub_command_name)
         else:
             if self.error_on_invalid_subcommand:
                 response = f"Unknown command '{sub_command_name}'"
@@ -108,9 +119,9 @@ class AbstractCommandWithSubcommands(AbstractCommand, ABC):
                 return self.show_help(packet, args)
 
     @abstractmethod
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         pass
 
     @abstractmethod
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         pass
@@ -2,6 +2,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.parsed_command import ParsedCommand
 from src.persistence.user_prefs import UserPrefs
 
 
@@ -11,15 +12,15 @@ class EnrollCommandHandler(AbstractCommandWithSubcommands):
         super().__init__(bot, base_command)
         self.sub_commands['testing'] = self.enroll_testing
 
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         self.show_help(packet, [])
 
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = (f"!enroll: (or !leave) bot responds to you in public channels:\n"
                     f"!enroll testing: bot will like your msg if you say 'test' or 'testing'\n")
         self.reply(packet, response)
 
-    def enroll_testing(self, packet: MeshPacket, args: list[str]) -> None:
+    def enroll_testing(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         sender_id = packet['fromId']
         user_prefs = self.bot.user_prefs_persistence.get_user_prefs(sender_id)
 
@@ -35,5 +36,5 @@ class EnrollCommandHandler(AbstractCommandWithSubcommands):
                     f"from responses to 'test' or 'testing' in public channels.")
         self.reply(packet, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_command_and_args(message)
@@ -59,3 +59,25 @@ class CommandFactory:
             args = [bot] + command_info["args"]
             return command_class(*args)
         return None
+
+
+class CommandRegistry:
+    """
+    Every command in CommandFactory.commands, imported and instantiated once for a bot, so handling a message
+    is a dict lookup. Commands are shared between messages (and threads), so they mustn't keep per-message state.
+    """
+
+    def __init__(self, bot):
+        self._commands = {name: CommandFactory.create_command(name, bot) for name in CommandFactory.commands}
+
+    def get(self, command_name: str):
+        """
+        The command for e.g. '!ping', or None if there isn't one
+        """
+        return self._commands.get(command_name)
+
+    def __contains__(self, command_name: str) -> bool:
+        return command_name in self._commands
+
+    def __len__(self) -> int:
+        return len(self._commands)
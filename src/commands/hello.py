@@ -2,6 +2,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommand
+from src.commands.parsed_command import ParsedCommand
 
 
 class HelloCommand(AbstractCommand):
@@ -16,5 +17,5 @@ class HelloCommand(AbstractCommand):
         response = f"Hello, {sender_name}! (tip: try !help). I'm a bot maintained by MTEK original PDY4 / https://github.com/pskillen/meshtastic-bot"
         self.reply_to(sender_id, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_just_base_command(message)
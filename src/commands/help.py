@@ -2,6 +2,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.parsed_command import ParsedCommand
 
 
 class HelpCommand(AbstractCommandWithSubcommands):
@@ -17,7 +18,7 @@ class HelpCommand(AbstractCommandWithSubcommands):
         # self.sub_commands['enroll'] = self.handle_enroll
         # self.sub_commands['leave'] = self.handle_leave
 
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         subcmds = self.sub_commands.keys()
         subcmds = filter(None, subcmds)  # remove empty strings
         subcmds = [f"!{cmd}" for cmd in subcmds]
@@ -28,45 +29,45 @@ class HelpCommand(AbstractCommandWithSubcommands):
         )
         self.reply(packet, response)
 
-    def handle_hello(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_hello(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!hello: responds with a greeting"
         self.reply(packet, response)
 
-    def handle_ping(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_ping(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!ping (+ optional correlation message): responds with a pong"
         self.reply(packet, response)
 
-    def handle_tr(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_tr(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!tr: responds with the number of hops and signal strength of your message"
         self.reply(packet, response)
 
-    def handle_nodes(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_nodes(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!nodes: details about the nodes this device has seen"
         self.reply(packet, response)
 
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!help: show this help message"
         self.reply(packet, response)
 
-    def handle_whoami(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_whoami(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!whoami: show details about yourself"
         self.reply(packet, response)
 
-    def handle_prefs(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_prefs(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!prefs: show and update your user preferences"
         self.reply(packet, response)
 
-    def handle_enroll(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_enroll(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!enroll: bot will respond to certain messages from you on public channels"
         self.reply(packet, response)
 
-    def handle_leave(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_leave(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!leave: bot will not respond to you on public channels"
         self.reply(packet, response)
 
-    def handle_status(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_status(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = "!status: show current bot and proxy health status"
         self.reply(packet, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_command_and_args(message)
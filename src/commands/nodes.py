@@ -2,6 +2,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.parsed_command import ParsedCommand
 from src.data_classes import MeshNode
 from src.helpers import pretty_print_last_heard
 
@@ -20,7 +21,7 @@ class NodesCommand(AbstractCommandWithSubcommands):
                       key=lambda n:
                       self.bot.node_info.get_node_packets_today(n.id), reverse=True)
 
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         nodes = self.bot.node_db.list_nodes()
         online_nodes = self.bot.node_info.get_online_nodes()
         offline_nodes = self.bot.node_info.get_offline_nodes()
@@ -37,7 +38,7 @@ class NodesCommand(AbstractCommandWithSubcommands):
 
         self.reply(packet, response)
 
-    def handle_busy(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_busy(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         sender = packet['fromId']
 
         if len(args) == 0:
@@ -94,7 +95,7 @@ class NodesCommand(AbstractCommandWithSubcommands):
 
         self.reply_to(sender, response)
 
-    def handle_totals(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_totals(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         from_id = packet['fromId']
         # If the user provides a channel index, use it to send the report there
         if args and args[0].isdigit():
@@ -105,12 +106,12 @@ class NodesCommand(AbstractCommandWithSubcommands):
             # By default, just reply to the user with the count in a DM
             self.bot.report_node_count(destination=from_id)
 
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         help_text = "!nodes: details about nodes this device has seen\n"
         help_text += "!nodes busy: summary of busiest nodes\n"
         help_text += "!nodes busy detailed: detailed info about busiest nodes\n"
         help_text += "!nodes totals: report current online node count\n"
         self.reply(packet, help_text)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_onesub_args(message)
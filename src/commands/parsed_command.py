@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+
+from meshtastic.protobuf.mesh_pb2 import MeshPacket
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedCommand:
+    """
+    A text message split into a command once, for the bot, the command handling it and the command logger to share,
+    along with who sent it and how far it came
+    """
+    text: str
+    # the first word as sent, e.g. '!nodes'
+    base_command: str
+    # the second word, without a leading '!', or '' if there isn't one
+    sub_command: str = ''
+    # the second word as sent, e.g. '!tr', or '' if there isn't one
+    raw_sub_command: str = ''
+    # the words after the subcommand; None if there's no subcommand
+    args: tuple[str, ...] | None = None
+    # everything after the first word, stripped: '' if there's only whitespace after it, None if there's nothing
+    rest: str | None = None
+    sender_id: str | None = None
+    channel: int = 0
+    hops_away: int = 0
+    gateway: str | None = None
+
+    # where it's kept on the packet, once parsed
+    PACKET_KEY = 'parsedCommand'
+
+    @classmethod
+    def from_text(cls, text: str, **kwargs) -> 'ParsedCommand':
+        parts = text.split(None, 1)
+        if len(parts) < 2:
+            rest = '' if parts and len(text.lstrip()) > len(parts[0]) else None
+            return cls(text, parts[0] if parts else '', rest=rest, **kwargs)
+        rest = parts[1].rstrip()
+        words = rest.split()
+        return cls(text, parts[0], sub_command=words[0].lstrip('!'), raw_sub_command=words[0],
+                   args=tuple(words[1:]), rest=rest, **kwargs)
+
+    @classmethod
+    def from_packet(cls, packet: MeshPacket) -> 'ParsedCommand':
+        """
+        The command in a text packet, parsed the first time it's asked for
+        """
+        parsed = packet.get(cls.PACKET_KEY)
+        if parsed is None:
+            parsed = packet[cls.PACKET_KEY] = cls.from_text(
+                packet['decoded']['text'],
+                sender_id=packet.get('fromId'),
+                channel=packet.get('channel', 0),
+                hops_away=packet.get('hopStart', 0) - packet.get('hopLimit', 0),
+                gateway=packet.get('gateway'),
+            )
+        return parsed
+
+    @classmethod
+    def of(cls, message: 'ParsedCommand | str') -> 'ParsedCommand':
+        return message if isinstance(message, ParsedCommand) else cls.from_text(message)
@@ -2,6 +2,7 @@ import logging
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.commands.command import AbstractCommand
+from src.commands.parsed_command import ParsedCommand
 
 
 class PingCommand(AbstractCommand):
@@ -9,24 +10,20 @@ class PingCommand(AbstractCommand):
         super().__init__(bot, 'ping')
 
     def handle_packet(self, packet: MeshPacket) -> None:
-        message = packet['decoded']['text']
-        
-        hop_start = packet.get('hopStart', 0)
-        hop_limit = packet.get('hopLimit', 0)
-        hops_away = hop_start - hop_limit
+        command = ParsedCommand.from_packet(packet)
 
         # self.react_in_dm(packet, "🏓")
 
-        # trim off the '!ping' command from the message
-        additional = message[5:].strip()
+        # anything after the '!ping' command
+        additional = command.rest
 
         response = f"!pong"
         if additional:
             response = f"!pong: {additional}"
 
-        response += f" (ping took {hops_away} hops)"
+        response += f" (ping took {command.hops_away} hops)"
         
         self.reply_in_dm(packet, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_command_and_args(message)
\ No newline at end of file
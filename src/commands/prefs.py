@@ -2,6 +2,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommandWithSubcommands
+from src.commands.parsed_command import ParsedCommand
 from src.persistence.user_prefs import UserPrefs
 
 
@@ -11,7 +12,7 @@ class PrefsCommandHandler(AbstractCommandWithSubcommands):
         super().__init__(bot, 'prefs', error_on_invalid_subcommand=False)
         self.sub_commands['testing'] = self.set_boolean_pref
 
-    def handle_base_command(self, packet: MeshPacket, args: list[str]) -> None:
+    def handle_base_command(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         sender_id = packet['fromId']
         user_prefs = self.bot.user_prefs_persistence.get_user_prefs(sender_id)
 
@@ -24,7 +25,7 @@ class PrefsCommandHandler(AbstractCommandWithSubcommands):
 
         self.reply(packet, response)
 
-    def set_boolean_pref(self, packet: MeshPacket, args: list[str], sub_command_name: str) -> None:
+    def set_boolean_pref(self, packet: MeshPacket, args: tuple[str, ...], sub_command_name: str) -> None:
         # verify args are specified
         if len(args) == 0:
             return self.show_help(packet, args)
@@ -56,11 +57,11 @@ class PrefsCommandHandler(AbstractCommandWithSubcommands):
         self.bot.user_prefs_persistence.persist_user_prefs(sender_id, user_prefs)
         self.reply(packet, response)
 
-    def show_help(self, packet: MeshPacket, args: list[str]) -> None:
+    def show_help(self, packet: MeshPacket, args: tuple[str, ...]) -> None:
         response = (f"!prefs: configure bot settings related to your node:\n"
                     f"!prefs testing enable/disable: bot will like your msg if you say 'test' or 'testing'\n"
                     )
         self.reply(packet, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_command_and_args(message)
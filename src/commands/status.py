@@ -1,6 +1,7 @@
 import logging
 from datetime import datetime, timezone
 from src.commands.command import AbstractCommand
+from src.commands.parsed_command import ParsedCommand
 
 class StatusCommand(AbstractCommand):
     def __init__(self, bot):
@@ -16,15 +17,12 @@ class StatusCommand(AbstractCommand):
         minutes, seconds = divmod(remainder, 60)
         uptime_str = f"{days}d {hours}h {minutes}m"
 
-        # Get Proxy Status
-        proxy_info = "Unknown"
-        if self.bot.proxy:
-            status = self.bot.proxy.get_status()
-            if isinstance(status, dict):
-                state = "Online" if status['connected'] else "Reconnecting"
-                proxy_info = f"{state}, {status['clients']} clients, last radio data {status['silence_secs']}s ago"
-            else:
-                proxy_info = status
+        # Get Proxy Status (one line per radio if there's more than one)
+        proxies = [(gateway.name, gateway.proxy) for gateway in self.bot.gateways if gateway.proxy]
+        if len(proxies) > 1:
+            proxy_info = "".join(f"\n  {name}: {self._proxy_info(proxy)}" for name, proxy in proxies)
+        else:
+            proxy_info = self._proxy_info(self.bot.proxy)
 
         # Get Storage API status
         storage_info = "Not Configured"
@@ -39,9 +37,72 @@ class StatusCommand(AbstractCommand):
             f"☁️ Storage: {storage_info}"
         )
 
+        # Airtime used by the bot against its duty cycle budget
+        if self.bot.airtime_budget:
+            airtime = self.bot.airtime_budget.status()
+            response += (f"\n📡 Airtime: {airtime['used_secs']:.0f}s of {airtime['limit_secs']:.0f}s "
+                         f"this hour ({airtime['used_percent']:.0f}%)")
+            if self.bot.transmit_scheduler and self.bot.transmit_scheduler.dropped:
+                response += f", {self.bot.transmit_scheduler.dropped} dropped"
+
+        # How many DMs were acknowledged, and how long that took
+        if self.bot.delivery_tracker:
+            delivery = self.bot.delivery_tracker.stats()
+            if delivery['delivered_percent'] is not None:
+                response += f"\n✉️ Delivered: {delivery['delivered_percent']:.0f}% of {delivery['delivered'] + delivery['failed']}"
+                if delivery['latency_secs']:
+                    response += f", median {delivery['latency_secs']['p50']:.1f}s"
+                if delivery['retries']:
+                    response += f", {delivery['retries']} retries"
+
+        # Copies of packets dropped, from rebroadcasts or more than one radio hearing them
+        duplicates = self.bot.duplicate_filter
+        if duplicates.suppressed:
+            busiest = ", ".join(f"{self._node_name(node_id)} {count}"
+                                for node_id, count in duplicates.top_suppressed(3))
+            response += f"\n🔁 Duplicates: {duplicates.suppressed} of {duplicates.seen} dropped ({busiest})"
+
+        # Commands not answered because the sender (or channel) was sending too many
+        limiter = self.bot.rate_limiter
+        if limiter and limiter.throttled_by_sender:
+            busiest = ", ".join(f"{self._node_name(node_id)} {count}"
+                                for node_id, count in limiter.throttled_by_sender.most_common(3))
+            response += f"\n🚦 Throttled: {limiter.throttled.total()} commands ({busiest})"
+
+        # Received packets waiting to be handled
+        if self.bot.ingest_queue:
+            ingest = self.bot.ingest_queue.metrics()
+            response += f"\n📥 Queue: {ingest['depth']} waiting (peak {ingest['high_water']})"
+            if ingest['dropped']:
+                response += f", {ingest['dropped']} dropped"
+
         logging.info(f"Sending status to {from_id}")
         self.reply_in_dm(packet, response)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def _node_name(self, node_id: str) -> str:
+        node = self.bot.node_db.get_by_id(node_id)
+        return node.short_name if node else node_id
+
+    @staticmethod
+    def _proxy_info(proxy) -> str:
+        if not proxy:
+            return "Unknown"
+
+        status = proxy.get_status()
+        if not isinstance(status, dict):
+            return status
+
+        state = "Online" if status['connected'] else "Reconnecting"
+        proxy_info = f"{state}, {status['clients']} clients, last radio data {status['silence_secs']}s ago"
+        metrics = status.get('metrics')
+        if metrics:
+            max_lag = max((client['lag_secs'] for client in status['client_lag']), default=0)
+            proxy_info += (f"\n📊 Radio: {metrics['radio_in_frames_per_sec']:.1f}/s in, "
+                           f"{metrics['radio_out_frames_per_sec']:.1f}/s out, "
+                           f"{metrics['reconnects']} reconnects, {metrics['downtime_secs']:.0f}s down, "
+                           f"max client lag {max_lag:.1f}s")
+        return proxy_info
+
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_just_base_command(message)
 
@@ -3,6 +3,7 @@ from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.bot import MeshtasticBot
 from src.commands.command import AbstractCommand
+from src.commands.parsed_command import ParsedCommand
 
 
 class TemplateCommand(AbstractCommand):
@@ -11,11 +12,12 @@ class TemplateCommand(AbstractCommand):
     def __init__(self, bot: MeshtasticBot, base_command: str, template: str):
         super().__init__(bot, base_command)
         self.template = template
+        self._compiled_template = Template(template)
 
     def handle_packet(self, packet: MeshPacket) -> None:
-        message = packet['decoded']['text']
-        sender_id = packet['fromId']
-        hops_away = packet['hopStart'] - packet['hopLimit']
+        command = ParsedCommand.from_packet(packet)
+        message = command.text
+        sender_id = command.sender_id
 
         if not message.startswith(f"!{self.base_command}"):
             return
@@ -23,22 +25,21 @@ class TemplateCommand(AbstractCommand):
         sender = self.bot.node_db.get_by_id(sender_id)
 
         # Render the template with the context variables
-        template = Template(self.template)
         local_context = {
             'rx_message': message.strip(),
             'base_command': f"!{self.base_command}",
-            'args': message[len(self.base_command) + 1:].strip(),
+            'args': command.rest or '',
             'sender': sender,
             'sender_id': sender_id,
             'sender_name': sender.long_name if sender else sender_id,
             'sender_long_name': sender.long_name if sender else sender_id,
             'sender_short_name': sender.short_name if sender else sender_id,
-            'hops_away': hops_away,
+            'hops_away': command.hops_away,
             'user_prefs': self.get_user_prefs(sender_id)
         }
         global_context = self.bot.get_global_context()
         context = {**local_context, **global_context}
-        rendered_message = template.render(context)
+        rendered_message = self._compiled_template.render(context)
 
         self.reply_to(sender_id, rendered_message)
 
@@ -47,7 +48,7 @@ class TemplateCommand(AbstractCommand):
             return None
         return self.bot.user_prefs_persistence.get_user_prefs(sender_id)
 
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_base_command_and_args(message)
 
 
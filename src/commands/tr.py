@@ -1,7 +1,10 @@
 import logging
+from meshtastic.protobuf import mesh_pb2, portnums_pb2
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.commands.command import AbstractCommand
+from src.commands.parsed_command import ParsedCommand
+from src.traceroute_manager import TraceStatus
 
 
 class TracerouteCommand(AbstractCommand):
@@ -9,13 +12,12 @@ class TracerouteCommand(AbstractCommand):
         super().__init__(bot, 'tr')
 
     def handle_packet(self, packet: MeshPacket) -> None:
-        hop_start = packet.get('hopStart', 0)
-        hop_limit = packet.get('hopLimit', 0)
-        hops_away = hop_start - hop_limit
-        
+        command = ParsedCommand.from_packet(packet)
+        hops_away = command.hops_away
+
         snr = packet.get('rxSnr', 0.0)
-        
-        sender_id = packet['fromId']
+
+        sender_id = command.sender_id
         sender = self.bot.node_db.get_by_id(sender_id)
         sender_name = sender.long_name if sender else sender_id
 
@@ -24,18 +26,42 @@ class TracerouteCommand(AbstractCommand):
             self.reply_in_dm(packet, response)
             return
 
+        status, cached = self.bot.traceroutes.request(sender_id, sender_id, packet.get('gateway'))
+        if status == TraceStatus.CACHED:
+            self.bot.send_traceroute_result(sender_id, sender_id, cached.route, cached.route_back,
+                                            packet.get('gateway'), age=cached.age)
+            return
+        if status == TraceStatus.JOINED:
+            self.reply_in_dm(packet, f"{sender_name} a traceroute to you is already running, hang tight...")
+            return
+        if status == TraceStatus.BUSY:
+            self.reply_in_dm(packet, f"{sender_name} too many traceroutes running right now, try again in a minute")
+            return
+
         response = f"{sender_name} you are {hops_away} hops away (Signal: {snr} dB). Starting full traceroute..."
         self.reply_in_dm(packet, response)
-        
-        # Initiate actual traceroute
-        self.bot.pending_traces[sender_id] = sender_id
-        try:
-            logging.info(f"Initiating traceroute to {sender_id}")
-            # hopLimit=7 is standard max
-            self.bot.interface.sendTraceRoute(sender_id, hopLimit=7)
-        except Exception as e:
-            logging.error(f"Failed to send traceroute to {sender_id}: {e}")
-            self.reply_in_dm(packet, f"Error starting traceroute: {e}")
-
-    def get_command_for_logging(self, message: str) -> (str, list[str] | None, str | None):
+
+        # Initiate actual traceroute, without waiting for it to come back: the answer arrives in bot.on_traceroute
+        # without a hopStart there's no telling how far away they are
+        hop_limit = self.bot.traceroutes.hop_limit_for(hops_away if 'hopStart' in packet else None)
+        interface = self.bot.interface_for(packet)
+
+        def send():
+            try:
+                logging.info(f"Initiating traceroute to {sender_id} (hop limit {hop_limit})")
+                sent = interface.sendTraceRouteNoWait(sender_id, hopLimit=hop_limit)
+            except Exception as e:
+                logging.error(f"Failed to send traceroute to {sender_id}: {e}")
+                self.bot.traceroutes.failed(sender_id)
+                self.reply_in_dm(packet, f"Error starting traceroute: {e}")
+                return
+            # the answer is matched by sender; the packet id is only needed to match a failure up
+            if sent is not None and sent.id:
+                self.bot.traceroutes.sent(sender_id, sent.id)
+
+        self.bot.transmit(send, description=f"traceroute to {sender_id}",
+                          data_size=mesh_pb2.Data(portnum=portnums_pb2.TRACEROUTE_APP, want_response=True,
+                                                  payload=b'').ByteSize())
+
+    def get_command_for_logging(self, message: ParsedCommand | str) -> (str, list[str] | None, str | None):
         return self._gcfl_just_base_command(message)
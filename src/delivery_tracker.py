@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+from meshtastic.protobuf import mesh_pb2
+
+from src.helpers import percentiles
+
+
+class Delivery:
+    """
+    One message sent with wantAck, across however many attempts it takes.
+
+    The future resolves to True once the destination acknowledges it, or False if every attempt was NAKed or
+    timed out.
+    """
+
+    def __init__(self, destination_id: str, description: str = ''):
+        self.destination_id = destination_id
+        self.description = description
+        self.packet_id: int | None = None
+        self.attempts = 0
+        self.first_sent_at: float | None = None
+        self.sent_at: float | None = None
+        self.latency: float | None = None
+        self.future: Future = Future()
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float = None) -> bool:
+        return self.future.result(timeout)
+
+    def add_done_callback(self, callback: Callable[['Delivery'], None]) -> None:
+        self.future.add_done_callback(lambda _: callback(self))
+
+    def __repr__(self):
+        return f"Delivery({self.description or self.destination_id!r}, attempt {self.attempts})"
+
+
+class DeliveryTracker:
+    """
+    Follows messages sent with wantAck through to the routing ACK or NAK that comes back for them.
+
+    A message that is NAKed, or not acknowledged within ack_timeout, is sent again after a backoff that doubles
+    with each attempt, up to max_attempts. Sends go through a submit function (e.g. the transmit scheduler), so
+    retries are paced like everything else. Acknowledged messages feed the delivery latency stats.
+    """
+    ACK = 'NONE'
+
+    def __init__(self, ack_timeout: float = 60.0, max_attempts: int = 3, backoff: float = 10.0):
+        """
+        :param ack_timeout: seconds to wait for an ACK before trying again
+        :param backoff: seconds before the first retry; doubled for each one after that
+        """
+        self.ack_timeout = ack_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.running = False
+        self.thread = None
+        self.latencies: deque[float] = deque(maxlen=500)
+        # packet id -> (delivery, send, submit), for the attempt currently waiting on an ACK
+        self._pending: dict[int, tuple[Delivery, Callable, Callable]] = {}
+        # (when, seq, callback, args)
+        self._timers = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="delivery tracker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+
+    def send(self, send: Callable[[], mesh_pb2.MeshPacket], destination_id: str, description: str = '',
+             submit: Callable[[Callable[[], None]], None] = None) -> Delivery:
+        """
+        Send something with wantAck and track it until it's delivered or given up on
+        :param send: sends the message and returns the packet, e.g. lambda: interface.sendText(..., wantAck=True)
+        :param submit: how to get each attempt sent, e.g. the bot's transmit(); by default they're sent right away
+        """
+        delivery = Delivery(destination_id, description)
+        submit = submit or (lambda attempt: attempt())
+        self._submit_attempt(delivery, send, submit)
+        return delivery
+
+    def _submit_attempt(self, delivery: Delivery, send, submit):
+        submit(lambda: self._attempt(delivery, send, submit))
+
+    def _attempt(self, delivery: Delivery, send, submit):
+        if delivery.done:
+            return
+        now = time.monotonic()
+        delivery.attempts += 1
+        delivery.sent_at = now
+        if delivery.first_sent_at is None:
+            delivery.first_sent_at = now
+        try:
+            packet = send()
+        except Exception:
+            self._retry_or_fail(delivery, send, submit, "send failed")
+            raise
+        if packet is None or not packet.id:
+            # nothing to match an ACK against, so it can only be tried again
+            logging.warning(f"{delivery} was sent without a packet id to track")
+            self._retry_or_fail(delivery, send, submit, "no packet id")
+            return
+        # a packet queued by the interface keeps its id, so its ACK still matches once it's replayed
+        with self._condition:
+            delivery.packet_id = packet.id
+            self._pending[packet.id] = (delivery, send, submit)
+        self._call_later(self.ack_timeout, self._on_timeout, packet.id)
+
+    def on_routing_packet(self, request_id: int, error_reason: str, from_own_radio: bool = False) -> None:
+        """
+        Handle a ROUTING_APP packet: an ACK or NAK for request_id
+        :param from_own_radio: a DM only counts as delivered when the destination ACKs it, not when our radio
+                               hears it relayed (an implicit ACK)
+        """
+        with self._condition:
+            if request_id not in self._pending:
+                return
+            delivery, send, submit = self._pending[request_id]
+            is_ack = error_reason == self.ACK
+            if is_ack and from_own_radio:
+                logging.debug(f"{delivery} was relayed, still waiting for {delivery.destination_id} to ACK it")
+                return
+            del self._pending[request_id]
+
+        if is_ack:
+            delivery.latency = time.monotonic() - delivery.sent_at
+            self.latencies.append(delivery.latency)
+            self.delivered += 1
+            logging.info(f"{delivery} delivered in {delivery.latency:.1f}s")
+            delivery.future.set_result(True)
+        else:
+            self._retry_or_fail(delivery, send, submit, f"NAK {error_reason}")
+
+    def _on_timeout(self, packet_id: int):
+        with self._condition:
+            if packet_id not in self._pending:
+                return  # already ACKed or NAKed
+            delivery, send, submit = self._pending.pop(packet_id)
+        self._retry_or_fail(delivery, send, submit, f"no ACK after {self.ack_timeout:.0f}s")
+
+    def _retry_or_fail(self, delivery: Delivery, send, submit, reason: str):
+        if delivery.done:
+            return
+        if delivery.attempts >= self.max_attempts:
+            self.failed += 1
+            logging.warning(f"{delivery} not delivered ({reason}), giving up after {delivery.attempts} attempt(s)")
+            delivery.future.set_result(False)
+            return
+        delay = self.backoff * 2 ** (delivery.attempts - 1)
+        self.retries += 1
+        logging.info(f"{delivery} not delivered ({reason}), trying again in {delay:.0f}s")
+        self._call_later(delay, self._submit_attempt, delivery, send, submit)
+
+    def _call_later(self, delay: float, callback, *args):
+        with self._condition:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), callback, args))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self.running and (not self._timers or self._timers[0][0] > time.monotonic()):
+                    self._condition.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                if not self.running:
+                    return
+                _, _, callback, args = heapq.heappop(self._timers)
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(f"Delivery tracker error: {e}")
+
+    def stats(self) -> dict:
+        finished = self.delivered + self.failed
+        return {
+            "pending": self.pending,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retries": self.retries,
+            "delivered_percent": round(self.delivered / finished * 100, 1) if finished else None,
+            "latency_secs": percentiles(list(self.latencies)),
+        }
@@ -0,0 +1,92 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+
+class DuplicateFilter:
+    """
+    Spots packets that have already been seen, by (from, id): the same packet arrives again when it's rebroadcast
+    by other nodes, or when more than one of our radios hears it.
+
+    Keys are remembered for ttl seconds since they were last seen, up to max_entries (the least recently seen are
+    forgotten first), so memory use is bounded. How many duplicates were suppressed is counted per sending node,
+    as a sign of how much rebroadcasting there is around it; counts are kept for the max_nodes nodes most
+    recently suppressed.
+    """
+    # roughly what each remembered key costs: the tuple, its two ints, the timestamp and the dict slot
+    BYTES_PER_ENTRY = 200
+    # how many of the busiest nodes metrics() reports
+    METRICS_TOP_NODES = 10
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000, max_nodes: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.seen = 0
+        self.suppressed = 0
+        self.evicted = 0
+        # node id -> duplicates suppressed, least recently suppressed first
+        self.suppressed_by_node: OrderedDict[str, int] = OrderedDict()
+        # (from, id) -> when it was last seen, least recently seen first
+        self._entries: OrderedDict[tuple[int, int], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, from_num: int, packet_id: int, from_id: str = None, now: float = None) -> bool:
+        """
+        Record a packet, and whether it's been seen before within the ttl
+        :param from_id: the sender, to count suppressed duplicates against
+        """
+        if not packet_id:
+            # nothing to go by
+            return False
+        now = time.monotonic() if now is None else now
+        key = (from_num, packet_id)
+        with self._lock:
+            self._expire(now)
+            self.seen += 1
+            if key in self._entries:
+                self._entries[key] = now
+                self._entries.move_to_end(key)
+                self.suppressed += 1
+                self._count_suppressed(from_id or str(from_num))
+                return True
+
+            self._entries[key] = now
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+            return False
+
+    def _count_suppressed(self, node_id: str) -> None:
+        self.suppressed_by_node[node_id] = self.suppressed_by_node.pop(node_id, 0) + 1
+        if len(self.suppressed_by_node) > self.max_nodes:
+            self.suppressed_by_node.popitem(last=False)
+
+    def top_suppressed(self, n: int) -> list[tuple[str, int]]:
+        """
+        The n nodes with the most duplicates suppressed, busiest first
+        """
+        with self._lock:
+            return heapq.nlargest(n, self.suppressed_by_node.items(), key=lambda item: item[1])
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            key, last_seen = next(iter(self._entries.items()))
+            if last_seen + self.ttl > now:
+                return
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": len(self._entries) * self.BYTES_PER_ENTRY,
+            "seen": self.seen,
+            "suppressed": self.suppressed,
+            "evicted": self.evicted,
+            "suppressed_by_node": dict(self.top_suppressed(self.METRICS_TOP_NODES)),
+        }
@@ -0,0 +1,72 @@
+from meshtastic.tcp_interface import DEFAULT_TCP_PORT
+
+
+class Gateway:
+    """
+    One radio the bot is connected to, and the TcpProxy in front of it (if any).
+
+    A bot can front several radios at once. Each has its own interface, but they all feed the same handlers and
+    databases; packets are tagged with the name of the gateway that heard them (packet['gateway']) so replies
+    go back out through the same radio.
+    """
+
+    def __init__(self, name: str, address: str = 'localhost', port: int = DEFAULT_TCP_PORT, proxy=None,
+                 attach_to_proxy: bool = False):
+        """
+        :param address: host to connect to over TCP (usually the proxy's listen address)
+        :param attach_to_proxy: talk to the proxy in-process rather than connecting to it over TCP
+        """
+        self.name = name
+        self.address = address
+        self.port = port
+        self.proxy = proxy
+        self.attach_to_proxy = attach_to_proxy
+        self.interface = None
+        # packets waiting to be sent to this radio; kept across reconnects (in memory unless one is set up)
+        self.packet_queue = None
+        self.my_nodenum: int | None = None
+
+    @property
+    def my_id(self) -> str | None:
+        return f"!{hex(self.my_nodenum)[2:]}" if self.my_nodenum is not None else None
+
+    def __repr__(self):
+        return f"Gateway({self.name!r}, {self.my_id})"
+
+
+def parse_gateway_targets(value: str) -> list[tuple[str, str, int]]:
+    """
+    Parse a list of radios, e.g. MESHTASTIC_IP="10.0.0.5" or "roof=10.0.0.5,shed=10.0.0.6:4404". IPv6 addresses
+    are given in brackets when there's a port, e.g. "[fd00::5]:4404"
+    :return: (name, host, port) for each radio; unnamed radios are named after their host
+    """
+    targets = []
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, address = entry.rpartition('=')
+        host, port = _split_host_port(address.strip())
+        targets.append((name.strip() or host, host, port))
+    return targets
+
+
+def _split_host_port(address: str) -> tuple[str, int]:
+    if address.startswith('['):
+        host, bracket, port = address[1:].partition(']')
+        if not bracket or (port and not port.startswith(':')):
+            raise ValueError(f"Invalid radio address '{address}': expected [address]:port")
+        port = port[1:]
+    elif address.count(':') > 1:
+        # a bare IPv6 address, without a port
+        host, port = address, ''
+    else:
+        host, _, port = address.partition(':')
+    host = host.strip()
+    if not host:
+        raise ValueError(f"Invalid radio address '{address}': no host")
+    if not port:
+        return host, DEFAULT_TCP_PORT
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Invalid port for radio '{host}': {port}")
+    return host, int(port)
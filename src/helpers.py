@@ -27,8 +27,72 @@ def pretty_print_last_heard(last_heard_timestamp: int | datetime) -> str:
         return f"{delta.seconds}s ago"
 
 
+def percentiles(samples: list[float], points=(50, 90, 99)) -> dict:
+    """
+    e.g. {"p50": ..., "p90": ..., "p99": ..., "max": ...}, or {} if there are no samples
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+    result["max"] = round(ordered[-1], 2)
+    return result
+
+
 _safe_chars = string.ascii_letters + string.digits + r" ()@\/.,-:\"'"
 
 
 def safe_encode_node_name(name):
     return ''.join(c if c in _safe_chars else urllib.parse.quote(c) for c in name)
+
+
+def _split_to_fit(text: str, max_bytes: int) -> list[str]:
+    """
+    Split one over-long line between words where possible, otherwise between characters
+    """
+    pieces = []
+    current = ''
+    for word in text.split(' '):
+        candidate = f"{current} {word}" if current else word
+        if len(candidate.encode('utf-8')) <= max_bytes:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        current = ''
+        # a single word that's still too long is cut wherever it has to be
+        for char in word:
+            if len((current + char).encode('utf-8')) > max_bytes:
+                pieces.append(current)
+                current = ''
+            current += char
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_message(message: str, max_bytes: int) -> list[str]:
+    """
+    Split a message into parts of at most max_bytes (UTF-8), breaking between lines where possible.
+    If it takes more than one part, each is prefixed with its number, e.g. "(2/3) ".
+    """
+    if len(message.encode('utf-8')) <= max_bytes:
+        return [message]
+
+    count = 2
+    while True:
+        prefix_len = len(f"({count}/{count}) ")
+        parts = []
+        current = None
+        for line in message.split('\n'):
+            for piece in _split_to_fit(line, max_bytes - prefix_len) if line else ['']:
+                candidate = piece if current is None else f"{current}\n{piece}"
+                if current is not None and len(candidate.encode('utf-8')) > max_bytes - prefix_len:
+                    parts.append(current)
+                    candidate = piece
+                current = candidate
+        parts.append(current)
+        # numbering more parts can take more room, so go round again if the count grew a digit
+        if len(str(len(parts))) <= len(str(count)):
+            return [f"({i}/{len(parts)}) {part}" for i, part in enumerate(parts, start=1)]
+        count = len(parts)
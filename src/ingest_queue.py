@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable
+
+
+class OverflowPolicy(Enum):
+    """
+    What to do with a packet that arrives when the queue is full
+    """
+    DROP_OLDEST = 'drop_oldest'  # make room by dropping the packet that's been waiting longest
+    DROP_NEWEST = 'drop_newest'  # drop the packet that just arrived
+    BLOCK = 'block'  # make the radio reader wait for room (up to block_timeout), then drop the packet that just arrived
+
+
+class _Shard:
+    def __init__(self):
+        # (handler, args, queued_at)
+        self.items: deque[tuple[Callable, tuple, float]] = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+
+
+class IngestQueue:
+    """
+    Hands received packets off the thread they arrived on to a pool of worker threads, so that slow handling
+    (file I/O, SQLite, HTTP uploads) never holds up reading from the radio.
+
+    Packets are spread over the workers by sender, so each sender's packets are still handled in the order they
+    arrived. The queue is bounded at max_size packets in all (split evenly between the workers), and what happens
+    when it's full is up to the overflow policy.
+    """
+    DROP_LOG_EVERY = 100
+
+    def __init__(self, workers: int = 2, max_size: int = 1000,
+                 overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST, block_timeout: float = 5.0):
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.shard_size = max(1, max_size // self.workers)
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.high_water = 0
+        self.max_wait = 0.0
+        self.running = False
+        self._shards = [_Shard() for _ in range(self.workers)]
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        return sum(len(shard.items) for shard in self._shards)
+
+    def start(self):
+        self.running = True
+        for i, shard in enumerate(self._shards):
+            shard.thread = threading.Thread(target=self._run, args=(shard,), name=f"ingest worker {i}", daemon=True)
+            shard.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the workers once they've handled what's already queued (or timeout seconds have passed)
+        """
+        self.running = False
+        for shard in self._shards:
+            with shard.condition:
+                shard.condition.notify_all()
+        for shard in self._shards:
+            if shard.thread:
+                shard.thread.join(timeout)
+
+    def submit(self, key, handler: Callable, *args) -> bool:
+        """
+        Queue handler(*args) to be called on a worker
+        :param key: packets with the same key (e.g. the sender's id) are handled by the same worker, in order
+        :return: False if it was dropped because the queue is full
+        """
+        shard = self._shards[hash(key) % self.workers]
+        with shard.condition:
+            if len(shard.items) >= self.shard_size:
+                if self.overflow == OverflowPolicy.BLOCK:
+                    shard.condition.wait_for(lambda: len(shard.items) < self.shard_size or not self.running,
+                                             self.block_timeout)
+                if self.overflow == OverflowPolicy.DROP_OLDEST:
+                    shard.items.popleft()
+                    self._count_drop()
+                elif len(shard.items) >= self.shard_size:
+                    self._count_drop()
+                    return False
+            shard.items.append((handler, args, time.monotonic()))
+            shard.condition.notify_all()
+
+        with self._lock:
+            self.enqueued += 1
+            self.high_water = max(self.high_water, self.depth)
+        return True
+
+    def _count_drop(self):
+        with self._lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped == 1 or dropped % self.DROP_LOG_EVERY == 0:
+            logging.warning(f"Ingest queue full ({self.max_size} packets), {dropped} packet(s) dropped so far")
+
+    def _run(self, shard: _Shard):
+        while True:
+            with shard.condition:
+                while self.running and not shard.items:
+                    shard.condition.wait()
+                if not shard.items:
+                    return
+                handler, args, queued_at = shard.items.popleft()
+                # wake a reader blocked on a full queue
+                shard.condition.notify_all()
+
+            wait = time.monotonic() - queued_at
+            try:
+                handler(*args)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logging.exception(f"Error handling packet: {e}")
+            with self._lock:
+                self.processed += 1
+                self.max_wait = max(self.max_wait, wait)
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "high_water": self.high_water,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "max_wait_secs": round(self.max_wait, 3),
+        }
@@ -1,7 +1,6 @@
 import logging
 import os
 import sys
-import time
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -21,15 +20,27 @@ logging.getLogger('mesh_interface').setLevel(logging.WARNING)
 
 # Now we can import the rest of our local files
 from src.api.StorageAPI import StorageAPIWrapper
+from src.airtime import AirtimeBudget
 from src.bot import MeshtasticBot
+from src.delivery_tracker import DeliveryTracker
+from src.duplicate_filter import DuplicateFilter
+from src.gateway import Gateway, parse_gateway_targets
+from src.ingest_queue import IngestQueue, OverflowPolicy
 from src.persistence.commands_logger import SqliteCommandLogger
+from src.pipeline import parse_stage_config
 from src.persistence.node_info import InMemoryNodeInfoStore
-from src.persistence.node_db import SqliteNodeDB
+from src.persistence.node_db import CachedNodeDB, SqliteNodeDB
+from src.persistence.outbound_queue import SqliteOutboundQueue
 from src.persistence.user_prefs import SqliteUserPrefsPersistence
+from src.proxy.metrics import MetricsServer
+from src.rate_limiter import CommandRateLimiter
 from src.tcp_proxy import TcpProxy
+from src.traceroute_manager import TracerouteManager
+from src.transmit_scheduler import TransmitScheduler
 
 # Get the IP address and admin nodes from environment variables
-MESHTASTIC_IP = os.getenv("MESHTASTIC_IP")
+# Several radios can be fronted by one bot: MESHTASTIC_IP="roof=10.0.0.5,shed=10.0.0.6"
+MESHTASTIC_IP = os.getenv("MESHTASTIC_IP") or ""
 # Safely handle missing or empty ADMIN_NODES
 admin_nodes_raw = os.getenv("ADMIN_NODES") or ""
 ADMIN_NODES = [node.strip() for node in admin_nodes_raw.split(',') if node.strip()]
@@ -42,6 +53,60 @@ STORAGE_API_2_ROOT = os.getenv("STORAGE_API_2_ROOT")
 STORAGE_API_2_TOKEN = os.getenv("STORAGE_API_2_TOKEN", None)
 STORAGE_API_2_VERSION = int(os.getenv("STORAGE_API_2_VERSION", 1))
 
+# Per-client outbound queue limits for the TCP proxy
+PROXY_CLIENT_HIGH_WATER = int(os.getenv("PROXY_CLIENT_HIGH_WATER", 256 * 1024))
+PROXY_SLOW_CLIENT_POLICY = os.getenv("PROXY_SLOW_CLIENT_POLICY", "drop")
+PROXY_MAX_CLIENT_LAG = float(os.getenv("PROXY_MAX_CLIENT_LAG", 60))
+# Local HTTP endpoint exposing proxy metrics (/metrics, /status); disabled unless a port is set
+PROXY_METRICS_PORT = int(os.getenv("PROXY_METRICS_PORT") or 0)
+PROXY_METRICS_HOST = os.getenv("PROXY_METRICS_HOST", "127.0.0.1")
+# Capture every frame to/from the radio into segment files in this directory (relative to DATA_DIR)
+PROXY_CAPTURE_DIR = os.getenv("PROXY_CAPTURE_DIR")
+# Packets that couldn't be sent while a radio was unreachable are kept on disk and sent once it's back
+OUTBOUND_QUEUE_MAX = int(os.getenv("OUTBOUND_QUEUE_MAX", 200))
+OUTBOUND_QUEUE_TTL = float(os.getenv("OUTBOUND_QUEUE_TTL", 3600))
+# Pacing for everything the bot transmits: sends per second on average, and how many may go back to back
+TX_RATE = float(os.getenv("TX_RATE", 1.0))
+TX_BURST = float(os.getenv("TX_BURST", 2))
+# Ceiling on the bot's own airtime, as a fraction of each hour (e.g. 0.1 for the EU 10% duty cycle); 0 to disable
+AIRTIME_DUTY_CYCLE = float(os.getenv("AIRTIME_DUTY_CYCLE", 0.1))
+# DMs sent with wantAck that aren't acknowledged within DELIVERY_ACK_TIMEOUT seconds are resent, up to
+# DELIVERY_MAX_ATTEMPTS times in all
+DELIVERY_ACK_TIMEOUT = float(os.getenv("DELIVERY_ACK_TIMEOUT", 60))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", 3))
+# At most TRACEROUTE_MAX_IN_FLIGHT traceroutes out on the mesh at once, each given up on after TRACEROUTE_TIMEOUT
+# seconds; a repeat !tr within TRACEROUTE_CACHE_TTL seconds is answered from the last result
+TRACEROUTE_MAX_IN_FLIGHT = int(os.getenv("TRACEROUTE_MAX_IN_FLIGHT", 2))
+TRACEROUTE_TIMEOUT = float(os.getenv("TRACEROUTE_TIMEOUT", 120))
+TRACEROUTE_CACHE_TTL = float(os.getenv("TRACEROUTE_CACHE_TTL", 600))
+# Received packets are handled by INGEST_WORKERS threads, with at most INGEST_QUEUE_MAX waiting; when it's full,
+# INGEST_OVERFLOW says what gives: drop_oldest, drop_newest, or block (the radio reader waits for room)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", 1000))
+INGEST_OVERFLOW = OverflowPolicy(os.getenv("INGEST_OVERFLOW", OverflowPolicy.DROP_OLDEST.value))
+# Per-stage settings for the packet pipeline (decode, dedupe, persist, upload, dispatch, respond), each off, sync
+# or async with a number of workers, e.g. "upload=async:4,dedupe=off"; by default only upload is async
+PIPELINE_STAGES = parse_stage_config(os.getenv("PIPELINE_STAGES", ""))
+# Copies of a packet (by sender and packet id) seen within DEDUPE_TTL seconds of the last one are dropped; at most
+# DEDUPE_MAX_ENTRIES packet ids are remembered (about 200 bytes each)
+DEDUPE_TTL = float(os.getenv("DEDUPE_TTL", 600))
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", 10000))
+# Each sender can send RATE_LIMIT_SENDER_BURST commands at once, then one every RATE_LIMIT_SENDER_INTERVAL seconds;
+# each channel RATE_LIMIT_CHANNEL_BURST public commands, then one every RATE_LIMIT_CHANNEL_INTERVAL seconds. Throttled
+# senders are told to slow down at most once every RATE_LIMIT_NOTICE_INTERVAL seconds. Set RATE_LIMIT to false to
+# answer every command
+RATE_LIMIT = os.getenv("RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_SENDER_BURST = float(os.getenv("RATE_LIMIT_SENDER_BURST", 3))
+RATE_LIMIT_SENDER_INTERVAL = float(os.getenv("RATE_LIMIT_SENDER_INTERVAL", 10))
+RATE_LIMIT_CHANNEL_BURST = float(os.getenv("RATE_LIMIT_CHANNEL_BURST", 5))
+RATE_LIMIT_CHANNEL_INTERVAL = float(os.getenv("RATE_LIMIT_CHANNEL_INTERVAL", 5))
+RATE_LIMIT_NOTICE_INTERVAL = float(os.getenv("RATE_LIMIT_NOTICE_INTERVAL", 300))
+# After connecting, nodes that are new or changed are uploaded to the storage APIs a node per request, with
+# NODE_UPLOAD_CHUNK_SIZE requests sent over each connection
+NODE_UPLOAD_CHUNK_SIZE = int(os.getenv("NODE_UPLOAD_CHUNK_SIZE", 50))
+# Attach the bot to the proxy in-process; set to false to connect it over TCP like any other client
+PROXY_ATTACH_BOT = os.getenv("PROXY_ATTACH_BOT", "true").lower() in ("1", "true", "yes")
+
 
 def main():
     # Ensure data dir exists
@@ -52,24 +117,73 @@ def main():
     command_log_file = data_dir / 'user_cmds.sqlite'
     node_db_file = data_dir / 'node_db.sqlite'
     node_info_file = data_dir / 'node_info.json'
+    outbound_queue_file = data_dir / 'outbound_queue.sqlite'
     failed_packets_dir = data_dir / 'failed_packets'
 
-    # Start the TCP Proxy
-    # It listens on 0.0.0.0:4403 and forwards to MESHTASTIC_IP:4403
-    proxy = TcpProxy(target_host=MESHTASTIC_IP, target_port=4403, listen_host='0.0.0.0', listen_port=4403)
-    proxy.start()
-    
-    # Give the proxy a moment to bind to the port before the bot tries to connect
-    time.sleep(2)
+    # Start a TCP Proxy per radio
+    # The first listens on 0.0.0.0:4403 and forwards to its radio on port 4403, the next on 4404, and so on
+    targets = parse_gateway_targets(MESHTASTIC_IP)
+    if not targets:
+        raise ValueError("MESHTASTIC_IP isn't set: give the address of at least one radio, "
+                         "e.g. MESHTASTIC_IP=10.0.0.5 or MESHTASTIC_IP=roof=10.0.0.5,shed=10.0.0.6:4404")
+    gateways = []
+    for i, (name, host, port) in enumerate(targets):
+        capture_dir = None
+        if PROXY_CAPTURE_DIR:
+            capture_dir = data_dir / PROXY_CAPTURE_DIR / name if len(targets) > 1 else data_dir / PROXY_CAPTURE_DIR
+        proxy = TcpProxy(target_host=host, target_port=port, listen_host='0.0.0.0', listen_port=4403 + i,
+                         client_high_water=PROXY_CLIENT_HIGH_WATER,
+                         slow_client_policy=PROXY_SLOW_CLIENT_POLICY,
+                         max_client_lag=PROXY_MAX_CLIENT_LAG,
+                         capture_dir=str(capture_dir) if capture_dir else None)
+        proxy.start()
+        gateway = Gateway(name, 'localhost', proxy.listen_port, proxy=proxy, attach_to_proxy=PROXY_ATTACH_BOT)
+        gateway.packet_queue = SqliteOutboundQueue(str(outbound_queue_file), name,
+                                                   max_packets=OUTBOUND_QUEUE_MAX, ttl=OUTBOUND_QUEUE_TTL)
+        gateways.append(gateway)
+
+    metrics_server = None
+    if PROXY_METRICS_PORT:
+        proxies = {gateway.name: gateway.proxy for gateway in gateways}
+        metrics_server = MetricsServer(proxies if len(proxies) > 1 else gateways[0].proxy,
+                                       PROXY_METRICS_HOST, PROXY_METRICS_PORT)
+        metrics_server.start()
 
-    # Connect to the Meshtastic node via the LOCAL PROXY
-    # We use 'localhost' because the proxy is running in this same container/process
+    # Connect to the Meshtastic nodes via the LOCAL PROXIES
+    # Either directly in-process, or over 'localhost' because the proxy is running in this same container/process
     bot = MeshtasticBot('localhost')
-    bot.proxy = proxy
+    bot.gateways = gateways
+    bot.proxy = gateways[0].proxy
+    bot.attach_to_proxy = PROXY_ATTACH_BOT
+    for gateway in gateways:
+        if not PROXY_ATTACH_BOT and not gateway.proxy.wait_until_listening(timeout=10):
+            logging.error(f"TCP proxy for '{gateway.name}' failed to start listening")
     bot.admin_nodes = ADMIN_NODES
+    if AIRTIME_DUTY_CYCLE:
+        bot.airtime_budget = AirtimeBudget(duty_cycle=AIRTIME_DUTY_CYCLE)
+    bot.transmit_scheduler = TransmitScheduler(rate=TX_RATE, burst=TX_BURST, budget=bot.airtime_budget)
+    bot.transmit_scheduler.start()
+    bot.delivery_tracker = DeliveryTracker(ack_timeout=DELIVERY_ACK_TIMEOUT, max_attempts=DELIVERY_MAX_ATTEMPTS)
+    bot.delivery_tracker.start()
+    bot.traceroutes = TracerouteManager(request_ttl=TRACEROUTE_TIMEOUT, max_in_flight=TRACEROUTE_MAX_IN_FLIGHT,
+                                        cache_ttl=TRACEROUTE_CACHE_TTL)
+    bot.ingest_queue = IngestQueue(workers=INGEST_WORKERS, max_size=INGEST_QUEUE_MAX, overflow=INGEST_OVERFLOW)
+    bot.ingest_queue.start()
+    bot.duplicate_filter = DuplicateFilter(ttl=DEDUPE_TTL, max_entries=DEDUPE_MAX_ENTRIES)
+    bot.node_upload_chunk_size = NODE_UPLOAD_CHUNK_SIZE
+    if RATE_LIMIT:
+        bot.rate_limiter = CommandRateLimiter(sender_rate=1 / RATE_LIMIT_SENDER_INTERVAL,
+                                              sender_burst=RATE_LIMIT_SENDER_BURST,
+                                              channel_rate=1 / RATE_LIMIT_CHANNEL_INTERVAL,
+                                              channel_burst=RATE_LIMIT_CHANNEL_BURST,
+                                              cooldown_notice_interval=RATE_LIMIT_NOTICE_INTERVAL)
+    bot.pipeline = bot.build_pipeline(PIPELINE_STAGES)
+    bot.pipeline.start()
+    if metrics_server:
+        metrics_server.bot_metrics = bot.get_metrics
     bot.user_prefs_persistence = SqliteUserPrefsPersistence(str(user_prefs_file))
     bot.command_logger = SqliteCommandLogger(str(command_log_file))
-    bot.node_db = SqliteNodeDB(str(node_db_file))
+    bot.node_db = CachedNodeDB(SqliteNodeDB(str(node_db_file)))
     node_info = InMemoryNodeInfoStore()
     bot.node_info = node_info
     if STORAGE_API_ROOT:
@@ -85,8 +199,14 @@ def main():
     except Exception as e:
         logging.error(f"Error: {e}")
     finally:
+        bot.ingest_queue.stop()
+        bot.pipeline.stop()
+        bot.transmit_scheduler.stop()
+        bot.delivery_tracker.stop()
         bot.disconnect()
         node_info.persist_to_file(str(node_info_file))
+        if metrics_server:
+            metrics_server.stop()
 
 
 if __name__ == "__main__":
@@ -4,13 +4,14 @@ from datetime import datetime, timezone
 
 import pandas as pd
 
+from src.commands.parsed_command import ParsedCommand
 from src.persistence import BaseSqlitePersistenceStore
 
 
 class AbstractCommandLogger(abc.ABC):
 
     @abc.abstractmethod
-    def log_command(self, sender_id: str, command_instance, message: str) -> None:
+    def log_command(self, sender_id: str, command_instance, message: ParsedCommand | str) -> None:
         pass
 
     @abc.abstractmethod
@@ -21,6 +22,10 @@ class AbstractCommandLogger(abc.ABC):
     def log_responder_handled(self, sender_id: str, responder_instance, message_text: str) -> None:
         pass
 
+    @abc.abstractmethod
+    def log_throttled_request(self, sender_id: str, message: str, scope: str, channel: int = None) -> None:
+        pass
+
     @abc.abstractmethod
     def get_command_history(self, since: datetime, sender_id: str = None) -> pd.DataFrame:
         pass
@@ -33,6 +38,10 @@ class AbstractCommandLogger(abc.ABC):
     def get_responder_history(self, since: datetime, sender_id: str = None) -> pd.DataFrame:
         pass
 
+    @abc.abstractmethod
+    def get_throttled_history(self, since: datetime, sender_id: str = None) -> pd.DataFrame:
+        pass
+
 
 class SqliteCommandLogger(AbstractCommandLogger, BaseSqlitePersistenceStore):
 
@@ -64,9 +73,18 @@ class SqliteCommandLogger(AbstractCommandLogger, BaseSqlitePersistenceStore):
                     responder_class TEXT
                 )
             ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS throttled_requests (
+                    sender_id TEXT,
+                    message TEXT,
+                    scope TEXT,
+                    channel INTEGER,
+                    timestamp TEXT
+                )
+            ''')
             conn.commit()
 
-    def log_command(self, sender_id: str, command_instance, message: str) -> None:
+    def log_command(self, sender_id: str, command_instance, message: ParsedCommand | str) -> None:
         base_cmd, subcommands, args = command_instance.get_command_for_logging(message)
         subcommands_str = ' '.join(subcommands) if subcommands else None
 
@@ -97,6 +115,15 @@ class SqliteCommandLogger(AbstractCommandLogger, BaseSqlitePersistenceStore):
             ''', (sender_id, message, datetime.now(timezone.utc).isoformat()))
             conn.commit()
 
+    def log_throttled_request(self, sender_id: str, message: str, scope: str, channel: int = None) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO throttled_requests (sender_id, message, scope, channel, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (sender_id, message, scope, channel, datetime.now(timezone.utc).isoformat()))
+            conn.commit()
+
     def get_command_history(self, since: datetime, sender_id: str = None) -> pd.DataFrame:
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -145,3 +172,18 @@ class SqliteCommandLogger(AbstractCommandLogger, BaseSqlitePersistenceStore):
             rows = cursor.fetchall()
             return pd.DataFrame(rows, columns=['sender_id', 'responder_class', 'timestamp'])
 
+    def get_throttled_history(self, since: datetime, sender_id: str = None) -> pd.DataFrame:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if sender_id:
+                cursor.execute('''
+                    SELECT sender_id, scope, channel, timestamp FROM throttled_requests
+                    WHERE sender_id = ? AND timestamp >= ?
+                ''', (sender_id, since.isoformat()))
+            else:
+                cursor.execute('''
+                    SELECT sender_id, scope, channel, timestamp FROM throttled_requests
+                    WHERE timestamp >= ?
+                ''', (since.isoformat(),))
+            rows = cursor.fetchall()
+            return pd.DataFrame(rows, columns=['sender_id', 'scope', 'channel', 'timestamp'])
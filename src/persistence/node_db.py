@@ -1,4 +1,5 @@
 import abc
+import threading
 from datetime import datetime
 import sqlite3
 
@@ -15,6 +16,13 @@ class AbstractNodeDB(abc.ABC):
         if hasattr(node, 'device_metrics') and node.device_metrics:
             self.store_device_metrics(node.user.id, node.device_metrics)
 
+    def store_nodes(self, nodes: list[MeshNode]):
+        """
+        Store many nodes at once, e.g. the radio's whole NodeDB when connecting
+        """
+        for node in nodes:
+            self.store_node(node)
+
     @abc.abstractmethod
     def get_by_id(self, node_id: str) -> MeshNode.User | None:
         pass
@@ -165,6 +173,33 @@ class SqliteNodeDB(BaseSqlitePersistenceStore, AbstractNodeDB):
                   node_user.public_key))
             conn.commit()
 
+    def store_nodes(self, nodes: list[MeshNode]):
+        """
+        Store many nodes in one transaction
+        """
+        users = [node.user for node in nodes]
+        positions = [(node.user.id, node.position) for node in nodes if getattr(node, 'position', None)]
+        device_metrics = [(node.user.id, node.device_metrics) for node in nodes
+                          if getattr(node, 'device_metrics', None)]
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO nodes (id, short_name, long_name, macaddr, hw_model, public_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(user.id, user.short_name, user.long_name, user.macaddr, user.hw_model, user.public_key)
+                  for user in users])
+            cursor.executemany('''
+                INSERT INTO positions (node_id, logged_time, reported_time, latitude, longitude, altitude, location_source)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(node_id, position.logged_time, position.reported_time, position.latitude, position.longitude,
+                   position.altitude, position.location_source) for node_id, position in positions])
+            cursor.executemany('''
+                INSERT INTO device_metrics (node_id, logged_time, battery_level, voltage, channel_utilization, air_util_tx, uptime_seconds)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(node_id, metrics.logged_time, metrics.battery_level, metrics.voltage, metrics.channel_utilization,
+                   metrics.air_util_tx, metrics.uptime_seconds) for node_id, metrics in device_metrics])
+            conn.commit()
+
     def store_position(self, node_id: str, position: MeshNode.Position):
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -276,3 +311,112 @@ class SqliteNodeDB(BaseSqlitePersistenceStore, AbstractNodeDB):
             return [MeshNode.DeviceMetrics(logged_time=row[0], battery_level=row[1], voltage=row[2],
                                            channel_utilization=row[3], air_util_tx=row[4], uptime_seconds=row[5]) for
                     row in rows]
+
+
+class CachedNodeDB(AbstractNodeDB):
+    """
+    Keeps every node's user in memory, by id and by short name, in front of another node DB (e.g. SqliteNodeDB),
+    so looking a node up is a dict lookup rather than a query.
+
+    All users are loaded when it's created, and kept up to date by store_user, so it must be the only thing
+    writing users to the underlying DB. Ids that aren't found are remembered too (until they're stored), as
+    packets from nodes we haven't had user info for are common. Positions and device metrics go straight through.
+    """
+    MAX_UNKNOWN_IDS = 10000
+
+    def __init__(self, db: AbstractNodeDB):
+        self.db = db
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._by_id: dict[str, MeshNode.User] = {node.id: node for node in db.list_nodes()}
+        # lower-cased short name -> id
+        self._by_short_name: dict[str, str] = {}
+        for node in self._by_id.values():
+            self._by_short_name.setdefault(node.short_name.lower(), node.id)
+        self._unknown_ids: set[str] = set()
+
+    def store_user(self, node_user: MeshNode.User):
+        self.db.store_user(node_user)
+        with self._lock:
+            self._remember(node_user)
+
+    def store_nodes(self, nodes: list[MeshNode]):
+        self.db.store_nodes(nodes)
+        with self._lock:
+            for node in nodes:
+                self._remember(node.user)
+
+    def _remember(self, node_user: MeshNode.User):
+        previous = self._by_id.get(node_user.id)
+        if previous and self._by_short_name.get(previous.short_name.lower()) == node_user.id:
+            del self._by_short_name[previous.short_name.lower()]
+        self._by_id[node_user.id] = node_user
+        self._by_short_name.setdefault(node_user.short_name.lower(), node_user.id)
+        self._unknown_ids.discard(node_user.id)
+
+    def get_by_id(self, node_id: str) -> MeshNode.User | None:
+        with self._lock:
+            node = self._by_id.get(node_id)
+            if node is not None or node_id in self._unknown_ids:
+                self.hits += 1
+                return node
+            self.misses += 1
+
+        # not seen before: it could have been written to the DB some other way
+        node = self.db.get_by_id(node_id)
+        with self._lock:
+            if node is not None:
+                self._by_id[node_id] = node
+                self._by_short_name.setdefault(node.short_name.lower(), node_id)
+            else:
+                if len(self._unknown_ids) >= self.MAX_UNKNOWN_IDS:
+                    self._unknown_ids.clear()
+                self._unknown_ids.add(node_id)
+        return node
+
+    def get_by_short_name(self, short_name: str) -> MeshNode.User | None:
+        key = short_name.lower()
+        with self._lock:
+            node_id = self._by_short_name.get(key)
+            if node_id is None:
+                # the node it pointed to was renamed, but another may have the same short name
+                node_id = next((node.id for node in self._by_id.values() if node.short_name.lower() == key), None)
+                if node_id is not None:
+                    self._by_short_name[key] = node_id
+            if node_id is not None:
+                self.hits += 1
+                return self._by_id[node_id]
+            self.misses += 1
+            return None
+
+    def list_nodes(self) -> list[MeshNode.User]:
+        with self._lock:
+            return list(self._by_id.values())
+
+    def store_position(self, node_id: str, position: MeshNode.Position):
+        self.db.store_position(node_id, position)
+
+    def get_last_position(self, node_id: str) -> MeshNode.Position | None:
+        return self.db.get_last_position(node_id)
+
+    def get_position_log(self, node_id: str, start: datetime, end: datetime) -> list[MeshNode.Position]:
+        return self.db.get_position_log(node_id, start, end)
+
+    def store_device_metrics(self, node_id: str, device_metrics: MeshNode.DeviceMetrics):
+        self.db.store_device_metrics(node_id, device_metrics)
+
+    def get_last_device_metrics(self, node_id: str) -> MeshNode.DeviceMetrics | None:
+        return self.db.get_last_device_metrics(node_id)
+
+    def get_device_metrics_log(self, node_id: str, start: datetime, end: datetime) -> list[MeshNode.DeviceMetrics]:
+        return self.db.get_device_metrics_log(node_id, start, end)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "nodes": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_percent": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+        }
@@ -0,0 +1,217 @@
+import abc
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from meshtastic.protobuf import mesh_pb2
+
+from src.persistence import BaseSqlitePersistenceStore
+
+
+@dataclass
+class QueuedPacket:
+    entry_id: int
+    packet: mesh_pb2.MeshPacket
+    destination_id: Union[int, str]
+    want_ack: bool
+    hop_limit: Optional[int]
+    pki_encrypted: Optional[bool]
+    public_key: Optional[bytes]
+    queued_at: float
+    expires_at: float
+
+
+def dedupe_key(packet: mesh_pb2.MeshPacket, destination_id: Union[int, str]) -> str:
+    """
+    Packets with the same destination, channel and content are the same message, whatever their packet id
+    """
+    digest = hashlib.sha1(json.dumps(destination_id).encode())
+    digest.update(packet.channel.to_bytes(4, 'big'))
+    digest.update(packet.decoded.SerializeToString(deterministic=True))
+    return digest.hexdigest()
+
+
+class AbstractOutboundQueue(abc.ABC):
+    """
+    Packets that couldn't be sent because the radio connection was down, waiting to be sent once it's back.
+
+    The queue is bounded (the oldest packet is dropped to make room), packets expire after their TTL, and a
+    packet identical to one already queued is not queued again. Packets come back out in the order they
+    were queued; a packet is only removed once it has been sent.
+    """
+    DEFAULT_MAX_PACKETS = 200
+    DEFAULT_TTL = 60 * 60
+
+    def __init__(self, max_packets: int = DEFAULT_MAX_PACKETS, ttl: float = DEFAULT_TTL):
+        self.max_packets = max_packets
+        self.ttl = ttl
+
+    @abc.abstractmethod
+    def put(self, packet: mesh_pb2.MeshPacket, destination_id: Union[int, str], want_ack: bool = False,
+            hop_limit: Optional[int] = None, pki_encrypted: Optional[bool] = False,
+            public_key: Optional[bytes] = None, ttl: float = None) -> bool:
+        """
+        :return: False if an identical packet was already queued
+        """
+        pass
+
+    @abc.abstractmethod
+    def peek(self) -> QueuedPacket | None:
+        """
+        The oldest packet that hasn't expired, without removing it
+        """
+        pass
+
+    @abc.abstractmethod
+    def remove(self, entry_id: int) -> None:
+        pass
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def empty(self) -> bool:
+        return len(self) == 0
+
+
+class InMemoryOutboundQueue(AbstractOutboundQueue):
+    def __init__(self, max_packets: int = AbstractOutboundQueue.DEFAULT_MAX_PACKETS,
+                 ttl: float = AbstractOutboundQueue.DEFAULT_TTL):
+        super().__init__(max_packets, ttl)
+        # dedupe key -> QueuedPacket, oldest first
+        self._entries: OrderedDict[str, QueuedPacket] = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def put(self, packet, destination_id, want_ack=False, hop_limit=None, pki_encrypted=False, public_key=None,
+            ttl=None) -> bool:
+        key = dedupe_key(packet, destination_id)
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                return False
+            while len(self._entries) >= self.max_packets:
+                _, dropped = self._entries.popitem(last=False)
+                logging.warning(f"Outbound queue full, dropped packet to {dropped.destination_id}")
+            self._entries[key] = QueuedPacket(self._next_id, packet, destination_id, want_ack, hop_limit,
+                                              pki_encrypted, public_key, now, now + (ttl or self.ttl))
+            self._next_id += 1
+        return True
+
+    def peek(self) -> QueuedPacket | None:
+        now = time.time()
+        with self._lock:
+            while self._entries:
+                key, entry = next(iter(self._entries.items()))
+                if entry.expires_at > now:
+                    return entry
+                del self._entries[key]
+                logging.info(f"Outbound packet to {entry.destination_id} expired before it could be sent")
+        return None
+
+    def remove(self, entry_id: int) -> None:
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.entry_id == entry_id:
+                    del self._entries[key]
+                    return
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteOutboundQueue(AbstractOutboundQueue, BaseSqlitePersistenceStore):
+    """
+    An outbound queue that survives restarts. Several queues (e.g. one per gateway) can share a database.
+    """
+
+    def __init__(self, db_path: str, name: str = 'default',
+                 max_packets: int = AbstractOutboundQueue.DEFAULT_MAX_PACKETS,
+                 ttl: float = AbstractOutboundQueue.DEFAULT_TTL):
+        AbstractOutboundQueue.__init__(self, max_packets, ttl)
+        self.name = name
+        BaseSqlitePersistenceStore.__init__(self, db_path)
+
+    def _initialize_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS outbound_queue (
+                    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    queue TEXT NOT NULL,
+                    dedupe_key TEXT NOT NULL,
+                    packet BLOB NOT NULL,
+                    send_args TEXT NOT NULL,
+                    public_key BLOB,
+                    queued_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    UNIQUE (queue, dedupe_key)
+                )
+            ''')
+            conn.commit()
+
+    def put(self, packet, destination_id, want_ack=False, hop_limit=None, pki_encrypted=False, public_key=None,
+            ttl=None) -> bool:
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR IGNORE INTO outbound_queue
+                    (queue, dedupe_key, packet, send_args, public_key, queued_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (self.name, dedupe_key(packet, destination_id), packet.SerializeToString(),
+                  json.dumps([destination_id, want_ack, hop_limit, pki_encrypted]), public_key,
+                  now, now + (ttl or self.ttl)))
+            if cursor.rowcount == 0:
+                return False
+
+            cursor.execute('''
+                DELETE FROM outbound_queue WHERE entry_id IN (
+                    SELECT entry_id FROM outbound_queue WHERE queue = ?
+                    ORDER BY entry_id DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.name, self.max_packets))
+            if cursor.rowcount:
+                logging.warning(f"Outbound queue full, dropped {cursor.rowcount} oldest packet(s)")
+            conn.commit()
+        return True
+
+    def peek(self) -> QueuedPacket | None:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM outbound_queue WHERE queue = ? AND expires_at <= ?',
+                           (self.name, time.time()))
+            if cursor.rowcount:
+                logging.info(f"{cursor.rowcount} outbound packet(s) expired before they could be sent")
+            conn.commit()
+            cursor.execute('''
+                SELECT entry_id, packet, send_args, public_key, queued_at, expires_at
+                FROM outbound_queue WHERE queue = ?
+                ORDER BY entry_id LIMIT 1
+            ''', (self.name,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        entry_id, packet_bytes, send_args, public_key, queued_at, expires_at = row
+        destination_id, want_ack, hop_limit, pki_encrypted = json.loads(send_args)
+        return QueuedPacket(entry_id, mesh_pb2.MeshPacket.FromString(packet_bytes), destination_id, want_ack,
+                            hop_limit, pki_encrypted, public_key, queued_at, expires_at)
+
+    def remove(self, entry_id: int) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM outbound_queue WHERE entry_id = ?', (entry_id,))
+            conn.commit()
+
+    def __len__(self) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM outbound_queue WHERE queue = ?', (self.name,))
+            return cursor.fetchone()[0]
@@ -0,0 +1,199 @@
+import bisect
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.ingest_queue import IngestQueue
+
+
+class LatencyHistogram:
+    """
+    Counts of durations in fixed buckets (as a Prometheus histogram), from which percentiles are estimated
+    """
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        # one more than BUCKETS, for anything over the last bound
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, secs: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS, secs)] += 1
+            self.count += 1
+            self.sum += secs
+            self.max = max(self.max, secs)
+
+    def percentile(self, percent: float) -> float:
+        """
+        The upper bound of the bucket the percentile falls in (or the max, if that's lower)
+        """
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.BUCKETS[i], self.max) if i < len(self.BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum_secs": round(self.sum, 4),
+            "max_ms": round(self.max * 1000, 2),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p90_ms": round(self.percentile(90) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "buckets": buckets,
+        }
+
+
+@dataclass
+class StageConfig:
+    enabled: bool = True
+    # run on the stage's own workers, without the stages after it waiting for it
+    run_async: bool = False
+    workers: int = 1
+    max_queue: int = 1000
+
+
+def parse_stage_config(spec: str) -> dict[str, StageConfig]:
+    """
+    Parse stage settings, e.g. "upload=async:4,dedupe=off,respond=sync": each stage can be off, sync, or
+    async with an optional number of workers
+    """
+    config = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, setting = entry.partition('=')
+        mode, _, workers = setting.strip().lower().partition(':')
+        if mode not in ('off', 'sync', 'async'):
+            raise ValueError(f"Unknown setting for pipeline stage '{name}': {setting}")
+        config[name.strip()] = StageConfig(enabled=mode != 'off', run_async=mode == 'async',
+                                           workers=int(workers) if workers else 1)
+    return config
+
+
+@dataclass
+class PacketContext:
+    """
+    Something received (a packet, or a node update), and what the stages have worked out about it so far
+    """
+    kind: str
+    packet: dict
+    interface: object = None
+    key: str | None = None
+    data: dict = field(default_factory=dict)
+
+
+class Stage:
+    def __init__(self, name: str, handlers: dict[str, Callable[[PacketContext], bool | None]],
+                 config: StageConfig, required: bool = False):
+        """
+        :param handlers: kind of thing received -> handler; a handler returning False stops the pipeline there
+        :param required: if the handler fails, stop the pipeline rather than carrying on with the next stage
+        """
+        self.name = name
+        self.handlers = handlers
+        self.config = config
+        self.required = required
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.stopped = 0
+        self.queue = IngestQueue(workers=config.workers, max_size=config.max_queue) if config.run_async else None
+
+    def run(self, ctx: PacketContext) -> bool:
+        """
+        :return: whether the pipeline carries on after this stage
+        """
+        handler = self.handlers.get(ctx.kind)
+        if handler is None:
+            return True
+        start = time.perf_counter()
+        try:
+            carry_on = handler(ctx) is not False
+        except Exception as e:
+            self.errors += 1
+            logging.exception(f"Error in pipeline stage '{self.name}': {e}")
+            carry_on = not self.required
+        self.latency.record(time.perf_counter() - start)
+        if not carry_on:
+            self.stopped += 1
+        return carry_on
+
+    def metrics(self) -> dict:
+        metrics = {
+            "enabled": int(self.config.enabled),
+            "errors": self.errors,
+            "stopped": self.stopped,
+            "latency": self.latency.as_dict(),
+        }
+        if self.queue:
+            metrics["queue"] = self.queue.metrics()
+        return metrics
+
+
+class Pipeline:
+    """
+    Everything received goes through the same stages in order, each timed on its own: e.g. decode, dedupe,
+    persist, upload, dispatch, respond.
+
+    Each stage can be turned off, and can run sync (the next stage waits for it) or async (it's handed to the
+    stage's own workers, and the next stage goes ahead without waiting, so it can't stop the pipeline). Async
+    stages only run on their workers once the pipeline has been started.
+    """
+
+    def __init__(self, config: dict[str, StageConfig] = None):
+        self.config = config or {}
+        self.stages: list[Stage] = []
+        self.running = False
+
+    def add_stage(self, name: str, handlers: dict[str, Callable[[PacketContext], bool | None]],
+                  default: StageConfig = None, required: bool = False) -> Stage:
+        """
+        :param default: the stage's settings unless they're configured otherwise
+        """
+        stage = Stage(name, handlers, self.config.get(name, default or StageConfig()), required)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        self.running = True
+        for stage in self.stages:
+            if stage.queue:
+                stage.queue.start()
+
+    def stop(self):
+        self.running = False
+        for stage in self.stages:
+            if stage.queue:
+                stage.queue.stop()
+
+    def process(self, kind: str, packet: dict, interface=None, key: str = None) -> PacketContext:
+        """
+        Run something received through the stages
+        :param key: things with the same key (e.g. the sender) go through an async stage in order
+        """
+        ctx = PacketContext(kind, packet, interface, key)
+        for stage in self.stages:
+            if not stage.config.enabled:
+                continue
+            if stage.queue and self.running:
+                stage.queue.submit(key, stage.run, ctx)
+            elif not stage.run(ctx):
+                break
+        return ctx
+
+    def metrics(self) -> dict:
+        return {stage.name: stage.metrics() for stage in self.stages}
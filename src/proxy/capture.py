@@ -0,0 +1,175 @@
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Capture segment file layout: MAGIC, then one record per frame of
+#   wall clock timestamp (float64, big endian), direction (uint8), frame (header included, so self-delimiting)
+MAGIC = b'MTCAP\x01\n'
+RECORD_HEADER = struct.Struct('>dB')
+FRAME_HEADER_LEN = 4
+FROM_RADIO = 0
+TO_RADIO = 1
+SEGMENT_SUFFIX = '.mtcap'
+
+
+class CaptureWriter:
+    """
+    Append radio frames to timestamped, append-only capture segments in a directory.
+
+    A new segment is started when the current one reaches segment_bytes. Writes are buffered, so whoever owns
+    the writer should call flush() now and then (BackgroundCaptureWriter does, about once a second).
+    """
+    DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, directory: str | os.PathLike, segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.frames_written = 0
+        self.failed = False
+        self._file = None
+        self._segment_size = 0
+
+    @property
+    def segment_path(self) -> Path | None:
+        return Path(self._file.name) if self._file else None
+
+    def write(self, direction: int, frame, timestamp: float = None) -> None:
+        if self.failed:
+            return
+        record = RECORD_HEADER.pack(time.time() if timestamp is None else timestamp, direction)
+        try:
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._start_segment()
+            self._file.write(record)
+            self._file.write(frame)
+        except OSError as e:
+            # never let a full disk take the proxy down with it
+            logging.error(f"Radio capture stopped: {e}")
+            self.failed = True
+            return
+        self._segment_size += len(record) + len(frame)
+        self.frames_written += 1
+
+    def _start_segment(self):
+        self.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = datetime.now().strftime('radio-%Y%m%d-%H%M%S-%f') + SEGMENT_SUFFIX
+        self._file = open(self.directory / name, 'ab')
+        self._file.write(MAGIC)
+        self._segment_size = len(MAGIC)
+        logging.info(f"Capturing radio traffic to {self._file.name}")
+
+    def flush(self) -> None:
+        if self._file:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class BackgroundCaptureWriter:
+    """
+    Writes capture records on a thread of its own, so a slow disk never holds up the proxy's selector loop.
+
+    Frames are copied when they're queued, since the proxy hands over views into buffers it reuses. At most
+    max_queued records wait to be written: if the disk can't keep up, new records are dropped (and counted)
+    rather than letting the backlog grow.
+    """
+    FLUSH_INTERVAL = 1.0
+    DROP_LOG_EVERY = 1000
+
+    def __init__(self, writer: CaptureWriter, max_queued: int = 10000):
+        self.writer = writer
+        self.dropped = 0
+        self._queue: queue.Queue[tuple[float, int, bytes] | None] = queue.Queue(max_queued)
+        self._thread = threading.Thread(target=self._run, name="radio capture", daemon=True)
+        self._thread.start()
+
+    @property
+    def frames_written(self) -> int:
+        return self.writer.frames_written
+
+    def write(self, direction: int, frame, timestamp: float = None) -> None:
+        if self.writer.failed or self._thread is None:
+            return
+        try:
+            self._queue.put_nowait((time.time() if timestamp is None else timestamp, direction, bytes(frame)))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % self.DROP_LOG_EVERY == 1:
+                logging.warning(f"Radio capture can't keep up, {self.dropped} frame(s) dropped so far")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Write out whatever is still queued (for up to timeout seconds), then close the capture
+        """
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                record = ()
+            if record is None:
+                break
+            if record:
+                timestamp, direction, frame = record
+                self.writer.write(direction, frame, timestamp)
+            if time.monotonic() - last_flush >= self.FLUSH_INTERVAL:
+                self._flush()
+                last_flush = time.monotonic()
+        self._flush()
+        self.writer.close()
+
+    def _flush(self):
+        try:
+            self.writer.flush()
+        except OSError as e:
+            logging.error(f"Error writing radio capture: {e}")
+
+
+def capture_segments(path: str | os.PathLike) -> list[Path]:
+    """
+    The segment files making up a capture, oldest first: either a single segment or a directory of them
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.glob(f'*{SEGMENT_SUFFIX}'))
+    return [path]
+
+
+def read_capture(path: str | os.PathLike):
+    """
+    Read back a capture
+    :return: an iterator of (timestamp, direction, frame)
+    """
+    for segment in capture_segments(path):
+        with open(segment, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            logging.warning(f"Skipping {segment}: not a capture segment")
+            continue
+
+        pos = len(MAGIC)
+        end = len(data)
+        while pos + RECORD_HEADER.size + FRAME_HEADER_LEN <= end:
+            timestamp, direction = RECORD_HEADER.unpack_from(data, pos)
+            frame_start = pos + RECORD_HEADER.size
+            frame_end = frame_start + FRAME_HEADER_LEN + ((data[frame_start + 2] << 8) | data[frame_start + 3])
+            if frame_end > end:
+                break  # the last record was cut short, e.g. the proxy was killed mid-write
+            yield timestamp, direction, data[frame_start:frame_end]
+            pos = frame_end
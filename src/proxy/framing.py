@@ -0,0 +1,157 @@
+"""
+Meshtastic stream framing, as used on the serial and TCP links to a radio.
+
+Every FromRadio / ToRadio protobuf is sent as a frame: the two magic bytes 0x94 0xC3, a big-endian 16-bit
+payload length, then the payload. Anything between frames (the radio's debug log output, the 0xC3 wake-up
+bytes clients send when they connect) is not part of a frame and is skipped.
+"""
+
+START1 = 0x94
+START2 = 0xC3
+HEADER_LEN = 4
+MAX_TO_FROM_RADIO_SIZE = 512
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """
+    Wrap a serialised protobuf in a frame header
+    """
+    length = len(payload)
+    if length > MAX_TO_FROM_RADIO_SIZE:
+        raise ValueError(f"Frame payload of {length} bytes exceeds the {MAX_TO_FROM_RADIO_SIZE} byte maximum")
+    return bytes((START1, START2, (length >> 8) & 0xFF, length & 0xFF)) + payload
+
+
+def frame_payload(frame) -> bytes:
+    """
+    Strip the header from a complete frame
+    """
+    return frame[HEADER_LEN:]
+
+
+class FrameParser:
+    """
+    Incrementally split a byte stream into complete frames (header included).
+
+    Data is received straight into a preallocated block with recv_into (or copied in with feed), and each frame
+    comes back as a memoryview slice of that block, so nothing is copied between the socket and whoever sends
+    the frame on. When the block runs out of room a new one is started and any trailing partial frame (at most
+    one frame's worth) is carried over; the old block is freed once nothing references its frames any more.
+
+    Anything that needs to keep a frame for longer than the next write should take a bytes() copy of it.
+
+    Bytes that can't be part of a frame are skipped, in the same way the meshtastic library resyncs its own reader.
+    """
+    DEFAULT_BLOCK_SIZE = 256 * 1024
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._block = bytearray(block_size)
+        self._view = memoryview(self._block)
+        self._start = 0  # start of data not yet parsed into frames
+        self._end = 0  # end of data received into the block
+        self.frames_parsed = 0
+        self.bytes_skipped = 0
+
+    def reset(self) -> None:
+        """
+        Throw away any partial frame, e.g. after the underlying connection is replaced
+        """
+        self._start = self._end
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._end - self._start
+
+    def _reserve(self, size: int) -> None:
+        """
+        Make sure there's room for size more bytes after the pending data
+        """
+        if self.block_size - self._end >= size:
+            return
+        pending = self._end - self._start
+        block = bytearray(max(self.block_size, pending + size))
+        block[:pending] = self._view[self._start:self._end]
+        self._block = block
+        self._view = memoryview(block)
+        self._start = 0
+        self._end = pending
+
+    def recv_into(self, sock, size: int) -> int:
+        """
+        Receive up to size bytes from a socket into the buffer
+        :return: the number of bytes received (0 means the peer closed the connection)
+        """
+        self._reserve(size)
+        received = sock.recv_into(self._view[self._end:self._end + size], size)
+        self._end += received
+        return received
+
+    def feed(self, data) -> list[memoryview]:
+        """
+        Add already-received data and return the frames it completes
+        """
+        self._reserve(len(data))
+        self._view[self._end:self._end + len(data)] = data
+        self._end += len(data)
+        return self.frames()
+
+    def frames(self) -> list[memoryview]:
+        """
+        Return all complete frames received so far
+        """
+        view = self._view
+        return [view[start:end] for start, end in self.frame_spans()]
+
+    def view(self, start: int, end: int) -> memoryview:
+        """
+        A slice of the current receive block, for offsets returned by frame_spans
+        """
+        return self._view[start:end]
+
+    def frame_spans(self) -> list[tuple[int, int]]:
+        """
+        Return the (start, end) offsets, within the current block, of all complete frames received so far.
+        Adjacent frames can be sent on as a single slice.
+        """
+        buf = self._block
+        frames = []
+        pos = self._start
+        end = self._end
+
+        while pos < end:
+            start = buf.find(START1, pos, end)
+            if start < 0:
+                self.bytes_skipped += end - pos
+                pos = end
+                break
+            self.bytes_skipped += start - pos
+            pos = start
+
+            if end - pos < 2:
+                break  # wait for START2
+            if buf[pos + 1] != START2:
+                self.bytes_skipped += 1
+                pos += 1
+                continue
+
+            if end - pos < HEADER_LEN:
+                break  # wait for the length
+            length = (buf[pos + 2] << 8) | buf[pos + 3]
+            if length > MAX_TO_FROM_RADIO_SIZE:
+                # not a real header, resync from the next byte
+                self.bytes_skipped += 1
+                pos += 1
+                continue
+
+            frame_end = pos + HEADER_LEN + length
+            if frame_end > end:
+                break  # wait for the rest of the payload
+
+            frames.append((pos, frame_end))
+            pos = frame_end
+
+        # NB: never rewind within a block - the frames handed out may still be queued for sending
+        self._start = pos
+        self.frames_parsed += len(frames)
+        return frames
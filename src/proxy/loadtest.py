@@ -0,0 +1,385 @@
+"""
+Load test for TcpProxy: a fake radio sends packets at a set rate and size through a proxy to N clients,
+some of which can be made to read slowly, and the end-to-end latency, throughput, CPU and memory are reported.
+
+The fake radio and clients run in a separate process, so the CPU and memory measured are the proxy's own.
+
+    python -m src.proxy.loadtest --clients 8 --slow-clients 2 --slow-rate 2000 --rate 200 --duration 30
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import socket
+import struct
+import sys
+import threading
+import time
+
+from meshtastic.protobuf import mesh_pb2, portnums_pb2
+
+from src.helpers import percentiles
+from src.proxy.framing import FrameParser, encode_frame, frame_payload
+from src.proxy.state_cache import want_config_frame, parse_to_radio
+
+# Every packet the fake radio sends carries MARKER, a sequence number and the time it was sent
+MARKER = b'LOADTEST'
+STAMP = struct.Struct('>Qq')
+FAKE_NODE_NUM = 0x4C4F4144
+
+
+def _packet_frame(seq: int, payload_size: int) -> bytes:
+    stamp = MARKER + STAMP.pack(seq, time.monotonic_ns())
+    packet = mesh_pb2.MeshPacket(id=seq & 0xFFFFFFFF, to=0xFFFFFFFF, rx_time=int(time.time()), hop_limit=3)
+    setattr(packet, 'from', 0x10000000 + seq % 50)
+    packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+    packet.decoded.payload = stamp + b'x' * max(0, payload_size - len(stamp))
+    return encode_frame(mesh_pb2.FromRadio(packet=packet).SerializeToString())
+
+
+class FakeRadio:
+    """
+    A radio that answers config requests with a minimal config, then sends packets at a fixed rate once told to
+    """
+    TICK = 0.005
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rate: float = 100.0, payload_size: int = 200):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.payload_size = payload_size
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.running = False
+        self.server_socket = None
+        self.connected = threading.Event()
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # check the packets fit in a frame before anything connects
+        _packet_frame(0, self.payload_size)
+        self.server_socket = socket.create_server((self.host, self.port))
+        self.port = self.server_socket.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self._serve, name="fake radio", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        for sock in (self.server_socket, self._sock):
+            try:
+                if sock:
+                    sock.close()
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self.running:
+            try:
+                sock, _ = self.server_socket.accept()
+            except OSError:
+                return
+            self._sock = sock
+            self.connected.set()
+            parser = FrameParser()
+            try:
+                while True:
+                    data = sock.recv(4096)
+                    if not data:
+                        break
+                    for frame in parser.feed(data):
+                        to_radio = parse_to_radio(frame)
+                        if to_radio is not None and to_radio.WhichOneof('payload_variant') == 'want_config_id':
+                            self._send_config(to_radio.want_config_id)
+            except OSError:
+                pass
+
+    def _send_config(self, config_id: int):
+        frames = [
+            encode_frame(mesh_pb2.FromRadio(my_info=mesh_pb2.MyNodeInfo(my_node_num=FAKE_NODE_NUM)).SerializeToString()),
+            encode_frame(mesh_pb2.FromRadio(config_complete_id=config_id).SerializeToString()),
+        ]
+        self._send(b''.join(frames))
+
+    def _send(self, data: bytes):
+        with self._lock:
+            self._sock.sendall(data)
+
+    def send_packets(self, duration: float):
+        """
+        Send packets at the configured rate for duration seconds
+        """
+        start = time.monotonic()
+        while self.running:
+            elapsed = time.monotonic() - start
+            if elapsed >= duration:
+                break
+            due = int(elapsed * self.rate) - self.packets_sent
+            if due > 0:
+                data = b''.join(_packet_frame(self.packets_sent + i, self.payload_size) for i in range(due))
+                self._send(data)
+                self.packets_sent += due
+                self.bytes_sent += len(data)
+            time.sleep(self.TICK)
+
+
+class LoadClient:
+    """
+    A proxy client that asks for the config, then reads packets, optionally no faster than read_rate bytes/s
+    """
+    SLOW_RCVBUF = 4096
+
+    def __init__(self, name: str, address: tuple, read_rate: float = None):
+        self.name = name
+        self.address = address
+        self.read_rate = read_rate
+        self.configured = threading.Event()
+        self.latencies_ms: list[float] = []
+        self.frames = 0
+        self.bytes = 0
+        self.missed = 0
+        self.disconnected = False
+        self.running = True
+        self._last_seq = -1
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if read_rate:
+            # keep the kernel from soaking up the backlog on the slow client's behalf
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.SLOW_RCVBUF)
+        self.sock.connect(address)
+        self.thread = threading.Thread(target=self._read, name=f"load client {name}", daemon=True)
+
+    def start(self):
+        self.sock.sendall(want_config_frame(int.from_bytes(os.urandom(4), 'big') | 1))
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _read(self):
+        parser = FrameParser()
+        chunk = 1024 if self.read_rate else 65536
+        start = time.monotonic()
+        while self.running:
+            try:
+                data = self.sock.recv(chunk)
+            except OSError:
+                data = b''
+            if not data:
+                self.disconnected = self.running
+                return
+            now_ns = time.monotonic_ns()
+            for frame in parser.feed(data):
+                self._on_frame(bytes(frame), now_ns)
+            if self.read_rate:
+                # sleep off whatever we've read ahead of the allowed rate
+                ahead = self.bytes / self.read_rate - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def _on_frame(self, frame: bytes, now_ns: int):
+        pos = frame.find(MARKER)
+        if pos < 0:
+            if not self.configured.is_set():
+                from_radio = mesh_pb2.FromRadio.FromString(frame_payload(frame))
+                if from_radio.WhichOneof('payload_variant') == 'config_complete_id':
+                    self.configured.set()
+            return
+        seq, sent_ns = STAMP.unpack_from(frame, pos + len(MARKER))
+        self.latencies_ms.append((now_ns - sent_ns) / 1e6)
+        self.frames += 1
+        self.bytes += len(frame)
+        if seq > self._last_seq + 1:
+            self.missed += seq - self._last_seq - 1
+        self._last_seq = max(self._last_seq, seq)
+
+    def results(self, packets_sent: int) -> dict:
+        return {
+            "name": self.name,
+            "slow": bool(self.read_rate),
+            "frames": self.frames,
+            "bytes": self.bytes,
+            # gaps in the sequence: dropped by the proxy
+            "missed": self.missed,
+            # sent after the last frame received: still queued (in the proxy or socket buffers) at the end
+            "behind": max(0, packets_sent - 1 - self._last_seq),
+            "disconnected": self.disconnected,
+            "latencies_ms": self.latencies_ms,
+        }
+
+
+def _run_load(conn, config: dict):
+    """
+    The load generator process: runs the fake radio and the clients, reporting back over conn
+    """
+    radio = FakeRadio(rate=config['rate'], payload_size=config['size'])
+    radio.start()
+    conn.send(radio.port)
+
+    proxy_port = conn.recv()
+    clients = []
+    for i in range(config['clients']):
+        slow = i < config['slow_clients']
+        clients.append(LoadClient(f"{'slow' if slow else 'client'}-{i}", ('127.0.0.1', proxy_port),
+                                  config['slow_rate'] if slow else None))
+    for client in clients:
+        client.start()
+    for client in clients:
+        if not client.configured.wait(10):
+            logging.warning(f"{client.name} did not get a config from the proxy")
+
+    conn.send('start')
+    radio.send_packets(config['duration'])
+    time.sleep(config['drain'])
+    # let the proxy report on its clients before they go
+    conn.send('drained')
+    conn.recv()
+    for client in clients:
+        client.stop()
+    radio.stop()
+    conn.send({
+        "packets_sent": radio.packets_sent,
+        "bytes_sent": radio.bytes_sent,
+        "clients": [client.results(radio.packets_sent) for client in clients],
+    })
+
+
+def _rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_load_test(clients: int = 4, slow_clients: int = 0, slow_rate: float = 2000.0, rate: float = 100.0,
+                  size: int = 200, duration: float = 10.0, drain: float = 1.0, **proxy_options) -> dict:
+    """
+    Run a fake radio -> TcpProxy -> clients load test
+    :param slow_clients: how many of the clients read no faster than slow_rate bytes/s
+    :param rate: packets per second sent by the radio
+    :param size: packet payload bytes
+    :param drain: seconds to keep reading after the radio stops, to let queued data through
+    :param proxy_options: passed on to TcpProxy, e.g. client_high_water or slow_client_policy
+    """
+    # imported here so the load generator process doesn't need the proxy
+    from src.tcp_proxy import TcpProxy
+
+    config = dict(clients=clients, slow_clients=slow_clients, slow_rate=slow_rate, rate=rate, size=size,
+                  duration=duration, drain=drain)
+    context = multiprocessing.get_context('spawn')
+    conn, child_conn = context.Pipe()
+    generator = context.Process(target=_run_load, args=(child_conn, config), name="proxy load", daemon=True)
+    generator.start()
+
+    proxy = TcpProxy('127.0.0.1', conn.recv(), '127.0.0.1', 0, **proxy_options)
+    proxy.start()
+    try:
+        if not proxy.wait_until_listening(10):
+            raise RuntimeError("Proxy did not start listening")
+        conn.send(proxy.listen_port)
+
+        conn.recv()  # clients are connected and configured
+        rss_start = _rss_bytes()
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        rss_peak = rss_start
+        while not conn.poll(0.2):
+            rss_peak = max(rss_peak, _rss_bytes())
+        conn.recv()  # finished sending, and the clients have had time to catch up
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        status = proxy.get_status()
+        conn.send('done')
+        results = conn.recv()
+    finally:
+        proxy.stop()
+        generator.join(timeout=10)
+
+    client_results = results.pop('clients')
+    fast = [c for c in client_results if not c['slow']]
+    slow = [c for c in client_results if c['slow']]
+    delivered = sum(c['bytes'] for c in client_results)
+    report = {
+        "config": config,
+        "radio": {
+            "packets_sent": results['packets_sent'],
+            "bytes_sent": results['bytes_sent'],
+            "packets_per_sec": round(results['packets_sent'] / duration, 1),
+        },
+        "clients": {
+            "delivered_bytes_per_sec": round(delivered / wall, 1),
+            "delivered_frames_per_sec": round(sum(c['frames'] for c in client_results) / wall, 1),
+        },
+        "proxy": {
+            "cpu_secs": round(cpu, 3),
+            "cpu_percent": round(cpu / wall * 100, 1),
+            "cpu_ms_per_mb_delivered": round(cpu * 1000 / (delivered / 1e6), 2) if delivered else None,
+            "rss_start_mb": round(rss_start / 1e6, 1),
+            "rss_peak_mb": round(rss_peak / 1e6, 1),
+            "dropped_bytes": sum(c['dropped_bytes'] for c in status['client_lag']),
+            "client_lag": status['client_lag'],
+        },
+    }
+    for label, group in (("fast", fast), ("slow", slow)):
+        if group:
+            report[f"{label}_clients"] = {
+                "count": len(group),
+                "latency_ms": percentiles([ms for c in group for ms in c['latencies_ms']]),
+                "received": sum(c['frames'] for c in group),
+                "missed": sum(c['missed'] for c in group),
+                "behind": sum(c['behind'] for c in group),
+                "disconnected": sum(1 for c in group if c['disconnected']),
+            }
+    return report
+
+
+def format_report(report: dict) -> str:
+    config = report['config']
+    proxy = report['proxy']
+    lines = [
+        f"Radio: {report['radio']['packets_sent']} packets of {config['size']} bytes "
+        f"({report['radio']['packets_per_sec']}/s) over {config['duration']}s",
+        f"Delivered: {report['clients']['delivered_frames_per_sec']} frames/s, "
+        f"{report['clients']['delivered_bytes_per_sec'] / 1e6:.2f} MB/s to {config['clients']} clients",
+        f"Proxy: {proxy['cpu_percent']}% CPU ({proxy['cpu_ms_per_mb_delivered']} ms/MB), "
+        f"RSS {proxy['rss_start_mb']} -> {proxy['rss_peak_mb']} MB peak, {proxy['dropped_bytes']} bytes dropped",
+    ]
+    for label in ("fast", "slow"):
+        group = report.get(f"{label}_clients")
+        if group:
+            latency = ', '.join(f"{k} {v}ms" for k, v in group['latency_ms'].items())
+            lines.append(f"{label.capitalize()} clients ({group['count']}): {latency or 'nothing received'}; "
+                         f"{group['received']} received, {group['missed']} missed, {group['behind']} still queued, "
+                         f"{group['disconnected']} disconnected")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test TcpProxy with a fake radio and synthetic clients")
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--slow-clients', type=int, default=0, help="how many of the clients read slowly")
+    parser.add_argument('--slow-rate', type=float, default=2000.0, help="bytes/s a slow client reads")
+    parser.add_argument('--rate', type=float, default=100.0, help="packets/s sent by the radio")
+    parser.add_argument('--size', type=int, default=200, help="packet payload bytes")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to send for")
+    parser.add_argument('--client-high-water', type=int, default=256 * 1024)
+    parser.add_argument('--slow-client-policy', choices=('drop', 'disconnect'), default='drop')
+    parser.add_argument('--max-client-lag', type=float, default=60.0)
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - [%(levelname)s] %(message)s', stream=sys.stdout)
+    report = run_load_test(args.clients, args.slow_clients, args.slow_rate, args.rate, args.size, args.duration,
+                           client_high_water=args.client_high_water, slow_client_policy=args.slow_client_policy,
+                           max_client_lag=args.max_client_lag)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RateCounter:
+    """
+    A running total plus its average rate per second over a sliding window.
+
+    Counts go into one bucket per second, so adding is O(1) and it's safe to read the rate from another
+    thread while the proxy loop is adding to it.
+    """
+
+    def __init__(self, window: int = 60):
+        self.total = 0
+        self.window = window
+        self._seconds = [0] * window
+        self._counts = [0] * window
+
+    def add(self, amount: int, now: float) -> None:
+        second = int(now)
+        i = second % self.window
+        if self._seconds[i] != second:
+            self._seconds[i] = second
+            self._counts[i] = 0
+        self._counts[i] += amount
+        self.total += amount
+
+    def rate(self, now: float) -> float:
+        """
+        Average per second over the last window, not counting the current (partial) second
+        """
+        second = int(now)
+        oldest = second - self.window
+        total = sum(count for sec, count in zip(self._seconds[:], self._counts[:]) if oldest < sec < second)
+        return total / (self.window - 1)
+
+
+class DurationStats:
+    """
+    Count, last, max and mean of something that takes time, e.g. sending a config snapshot
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+
+    def record(self, secs: float) -> None:
+        self.count += 1
+        self.last = secs
+        self.max = max(self.max, secs)
+        self.total += secs
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "last_ms": round(self.last * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+            "mean_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+        }
+
+
+class ProxyMetrics:
+    """
+    Traffic and health counters for a TcpProxy.
+
+    Updated from the proxy loop thread only; snapshot() can be called from any thread.
+    """
+
+    def __init__(self, window: int = 60):
+        self.radio_bytes_in = RateCounter(window)
+        self.radio_frames_in = RateCounter(window)
+        self.radio_bytes_out = RateCounter(window)
+        self.radio_frames_out = RateCounter(window)
+        self.client_bytes_out = RateCounter(window)
+        self.connects = 0
+        self.watchdog_trips = 0
+        self.config_downloads = DurationStats()
+        self.config_snapshots = DurationStats()
+        self._downtime = 0.0
+        self._down_since: float | None = time.monotonic()
+
+    @property
+    def reconnects(self) -> int:
+        return max(0, self.connects - 1)
+
+    def target_connected(self, now: float) -> None:
+        self.connects += 1
+        if self._down_since is not None:
+            self._downtime += now - self._down_since
+            self._down_since = None
+
+    def target_disconnected(self, now: float) -> None:
+        if self._down_since is None:
+            self._down_since = now
+
+    def downtime_secs(self, now: float) -> float:
+        """
+        Total time without a radio connection, including any current outage
+        """
+        down_since = self._down_since
+        return self._downtime + (now - down_since if down_since is not None else 0.0)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "radio_in_bytes_per_sec": round(self.radio_bytes_in.rate(now), 1),
+            "radio_in_frames_per_sec": round(self.radio_frames_in.rate(now), 2),
+            "radio_out_bytes_per_sec": round(self.radio_bytes_out.rate(now), 1),
+            "radio_out_frames_per_sec": round(self.radio_frames_out.rate(now), 2),
+            "client_out_bytes_per_sec": round(self.client_bytes_out.rate(now), 1),
+            "radio_in_bytes_total": self.radio_bytes_in.total,
+            "radio_in_frames_total": self.radio_frames_in.total,
+            "radio_out_bytes_total": self.radio_bytes_out.total,
+            "radio_out_frames_total": self.radio_frames_out.total,
+            "client_out_bytes_total": self.client_bytes_out.total,
+            "reconnects": self.reconnects,
+            "downtime_secs": round(self.downtime_secs(now), 1),
+            "watchdog_trips": self.watchdog_trips,
+            "config_downloads": self.config_downloads.as_dict(),
+            "config_snapshots": self.config_snapshots.as_dict(),
+        }
+
+
+def format_prometheus(status: dict, labels: dict = None) -> str:
+    """
+    Render TcpProxy.get_status() in the Prometheus text exposition format
+    :param labels: added to every metric, e.g. which gateway the proxy is for
+    """
+    lines = []
+
+    def metric(name: str, value, extra_labels: dict = None):
+        all_labels = {**(labels or {}), **(extra_labels or {})}
+        label_str = ''
+        if all_labels:
+            label_str = '{' + ','.join(f'{k}="{v}"' for k, v in all_labels.items()) + '}'
+        lines.append(f"meshtastic_proxy_{name}{label_str} {float(value)}")
+
+    metric("connected", 1 if status['connected'] else 0)
+    metric("clients", status['clients'])
+    metric("silence_seconds", status['silence_secs'])
+    metric("cached_nodes", status['cached_nodes'])
+
+    metrics = status['metrics']
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            metric(f"{key}_count", value['count'])
+            for stat in ('last', 'max', 'mean'):
+                metric(f"{key}_{stat}_seconds", value[f'{stat}_ms'] / 1000)
+        else:
+            metric(key, value)
+
+    for client in status['client_lag']:
+        client_labels = {"client": client['addr']}
+        metric("client_queued_bytes", client['queued_bytes'], client_labels)
+        metric("client_lag_seconds", client['lag_secs'], client_labels)
+        metric("client_dropped_bytes", client['dropped_bytes'], client_labels)
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_bot_prometheus(metrics: dict, prefix: str = 'meshtastic_bot') -> str:
+    """
+    Render the bot's own metrics (e.g. {"ingest": {"depth": 3, ...}}) in the Prometheus text exposition format,
+    joining nested keys with underscores. A "buckets" dict (cumulative counts by upper bound) becomes histogram
+    buckets, and a "..._by_node" dict (counts by node id) is labelled with the node
+    """
+    lines = []
+    for key, value in metrics.items():
+        if key == 'buckets' and isinstance(value, dict):
+            lines.extend(f'{prefix}_bucket{{le="{bound}"}} {float(count)}' for bound, count in value.items())
+        elif key.endswith('_by_node') and isinstance(value, dict):
+            lines.extend(f'{prefix}_{key}{{node="{node_id}"}} {float(count)}' for node_id, count in value.items())
+        elif isinstance(value, dict):
+            lines.append(format_bot_prometheus(value, f"{prefix}_{key}").rstrip('\n'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"{prefix}_{key} {float(value)}")
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+class MetricsServer:
+    """
+    Serve proxy status over HTTP so it can be scraped: /metrics (Prometheus text) and /status (JSON).
+
+    Takes a single proxy, or a dict of gateway name -> proxy when fronting several radios; metrics are then
+    labelled with the gateway, and /status is keyed by it.
+
+    If bot_metrics is set (a callable returning a dict), the bot's own metrics are served too, at /metrics and
+    /status/bot.
+    """
+
+    def __init__(self, proxy, host: str = '127.0.0.1', port: int = 9464):
+        self.proxies = proxy if isinstance(proxy, dict) else {None: proxy}
+        self.host = host
+        self.port = port
+        self.bot_metrics = None
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        proxies = self.proxies
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                statuses = {name: proxy.get_status() for name, proxy in proxies.items()}
+                if self.path == '/metrics':
+                    body = ''.join(format_prometheus(status, {'gateway': name} if name is not None else None)
+                                   for name, status in statuses.items() if isinstance(status, dict))
+                    if server.bot_metrics:
+                        body += format_bot_prometheus(server.bot_metrics())
+                    body = body.encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/status/bot' and server.bot_metrics:
+                    body = json.dumps(server.bot_metrics()).encode()
+                    content_type = 'application/json'
+                elif self.path == '/status':
+                    body = json.dumps(statuses.get(None, statuses)).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="proxy metrics", daemon=True)
+        self.thread.start()
+        logging.info(f"Proxy metrics available on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
@@ -0,0 +1,168 @@
+import argparse
+import logging
+import socket
+import sys
+import threading
+import time
+
+from google.protobuf.message import DecodeError
+from meshtastic.protobuf import mesh_pb2
+
+from src.proxy.capture import read_capture, FROM_RADIO
+from src.proxy.framing import FrameParser, encode_frame, frame_payload
+from src.proxy.state_cache import parse_to_radio
+
+
+class CaptureReplayer:
+    """
+    A fake radio that serves a capture to whoever connects, e.g. a TcpProxy or the meshtastic library.
+
+    Frames the radio sent are replayed either at their original pacing (scaled by speed) or, with speed=0, as
+    fast as the client will take them. Frames sent to the radio are not replayed; instead, when the client
+    asks for the config, the config_complete_id frames in the capture are rewritten to the id it asked for,
+    so the client accepts the replayed config download as its own.
+    """
+    SEND_BATCH_BYTES = 64 * 1024
+    CONFIG_WAIT = 1.0  # how long to wait for the client to ask for the config before replaying anyway
+
+    def __init__(self, capture_path, host: str = '127.0.0.1', port: int = 4403, speed: float = 1.0,
+                 loop: bool = False):
+        # (timestamp, frame, is it a config_complete_id)
+        self.frames = [(timestamp, frame, _is_config_complete(frame))
+                       for timestamp, direction, frame in read_capture(capture_path) if direction == FROM_RADIO]
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.loop = loop
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.running = False
+        self.server_socket = None
+        self.thread = None
+        self._config_id = None
+        self._config_requested = threading.Event()
+
+    def start(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(1)
+        self.port = self.server_socket.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, name="capture replay", daemon=True)
+        self.thread.start()
+        logging.info(f"Replaying {len(self.frames)} frames on {self.host}:{self.port}")
+
+    def stop(self):
+        self.running = False
+        try:
+            self.server_socket.close()
+        except OSError:
+            pass
+
+    def _serve(self):
+        while self.running:
+            try:
+                client, addr = self.server_socket.accept()
+            except OSError:
+                return
+            logging.info(f"Replay client connected from {addr}")
+            self._config_id = None
+            self._config_requested.clear()
+            reader = threading.Thread(target=self._read_client, args=(client,), daemon=True)
+            reader.start()
+            try:
+                self._replay(client)
+            except OSError as e:
+                logging.info(f"Replay client went away: {e}")
+            finally:
+                client.close()
+
+    def _read_client(self, client: socket.socket):
+        parser = FrameParser()
+        try:
+            while True:
+                data = client.recv(4096)
+                if not data:
+                    return
+                for frame in parser.feed(data):
+                    to_radio = parse_to_radio(frame)
+                    if to_radio is not None and to_radio.WhichOneof('payload_variant') == 'want_config_id':
+                        self._config_id = to_radio.want_config_id
+                        self._config_requested.set()
+        except OSError:
+            return
+
+    def _replay(self, client: socket.socket):
+        self._config_requested.wait(self.CONFIG_WAIT)
+        while True:
+            start = time.monotonic()
+            first_timestamp = self.frames[0][0] if self.frames else 0.0
+            batch = []
+            batch_bytes = 0
+            for timestamp, frame, config_complete in self.frames:
+                if not self.running:
+                    return
+                if self.speed:
+                    delay = (timestamp - first_timestamp) / self.speed - (time.monotonic() - start)
+                    if delay > 0:
+                        self._send(client, batch)
+                        batch, batch_bytes = [], 0
+                        time.sleep(delay)
+                if config_complete and self._config_id is not None:
+                    frame = encode_frame(mesh_pb2.FromRadio(config_complete_id=self._config_id).SerializeToString())
+                batch.append(frame)
+                batch_bytes += len(frame)
+                if batch_bytes >= self.SEND_BATCH_BYTES:
+                    self._send(client, batch)
+                    batch, batch_bytes = [], 0
+            self._send(client, batch)
+
+            elapsed = time.monotonic() - start
+            logging.info(f"Replayed {len(self.frames)} frames in {elapsed:.2f}s")
+            if not self.loop:
+                # leave the connection open, like an idle radio
+                while self.running:
+                    time.sleep(0.5)
+                return
+
+    def _send(self, client: socket.socket, frames: list[bytes]):
+        if not frames:
+            return
+        data = b''.join(frames)
+        client.sendall(data)
+        self.frames_sent += len(frames)
+        self.bytes_sent += len(data)
+
+
+def _is_config_complete(frame: bytes) -> bool:
+    from_radio = mesh_pb2.FromRadio()
+    try:
+        from_radio.ParseFromString(frame_payload(frame))
+    except DecodeError:
+        return False
+    return from_radio.WhichOneof('payload_variant') == 'config_complete_id'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a radio capture from a fake radio socket")
+    parser.add_argument('capture', help="capture segment file, or a directory of them")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4403)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="pacing relative to the original capture, 0 for as fast as possible")
+    parser.add_argument('--fast', action='store_true', help="same as --speed 0")
+    parser.add_argument('--loop', action='store_true', help="replay the capture again when it finishes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] %(message)s', stream=sys.stdout)
+    replayer = CaptureReplayer(args.capture, args.host, args.port, 0 if args.fast else args.speed, args.loop)
+    replayer.start()
+    try:
+        replayer.thread.join()
+    except KeyboardInterrupt:
+        replayer.stop()
+
+
+if __name__ == '__main__':
+    main()
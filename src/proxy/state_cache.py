@@ -0,0 +1,221 @@
+import logging
+import time
+
+from google.protobuf.message import DecodeError
+from meshtastic.protobuf import mesh_pb2, portnums_pb2
+
+from src.proxy.framing import encode_frame, frame_payload
+
+# Nonces the firmware treats specially when a client asks for its config
+SPECIAL_NONCE_ONLY_CONFIG = 69420
+SPECIAL_NONCE_ONLY_NODES = 69421
+
+NODEINFO_APP = portnums_pb2.PortNum.NODEINFO_APP
+
+
+class RadioStateCache:
+    """
+    Live, deduplicated copy of everything a radio sends during a config download.
+
+    Keeps the latest MyNodeInfo, metadata, channel, config and module config frames, plus one NodeInfo frame
+    per node number. NodeInfo entries are kept current from NODEINFO_APP packets heard after the download,
+    so a snapshot reflects nodes learned since the proxy started. Frames are stored already encoded, so a
+    snapshot can be written straight to a client socket. Packets from known nodes refresh that node's
+    last heard time at most once per LAST_HEARD_INTERVAL, so busy nodes don't cost a re-encode per packet.
+    """
+    LAST_HEARD_INTERVAL = 30.0
+
+    def __init__(self):
+        self.my_node_num: int | None = None
+        self.complete = False
+
+        self._my_info: bytes | None = None
+        self._metadata: bytes | None = None
+        self._device_ui_config: bytes | None = None
+        # channel index -> frame
+        self._channels: dict[int, bytes] = {}
+        # config section name -> frame
+        self._configs: dict[str, bytes] = {}
+        self._module_configs: dict[str, bytes] = {}
+        # node num -> (NodeInfo, frame)
+        self._nodes: dict[int, tuple[mesh_pb2.NodeInfo, bytes]] = {}
+        self._file_info: dict[str, bytes] = {}
+
+        # what we've seen since the last refresh started, so stale entries can be pruned when it completes
+        self._refresh_seen: dict[str, set] | None = None
+        # node num -> monotonic time its NodeInfo was last updated from a packet
+        self._last_packet_update: dict[int, float] = {}
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    def begin_refresh(self) -> None:
+        """
+        Note that a fresh config download has been requested from the radio
+        """
+        self._refresh_seen = {'channels': set(), 'configs': set(), 'module_configs': set(), 'nodes': set(),
+                              'file_info': set()}
+
+    def update(self, frame: bytes) -> mesh_pb2.FromRadio | None:
+        """
+        Update the cache from a frame received from the radio
+        :return: the decoded frame, or None if it couldn't be decoded
+        """
+        from_radio = mesh_pb2.FromRadio()
+        try:
+            from_radio.ParseFromString(frame_payload(frame))
+        except DecodeError:
+            return None
+
+        variant = from_radio.WhichOneof('payload_variant')
+        if variant == 'packet':
+            # by far the most common frame, so checked first
+            self._update_from_packet(from_radio.packet)
+            return from_radio
+
+        seen = self._refresh_seen
+        if variant == 'my_info':
+            self._my_info = bytes(frame)
+            self.my_node_num = from_radio.my_info.my_node_num
+        elif variant == 'metadata':
+            self._metadata = bytes(frame)
+        elif variant == 'deviceuiConfig':
+            self._device_ui_config = bytes(frame)
+        elif variant == 'channel':
+            self._channels[from_radio.channel.index] = bytes(frame)
+            if seen is not None:
+                seen['channels'].add(from_radio.channel.index)
+        elif variant == 'config':
+            section = from_radio.config.WhichOneof('payload_variant')
+            self._configs[section] = bytes(frame)
+            if seen is not None:
+                seen['configs'].add(section)
+        elif variant == 'moduleConfig':
+            section = from_radio.moduleConfig.WhichOneof('payload_variant')
+            self._module_configs[section] = bytes(frame)
+            if seen is not None:
+                seen['module_configs'].add(section)
+        elif variant == 'node_info':
+            node_info = from_radio.node_info
+            self._nodes[node_info.num] = (node_info, bytes(frame))
+            if seen is not None:
+                seen['nodes'].add(node_info.num)
+        elif variant == 'fileInfo':
+            self._file_info[from_radio.fileInfo.file_name] = bytes(frame)
+            if seen is not None:
+                seen['file_info'].add(from_radio.fileInfo.file_name)
+        elif variant == 'config_complete_id':
+            self._complete_refresh()
+        elif variant == 'rebooted':
+            self.complete = False
+
+        return from_radio
+
+    def _complete_refresh(self):
+        seen = self._refresh_seen
+        if seen is not None:
+            # Only prune after a full download: the special nonces return partial ones
+            if seen['configs'] and seen['nodes']:
+                self._channels = {k: v for k, v in self._channels.items() if k in seen['channels']}
+                self._configs = {k: v for k, v in self._configs.items() if k in seen['configs']}
+                self._module_configs = {k: v for k, v in self._module_configs.items() if k in seen['module_configs']}
+                self._nodes = {k: v for k, v in self._nodes.items() if k in seen['nodes']}
+                self._file_info = {k: v for k, v in self._file_info.items() if k in seen['file_info']}
+            self._refresh_seen = None
+
+        if self._my_info and self._configs:
+            self.complete = True
+            logging.info(f"Proxy state cache complete: {len(self._nodes)} nodes, {len(self._channels)} channels")
+
+    def _update_from_packet(self, packet: mesh_pb2.MeshPacket):
+        """
+        Keep NodeInfo entries current from packets heard after the config download
+        """
+        node_num = getattr(packet, 'from')
+        if not node_num or not packet.HasField('decoded'):
+            return
+
+        entry = self._nodes.get(node_num)
+        is_nodeinfo = packet.decoded.portnum == NODEINFO_APP
+        if not is_nodeinfo:
+            if not entry:
+                # don't invent NodeInfo for nodes we've never had user info for
+                return
+            if time.monotonic() - self._last_packet_update.get(node_num, 0.0) < self.LAST_HEARD_INTERVAL:
+                return
+
+        if is_nodeinfo:
+            user = mesh_pb2.User()
+            try:
+                user.ParseFromString(packet.decoded.payload)
+            except DecodeError:
+                return
+            node_info = mesh_pb2.NodeInfo()
+            if entry:
+                node_info.CopyFrom(entry[0])
+            node_info.num = node_num
+            node_info.user.CopyFrom(user)
+        else:
+            node_info = mesh_pb2.NodeInfo()
+            node_info.CopyFrom(entry[0])
+
+        if packet.rx_time:
+            node_info.last_heard = packet.rx_time
+        if packet.rx_snr:
+            node_info.snr = packet.rx_snr
+        if packet.hop_start:
+            node_info.hops_away = max(0, packet.hop_start - packet.hop_limit)
+
+        from_radio = mesh_pb2.FromRadio(node_info=node_info)
+        self._nodes[node_num] = (node_info, encode_frame(from_radio.SerializeToString()))
+        self._last_packet_update[node_num] = time.monotonic()
+
+    def snapshot(self, config_id: int) -> list[bytes]:
+        """
+        The frames a radio would send in reply to want_config_id, in firmware order
+        """
+        only_nodes = config_id == SPECIAL_NONCE_ONLY_NODES
+        only_config = config_id == SPECIAL_NONCE_ONLY_CONFIG
+
+        frames = []
+        if self._my_info:
+            frames.append(self._my_info)
+
+        own_node = self._nodes.get(self.my_node_num)
+        if own_node:
+            frames.append(own_node[1])
+
+        if not only_nodes:
+            for frame in (self._metadata, self._device_ui_config):
+                if frame:
+                    frames.append(frame)
+            frames.extend(self._channels[index] for index in sorted(self._channels))
+            frames.extend(self._configs.values())
+            frames.extend(self._module_configs.values())
+
+        if not only_config:
+            frames.extend(frame for num, (_, frame) in self._nodes.items() if num != self.my_node_num)
+
+        if not only_nodes:
+            frames.extend(self._file_info.values())
+
+        complete = mesh_pb2.FromRadio(config_complete_id=config_id)
+        frames.append(encode_frame(complete.SerializeToString()))
+        return frames
+
+
+def want_config_frame(config_id: int) -> bytes:
+    """
+    A ToRadio frame asking the radio for a full config download
+    """
+    return encode_frame(mesh_pb2.ToRadio(want_config_id=config_id).SerializeToString())
+
+
+def parse_to_radio(frame) -> mesh_pb2.ToRadio | None:
+    to_radio = mesh_pb2.ToRadio()
+    try:
+        to_radio.ParseFromString(frame_payload(frame))
+    except DecodeError:
+        return None
+    return to_radio
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from src.transmit_scheduler import TokenBucket
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    # what the request was throttled by: 'sender' or 'channel'
+    scope: str | None = None
+    # seconds until the request would have been allowed
+    retry_after: float = 0.0
+    # whether to tell the sender to slow down (they're only told once in a while)
+    notify: bool = False
+
+
+class CommandRateLimiter:
+    """
+    Token bucket limits on how often commands are answered: one bucket per sender, and one per channel for public
+    messages, so neither a single node nor a busy channel can keep the bot spending its airtime on replies.
+
+    A throttled sender is told to slow down at most once per cooldown_notice_interval, so the cool-down replies
+    can't turn into a flood themselves. At most max_buckets senders and channels are tracked (the least recently
+    used are forgotten first, which just gives them a full bucket again).
+    """
+
+    def __init__(self, sender_rate: float = 1 / 10, sender_burst: float = 3, channel_rate: float = 1 / 5,
+                 channel_burst: float = 5, cooldown_notice_interval: float = 300.0, max_buckets: int = 1000):
+        """
+        :param sender_rate: commands per second each sender is allowed over time
+        :param sender_burst: commands each sender can send at once
+        :param channel_rate: public commands per second allowed over time in each channel
+        :param channel_burst: public commands that can be sent at once in each channel
+        """
+        self.sender_rate = sender_rate
+        self.sender_burst = sender_burst
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.cooldown_notice_interval = cooldown_notice_interval
+        self.max_buckets = max_buckets
+        self.allowed = 0
+        self.throttled: Counter[str] = Counter({"sender": 0, "channel": 0})
+        self.throttled_by_sender: Counter[str] = Counter()
+        self.notices_sent = 0
+        self._buckets: OrderedDict[tuple[str, str | int], TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, kind: str, key: str | int, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = TokenBucket(rate, burst, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((kind, key))
+        return bucket
+
+    def check(self, sender_id: str, channel: int = None, now: float = None) -> RateLimitDecision:
+        """
+        Whether to answer a command now, taking a token from the sender's (and channel's) bucket if so
+        :param channel: the channel a public command was sent in; None for a DM
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = [('sender', self._bucket('sender', sender_id, self.sender_rate, self.sender_burst, now))]
+            if channel is not None:
+                buckets.append(('channel', self._bucket('channel', channel, self.channel_rate, self.channel_burst, now)))
+
+            for scope, bucket in buckets:
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    self.throttled[scope] += 1
+                    self.throttled_by_sender[sender_id] += 1
+                    notice = self._bucket('notice', sender_id, 1 / self.cooldown_notice_interval, 1, now)
+                    notify = notice.wait_time(now) == 0
+                    if notify:
+                        notice.take(now)
+                        self.notices_sent += 1
+                    return RateLimitDecision(False, scope, wait, notify)
+
+            for _, bucket in buckets:
+                bucket.take(now)
+            self.allowed += 1
+            return RateLimitDecision(True)
+
+    def metrics(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "throttled": dict(self.throttled),
+            "cooldown_notices": self.notices_sent,
+            "tracked": len(self._buckets),
+        }
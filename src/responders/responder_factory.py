@@ -16,14 +16,6 @@ class ResponderFactory:
         },
     ]
 
-    @staticmethod
-    def match_responder(message: str, bot):
-        for responder_info in ResponderFactory.responders:
-            for pattern in responder_info["trigger_regex"]:
-                if pattern.match(message):
-                    return ResponderFactory.create_responder(responder_info, bot)
-        return None
-
     @staticmethod
     def create_responder(responder_info, bot):
         module_name, class_name = responder_info["class"].rsplit('.', 1)
@@ -31,3 +23,81 @@ class ResponderFactory:
         responder_class = getattr(module, class_name)
         args = [bot] + responder_info["args"]
         return responder_class(*args)
+
+
+class _TrieNode:
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        # (position among all the triggers, responder index, pattern)
+        self.patterns: list[tuple[int, int, re.Pattern]] = []
+
+
+class ResponderRegistry:
+    """
+    Every responder in ResponderFactory.responders, instantiated once for a bot, with all their triggers indexed
+    in a trie by the literal text each one starts with (e.g. "test" for ^test .*$). Matching a message walks the
+    trie along the start of the message once, and only the triggers found on the way are tried, so it doesn't slow
+    down as more triggers are added. As before, the first responder with a matching trigger wins.
+    """
+    # non-ASCII letters that IGNORECASE matches to ASCII ones
+    FOLDS = {'İ': 'i', 'ı': 'i', 'ſ': 's', 'K': 'k'}
+    METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+    def __init__(self, bot, responders: list[dict] = None):
+        responders = ResponderFactory.responders if responders is None else responders
+        self._responders = [ResponderFactory.create_responder(info, bot) for info in responders]
+        self._root = _TrieNode()
+        position = 0
+        for index, info in enumerate(responders):
+            for pattern in info["trigger_regex"]:
+                node = self._root
+                for char in self._literal_prefix(pattern):
+                    node = node.children.setdefault(self._fold(char), _TrieNode())
+                node.patterns.append((position, index, pattern))
+                position += 1
+
+    @classmethod
+    def _fold(cls, char: str) -> str:
+        return cls.FOLDS.get(char) or char.lower()
+
+    @classmethod
+    def _literal_prefix(cls, pattern: re.Pattern) -> str:
+        """
+        The text any match of the pattern has to start with: e.g. "test" for ^test .*$, "tes" for ^test?, and ""
+        if that's not simple to tell
+        """
+        source = pattern.pattern
+        if not isinstance(source, str) or '|' in source or pattern.flags & re.VERBOSE:
+            return ''
+        source = source.removeprefix('^')
+        end = 0
+        while end < len(source) and source[end] not in cls.METACHARACTERS:
+            end += 1
+        if end < len(source) and source[end] in '*?{':
+            # the last character is optional
+            end -= 1
+        prefix = source[:max(end, 0)]
+        if pattern.flags & re.IGNORECASE:
+            # other letters can match all sorts of things ignoring case, so stop at the first one that isn't ASCII
+            ascii_end = next((i for i, char in enumerate(prefix) if not char.isascii()), len(prefix))
+            prefix = prefix[:ascii_end]
+        return prefix
+
+    def match(self, message: str):
+        """
+        The responder for a message, or None if none of their triggers match it
+        """
+        candidates = list(self._root.patterns)
+        node = self._root
+        for char in message:
+            node = node.children.get(self._fold(char))
+            if node is None:
+                break
+            candidates.extend(node.patterns)
+        for _, index, pattern in sorted(candidates, key=lambda candidate: candidate[0]):
+            if pattern.match(message):
+                return self._responders[index]
+        return None
+
+    def __len__(self) -> int:
+        return len(self._responders)
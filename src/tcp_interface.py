@@ -1,14 +1,19 @@
 import logging
 import sys
+import threading
 from pubsub import pub
 import time
-from queue import Queue
+from queue import Empty
 from typing import Optional, Callable, Union
 
 from meshtastic import BROADCAST_ADDR
 from meshtastic.protobuf import portnums_pb2, mesh_pb2
 from meshtastic.tcp_interface import TCPInterface
 
+from src.airtime import AirtimeBudget
+from src.persistence.outbound_queue import AbstractOutboundQueue, InMemoryOutboundQueue
+from src.proxy.framing import HEADER_LEN
+
 
 class SupportsMessageReactionInterface(TCPInterface):
     def sendReaction(
@@ -41,14 +46,29 @@ class SupportsMessageReactionInterface(TCPInterface):
 
 
 class AutoReconnectTcpInterface(SupportsMessageReactionInterface, TCPInterface):
-    packet_queue: Queue
+    """
+    A TCP interface that hands connection errors to an error handler, and keeps packets it couldn't send in
+    an outbound queue.
+
+    The queue is passed on to the interface that replaces this one after a reconnect (and can be persistent, so
+    it also survives a restart). Queued packets are replayed in order on a background thread, REPLAY_INTERVAL
+    apart so a backlog doesn't flood the mesh; anything sent while a replay is in progress joins the back of
+    the queue so it can't overtake older packets.
+    """
+    packet_queue: AbstractOutboundQueue
+    REPLAY_INTERVAL = 2.0
 
     def __init__(self, *args,
                  error_handler: Optional[Callable[[Exception], None]] = None,
-                 packet_queue: Optional[Queue] = None,
+                 packet_queue: Optional[AbstractOutboundQueue] = None,
+                 airtime_budget: Optional[AirtimeBudget] = None,
                  **kwargs):
         self.error_handler = error_handler
-        self.packet_queue = packet_queue or Queue()
+        self.airtime_budget = airtime_budget
+        self.packet_queue = packet_queue if packet_queue is not None else InMemoryOutboundQueue()
+        self._replay_thread = None
+        self._replay_lock = threading.Lock()
+        self._replay_stop = threading.Event()
         super().__init__(*args, **kwargs)
 
         # if there were packets from an old connection, play them now
@@ -62,12 +82,34 @@ class AutoReconnectTcpInterface(SupportsMessageReactionInterface, TCPInterface):
         # Store packets in a queue and resend them after reconnecting
         # This will involve exposing the queue, and reloading the queue in bot.py since we create a new interface object
 
-    def onResponseTraceRoute(self, packet, routeDiscovery):
+    def sendTraceRouteNoWait(self, dest: Union[int, str], hopLimit: int, channelIndex: int = 0) -> mesh_pb2.MeshPacket:
         """
-        Callback for when a traceroute response is received.
+        Send a traceroute without blocking until it's answered (as sendTraceRoute does). The answer is published
+        as meshtastic.traceroute
         """
-        super().onResponseTraceRoute(packet, routeDiscovery)
-        pub.sendMessage("meshtastic.traceroute", packet=packet, route=routeDiscovery)
+        return self.sendData(
+            mesh_pb2.RouteDiscovery(),
+            destinationId=dest,
+            portNum=portnums_pb2.PortNum.TRACEROUTE_APP,
+            wantResponse=True,
+            onResponse=self.onResponseTraceRoute,
+            channelIndex=channelIndex,
+            hopLimit=hopLimit,
+        )
+
+    def onResponseTraceRoute(self, p: dict):
+        """
+        Callback for when a traceroute response is received: publishes it as meshtastic.traceroute, with the
+        RouteDiscovery as route, or route=None if the traceroute failed
+        """
+        route = None
+        if p['decoded']['portnum'] == 'ROUTING_APP':
+            logging.info(f"Traceroute {p['decoded'].get('requestId')} failed: "
+                         f"{p['decoded'].get('routing', {}).get('errorReason')}")
+        else:
+            route = mesh_pb2.RouteDiscovery.FromString(p['decoded']['payload'])
+        self._acknowledgment.receivedTraceRoute = True
+        pub.sendMessage("meshtastic.traceroute", packet=p, route=route, interface=self)
 
     def sendHeartbeat(self):
         try:
@@ -86,10 +128,18 @@ class AutoReconnectTcpInterface(SupportsMessageReactionInterface, TCPInterface):
             hopLimit: Optional[int] = None,
             pkiEncrypted: Optional[bool] = False,
             publicKey: Optional[bytes] = None,
-    ):
+    ) -> mesh_pb2.MeshPacket:
+        """
+        Sends the packet, or queues it to be sent once reconnected. Either way the packet is returned with its id
+        assigned, as meshtastic's sendData and sendText expect, but a queued packet won't be on air yet
+        """
         logging.debug(f"Sending packet to {destinationId} (Payload: {meshPacket.decoded.payload})")
+        with self._replay_lock:
+            if self._replay_thread is not None:
+                self.packet_queue.put(meshPacket, destinationId, wantAck, hopLimit, pkiEncrypted, publicKey)
+                return meshPacket
         try:
-            super()._sendPacket(
+            sent = super()._sendPacket(
                 meshPacket=meshPacket,
                 destinationId=destinationId,
                 wantAck=wantAck,
@@ -99,9 +149,20 @@ class AutoReconnectTcpInterface(SupportsMessageReactionInterface, TCPInterface):
             )
         except (OSError, BrokenPipeError) as e:
             logging.error(f"sendPacket failed: {e}")
-            self.packet_queue.put((meshPacket, destinationId, wantAck, hopLimit, pkiEncrypted, publicKey))
+            self.packet_queue.put(meshPacket, destinationId, wantAck, hopLimit, pkiEncrypted, publicKey)
             # self._reconnect_with_backoff()
             self._shutdown_and_call_error_handler(e)
+            return meshPacket
+        self._record_airtime(meshPacket)
+        return sent
+
+    def _record_airtime(self, packet: mesh_pb2.MeshPacket):
+        if self.airtime_budget:
+            self.airtime_budget.record(self.airtime_budget.estimate_packet(packet))
+
+    def close(self):
+        self._replay_stop.set()
+        super().close()
 
     def _shutdown_and_call_error_handler(self, conn_error: Optional[Exception] = None):
         try:
@@ -138,19 +199,105 @@ class AutoReconnectTcpInterface(SupportsMessageReactionInterface, TCPInterface):
                 time.sleep(backoff_time)
 
     def _replay_packet_queue(self):
-        while not self.packet_queue.empty():
-            packet, destinationId, wantAck, hopLimit, pkiEncrypted, publicKey = self.packet_queue.get()
-            try:
-                super()._sendPacket(
-                    meshPacket=packet,
-                    destinationId=destinationId,
-                    wantAck=wantAck,
-                    hopLimit=hopLimit,
-                    pkiEncrypted=pkiEncrypted,
-                    publicKey=publicKey
-                )
-                logging.info("Replayed packet successfully")
-            except Exception as e:
-                logging.error(f"Failed to replay packet: {e}")
-                self.packet_queue.put((packet, destinationId, wantAck, hopLimit, pkiEncrypted, publicKey))
-                break
+        """
+        Start sending the queued packets, if there are any and it isn't already happening
+        """
+        with self._replay_lock:
+            if self._replay_thread is not None or self.packet_queue.empty():
+                return
+            logging.info(f"Replaying {len(self.packet_queue)} queued packet(s)")
+            self._replay_thread = threading.Thread(target=self._replay_loop, name="packet replay", daemon=True)
+            self._replay_thread.start()
+
+    def _replay_loop(self):
+        try:
+            while not self._replay_stop.is_set():
+                with self._replay_lock:
+                    entry = self.packet_queue.peek()
+                    if entry is None:
+                        self._replay_thread = None
+                        return
+                try:
+                    super()._sendPacket(
+                        meshPacket=entry.packet,
+                        destinationId=entry.destination_id,
+                        wantAck=entry.want_ack,
+                        hopLimit=entry.hop_limit,
+                        pkiEncrypted=entry.pki_encrypted,
+                        publicKey=entry.public_key
+                    )
+                except Exception as e:
+                    # it stays at the head of the queue for the next connection to send
+                    logging.error(f"Failed to replay packet: {e}")
+                    return
+                self.packet_queue.remove(entry.entry_id)
+                self._record_airtime(entry.packet)
+                logging.info(f"Replayed packet to {entry.destination_id} "
+                             f"(queued {time.time() - entry.queued_at:.0f}s ago)")
+                self._replay_stop.wait(self.REPLAY_INTERVAL)
+        finally:
+            with self._replay_lock:
+                if self._replay_thread is threading.current_thread():
+                    self._replay_thread = None
+
+
+class LocalProxyInterface(AutoReconnectTcpInterface):
+    """
+    Talks to the radio through a TcpProxy running in this process, instead of over a localhost connection.
+
+    Frames from the radio come straight off the proxy's queue for this client and go to the usual protobuf
+    handling, so there are no socket syscalls and no byte-at-a-time reader. Everything else (reactions,
+    traceroute events, the outbound packet queue and the error handler) works as for the TCP interface.
+    """
+    READ_TIMEOUT = 0.5  # how often the reader checks whether it should exit
+
+    def __init__(self, proxy, *args, **kwargs):
+        self.proxy = proxy
+        self.proxy_client = None
+        super().__init__(*args, hostname='in-process proxy', **kwargs)
+
+    def myConnect(self):
+        self.proxy_client = self.proxy.attach_local_client('bot')
+
+    def connect(self):
+        self.myConnect()
+        # the stream reader reads from a socket, so use our own one that reads whole frames from the proxy
+        self._rxThread = threading.Thread(target=self._frame_reader, name="proxy frame reader", daemon=True)
+        self._rxThread.start()
+        self._startConfig()
+        if not self.noProto:
+            self._waitConnected()
+
+    def close(self):
+        super().close()
+        if self.proxy_client:
+            self.proxy.detach_local_client(self.proxy_client)
+
+    def _frame_reader(self):
+        detached = False
+        try:
+            while not self._wantExit:
+                try:
+                    frame = self.proxy_client.get_frame(self.READ_TIMEOUT)
+                except Empty:
+                    continue
+                if frame is None:
+                    detached = True
+                    break
+                try:
+                    self._handleFromRadio(bytes(frame[HEADER_LEN:]))
+                except Exception as e:
+                    logging.exception(f"Error while handling message from radio: {e}")
+        finally:
+            if detached and not self._wantExit:
+                logging.warning("Detached by the proxy, reconnecting")
+                self._shutdown_and_call_error_handler(ConnectionError("Detached from the proxy"))
+            else:
+                self._disconnected()
+
+    def _writeBytes(self, b: bytes) -> None:
+        if self.proxy_client is None or self.proxy_client.closed:
+            if self._wantExit:
+                return  # e.g. the disconnect message sent while closing
+            raise ConnectionError("Not attached to the proxy")
+        self.proxy_client.send(b)
@@ -1,56 +1,390 @@
+import errno
+import heapq
+import itertools
+import logging
+import queue
+import random
+import selectors
 import socket
-import select
 import threading
-import logging
 import time
+from collections import deque
+
+from meshtastic.protobuf import portnums_pb2
+
+from src.proxy.capture import BackgroundCaptureWriter, CaptureWriter, FROM_RADIO, TO_RADIO
+from src.proxy.framing import FrameParser, HEADER_LEN
+from src.proxy.metrics import ProxyMetrics
+from src.proxy.state_cache import (RadioStateCache, SPECIAL_NONCE_ONLY_CONFIG, SPECIAL_NONCE_ONLY_NODES,
+                                   parse_to_radio, want_config_frame)
+
+
+IOV_MAX = 1024  # buffers per sendmsg call
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+
+class _ProxyClient:
+    """
+    A downstream client connected to the proxy (a phone app, the bot, etc)
+
+    Outbound data sits in a bounded queue that is drained whenever the socket is writable, so one slow
+    client can only ever fill its own queue. The queue holds the same frame buffers that were received from
+    the radio (shared with every other client), and is drained with scatter/gather sendmsg calls.
+    """
+    RECV_BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, sock: socket.socket, addr):
+        self.sock = sock
+        self.addr = addr
+        self.queue: deque = deque()
+        # [enqueue time, bytes still queued] per enqueue call, to work out how far behind the client is
+        self.batches: deque[list] = deque()
+        self.queued_bytes = 0
+        self.dropped_bytes = 0
+        self.dropping = False
+        self.parser = FrameParser(self.RECV_BLOCK_SIZE)
+        self.events = selectors.EVENT_READ
+        self.closed = False
+
+    def enqueue(self, buffers: list, size: int, now: float) -> None:
+        self.queue.extend(buffers)
+        self.batches.append([now, size])
+        self.queued_bytes += size
+
+    def flush(self) -> None:
+        """
+        Send as much of the queue as the socket will take without blocking
+        """
+        queue = self.queue
+        while queue:
+            if _HAS_SENDMSG:
+                buffers = list(itertools.islice(queue, IOV_MAX))
+                to_send = sum(len(b) for b in buffers)
+                try:
+                    sent = self.sock.sendmsg(buffers)
+                except (BlockingIOError, InterruptedError):
+                    return
+            else:
+                to_send = len(queue[0])
+                try:
+                    sent = self.sock.send(queue[0])
+                except (BlockingIOError, InterruptedError):
+                    return
+
+            self._consume(sent)
+            if sent < to_send:
+                return
+
+    def _consume(self, sent: int) -> None:
+        self.queued_bytes -= sent
+
+        remaining = sent
+        queue = self.queue
+        while remaining:
+            head = queue[0]
+            if remaining >= len(head):
+                remaining -= len(head)
+                queue.popleft()
+            else:
+                queue[0] = memoryview(head)[remaining:]
+                remaining = 0
+
+        remaining = sent
+        batches = self.batches
+        while remaining and batches:
+            batch = batches[0]
+            if remaining >= batch[1]:
+                remaining -= batch[1]
+                batches.popleft()
+            else:
+                batch[1] -= remaining
+                remaining = 0
+
+    def lag_secs(self, now: float) -> float:
+        """
+        How long the oldest unsent data has been waiting
+        """
+        return now - self.batches[0][0] if self.batches else 0.0
+
+
+class _LocalProxyClient:
+    """
+    A client in the same process as the proxy (the bot), fed frames through a queue rather than a socket.
+
+    Broadcasts arrive as runs of whole frames, which are split on their headers and queued one frame each,
+    still as views of the proxy's receive buffer. Data written by the client goes back through the proxy
+    loop, so it is handled exactly like data from a socket client.
+    """
+    sock = None
+    RECV_BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, proxy: 'TcpProxy', name: str):
+        self.proxy = proxy
+        self.addr = name
+        # (enqueue time, frame), or None once the client has been detached
+        self.frames: queue.Queue = queue.Queue()
+        self.queued_bytes = 0
+        self.dropped_bytes = 0
+        self.dropping = False
+        self.parser = FrameParser(self.RECV_BLOCK_SIZE)
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def enqueue(self, buffers: list, size: int, now: float) -> None:
+        with self._lock:
+            self.queued_bytes += size
+        for buffer in buffers:
+            pos = 0
+            end = len(buffer)
+            while pos < end:
+                frame_end = pos + HEADER_LEN + ((buffer[pos + 2] << 8) | buffer[pos + 3])
+                self.frames.put((now, buffer[pos:frame_end]))
+                pos = frame_end
+
+    def get_frame(self, timeout: float):
+        """
+        Wait for the next frame from the radio (called by the client)
+        :return: the frame, header included, or None if the proxy has detached this client
+        :raises queue.Empty: if nothing arrived within the timeout
+        """
+        item = self.frames.get(timeout=timeout)
+        if item is None:
+            return None
+        frame = item[1]
+        with self._lock:
+            self.queued_bytes -= len(frame)
+        return frame
+
+    def send(self, data: bytes) -> None:
+        """
+        Send data towards the radio (called by the client, from any thread)
+        """
+        if self.closed:
+            raise ConnectionError("Detached from the proxy")
+        self.proxy.call_soon_threadsafe(self.proxy._on_local_client_data, self, bytes(data))
+
+    def lag_secs(self, now: float) -> float:
+        with self.frames.mutex:
+            head = self.frames.queue[0] if self.frames.queue else None
+        return now - head[0] if head else 0.0
+
+    def detach(self) -> None:
+        self.frames.put(None)
+
 
 class TcpProxy:
-    def __init__(self, target_host, target_port=4403, listen_host='0.0.0.0', listen_port=4403):
+    """
+    Fan out a single TCP connection to a Meshtastic radio to any number of clients.
+
+    Both directions are parsed into Meshtastic frames, so clients only ever receive (and the radio only ever
+    receives) whole frames: broadcasts and slow-client drops happen on frame boundaries, and writes from
+    several clients are serialised frame by frame so they can't interleave at the radio.
+
+    The proxy downloads the radio's config itself and keeps it in a RadioStateCache. When a client asks for
+    the config (want_config_id) it is answered straight from the cache, so clients don't each trigger a full
+    download from the radio.
+
+    A client in the same process (the bot) can attach with attach_local_client() and exchange frames with
+    the proxy directly, skipping the localhost socket and a second frame parser.
+
+    Everything runs on one non-blocking selector loop on a background thread. Anything that used to block
+    (reconnect backoff, the watchdog, pacing the init buffer replay) is a timer on that loop instead, so a
+    flapping radio or a new client connecting never stalls traffic to the other clients.
+    """
+    RECV_SIZE = 16384
+    CONNECT_TIMEOUT = 10.0
+    WATCHDOG_TIMEOUT = 300.0  # Reconnect if no data from target for 5 minutes
+    WATCHDOG_INTERVAL = 5.0
+    HEARTBEAT_INTERVAL = 60.0
+    MAX_BACKOFF = 60
+    CONFIG_TIMEOUT = 60.0  # re-request the config if the radio hasn't finished sending it by then
+    CONFIG_REFRESH_DELAY = 5.0  # re-read the config this long after a client sends an admin message
+    MAX_TARGET_BACKLOG = 65536  # bytes of client writes held while the target is disconnected
+    SLOW_CLIENT_POLICIES = ('drop', 'disconnect')
+
+    def __init__(self, target_host, target_port=4403, listen_host='0.0.0.0', listen_port=4403,
+                 client_high_water: int = 256 * 1024,
+                 client_low_water: int = None,
+                 slow_client_policy: str = 'drop',
+                 max_client_lag: float = 60.0,
+                 capture_dir: str = None,
+                 capture_segment_bytes: int = CaptureWriter.DEFAULT_SEGMENT_BYTES):
+        """
+        :param client_high_water: queued bytes at which a client is considered to be lagging
+        :param client_low_water: queued bytes below which a 'drop' client starts receiving data again
+        :param slow_client_policy: 'drop' to discard data for a lagging client, 'disconnect' to evict it
+        :param max_client_lag: seconds the oldest queued data may wait before the client is evicted
+        :param capture_dir: if set, every frame to and from the radio is appended to capture segments here
+        :param capture_segment_bytes: size at which a new capture segment is started
+        """
+        if slow_client_policy not in self.SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy '{slow_client_policy}' - options are {self.SLOW_CLIENT_POLICIES}")
         self.target_host = target_host
         self.target_port = int(target_port)
         self.listen_host = listen_host
         self.listen_port = int(listen_port)
         self.server_socket = None
         self.target_socket = None
-        self.clients = []
+        self.clients: list[_ProxyClient | _LocalProxyClient] = []
         self.running = False
-        self.init_buffer = b''
-        self.init_buffer_done = False
-        self.buffer_time = 5.0  # seconds to buffer startup data (increased for safety)
+        self.listening = threading.Event()
+        self.state_cache = RadioStateCache()
+        self.metrics = ProxyMetrics()
+        self.capture = BackgroundCaptureWriter(CaptureWriter(capture_dir, capture_segment_bytes)) \
+            if capture_dir else None
+        self.last_target_activity = time.time()
+
+        self.client_high_water = int(client_high_water)
+        self.client_low_water = int(client_low_water) if client_low_water is not None else self.client_high_water // 2
+        self.slow_client_policy = slow_client_policy
+        self.max_client_lag = float(max_client_lag)
+
+        self._selector = None
+        self._target_connected = False
+        self._target_parser = FrameParser()
+        self._target_out: deque = deque()
+        self._target_out_bytes = 0
+        self._target_head_partial = False
+        self._target_events = 0
+        self._connect_timer = None
+        self._own_config_id = None
+        self._config_requested_at = None
+        self._config_timer = None
+        self._refresh_timer = None
+        # clients waiting for the cache to be ready: (client, config_id)
+        self._pending_config_requests: list[tuple[_ProxyClient, int]] = []
+        self._backoff = 1
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._calls = []
+        self._calls_lock = threading.Lock()
+        self._waker = None
+        self._wakee = None
 
     def start(self):
         self.running = True
-        self.thread = threading.Thread(target=self._run)
+        self._waker, self._wakee = socket.socketpair()
+        self._waker.setblocking(False)
+        self._wakee.setblocking(False)
+        self.thread = threading.Thread(target=self._run, name="tcp proxy")
         self.thread.daemon = True
         self.thread.start()
 
     def stop(self):
         self.running = False
-        if self.server_socket:
-            try:
-                self.server_socket.close()
-            except:
-                pass
-        if self.target_socket:
-            try:
-                self.target_socket.close()
-            except:
-                pass
+        self._wake()
+
+    def wait_until_listening(self, timeout: float = None) -> bool:
+        """
+        Wait until the proxy is accepting client connections
+        :return: False if it timed out, or the proxy couldn't bind its port
+        """
+        return self.listening.wait(timeout) and self.running
+
+    def attach_local_client(self, name: str = 'local') -> _LocalProxyClient:
+        """
+        Attach a client in this process: see _LocalProxyClient. Safe to call from any thread.
+        """
+        client = _LocalProxyClient(self, name)
+        self.call_soon_threadsafe(self._add_local_client, client)
+        return client
+
+    def detach_local_client(self, client: _LocalProxyClient):
+        self.call_soon_threadsafe(self._close_client, client)
 
     def get_status(self):
         if not self.running:
             return "Proxy: Offline"
-        
-        silence = time.time() - self.last_target_activity if hasattr(self, 'last_target_activity') else 0
+
+        silence = time.time() - self.last_target_activity
         return {
-            "connected": self.target_socket is not None and self.target_socket.fileno() != -1,
+            "connected": self._target_connected,
             "clients": len(self.clients),
-            "silence_secs": int(silence)
+            "silence_secs": int(silence),
+            "cached_nodes": self.state_cache.node_count,
+            "client_lag": self.get_client_lag(),
+            "metrics": self.metrics.snapshot(),
         }
 
+    def get_client_lag(self) -> list[dict]:
+        """
+        Outbound queue state for every connected client
+        """
+        now = time.monotonic()
+        return [{
+            "addr": f"{client.addr[0]}:{client.addr[1]}" if isinstance(client.addr, tuple) else str(client.addr),
+            "queued_bytes": client.queued_bytes,
+            "lag_secs": round(client.lag_secs(now), 3),
+            "dropped_bytes": client.dropped_bytes,
+        } for client in self.clients[:]]
+
+    # --- Loop plumbing ---
+
+    def call_later(self, delay: float, callback, *args):
+        """
+        Schedule a callback on the proxy loop. Only call this from the loop thread.
+        """
+        timer = [time.monotonic() + delay, next(self._timer_seq), callback, args, False]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    @staticmethod
+    def cancel_timer(timer):
+        if timer:
+            timer[4] = True
+
+    def call_soon_threadsafe(self, callback, *args):
+        """
+        Run a callback on the proxy loop from any thread
+        """
+        with self._calls_lock:
+            self._calls.append((callback, args))
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._waker.send(b'\0')
+        except (AttributeError, BlockingIOError, OSError):
+            pass
+
+    def _on_wake(self, _mask):
+        try:
+            while self._wakee.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _run_timers(self):
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, callback, args, cancelled = heapq.heappop(self._timers)
+            if not cancelled:
+                self._safe_call(callback, *args)
+
+    def _run_calls(self):
+        with self._calls_lock:
+            calls, self._calls = self._calls, []
+        for callback, args in calls:
+            self._safe_call(callback, *args)
+
+    @staticmethod
+    def _safe_call(callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.exception(f"Error in proxy callback {getattr(callback, '__name__', callback)}: {e}")
+
+    def _next_timeout(self) -> float:
+        if not self._timers:
+            return 1.0
+        return max(0.0, min(1.0, self._timers[0][0] - time.monotonic()))
+
     def _run(self):
         logging.info(f"Starting TCP Proxy on {self.listen_host}:{self.listen_port} -> {self.target_host}:{self.target_port}")
 
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wakee, selectors.EVENT_READ, self._on_wake)
+
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
@@ -58,213 +392,495 @@ class TcpProxy:
         except Exception as e:
             logging.error(f"Failed to bind proxy port {self.listen_port}: {e}")
             self.running = False
+            self.listening.set()
+            self._cleanup()
             return
-            
+
+        # pick up the real port if we were asked to bind to an ephemeral one
+        self.listen_port = self.server_socket.getsockname()[1]
         self.server_socket.listen(5)
+        self.server_socket.setblocking(False)
+        self._selector.register(self.server_socket, selectors.EVENT_READ, self._on_accept)
+        self.listening.set()
+
+        self._connect_target()
+        self.call_later(self.HEARTBEAT_INTERVAL, self._heartbeat)
+        self.call_later(self.WATCHDOG_INTERVAL, self._watchdog)
 
-        # Connect to target
-        backoff = 1
         while self.running:
             try:
-                self.target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.target_socket.connect((self.target_host, self.target_port))
-                logging.info(f"Proxy connected to target device at {self.target_host}:{self.target_port}")
-                break
+                events = self._selector.select(self._next_timeout())
             except Exception as e:
-                logging.error(f"Failed to connect to target ({self.target_host}): {e}. Retrying in {backoff}s...")
-                time.sleep(backoff)
-                backoff = min(backoff * 2, 60)
+                logging.error(f"Select error: {e}")
+                self._drop_closed_clients()
+                continue
 
+            for key, mask in events:
+                self._safe_call(key.data, mask)
+            self._run_timers()
+            self._run_calls()
+
+        self._cleanup()
+
+    def _cleanup(self):
+        self.listening.clear()
+        for client in self.clients[:]:
+            self._close_client(client)
+        self._close_target()
+        if self.capture:
+            self.capture.close()
+        for sock in (self.server_socket, self._waker, self._wakee):
+            if sock:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        if self._selector:
+            self._selector.close()
+
+    # --- Target (radio) connection ---
+
+    def _connect_target(self):
         if not self.running:
             return
 
-        start_time = time.time()
-        last_target_activity = time.time()
-        watchdog_timeout = 300.0  # Reconnect if no data from target for 5 minutes
-        last_heartbeat_log = time.time()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            err = sock.connect_ex((self.target_host, self.target_port))
+        except OSError as e:
+            sock.close()
+            self._schedule_reconnect(e)
+            return
 
-        while self.running:
-            try:
-                # Filter out closed sockets from inputs
-                # We rebuild the list of inputs every time to ensure we are using the current target_socket
-                # (which might have changed after a reconnect)
-                inputs = [self.server_socket, self.target_socket]
-                current_inputs = [s for s in inputs + self.clients if s and s.fileno() != -1]
-                readable, _, _ = select.select(current_inputs, [], [], 1.0)
-            except Exception as e:
-                logging.error(f"Select error: {e}")
-                # Clean up closed sockets from our list
-                self.clients = [c for c in self.clients if c.fileno() != -1]
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            sock.close()
+            self._schedule_reconnect(OSError(err, errno.errorcode.get(err, str(err))))
+            return
+
+        self.target_socket = sock
+        self._selector.register(sock, selectors.EVENT_WRITE, self._on_target_connect)
+        self._connect_timer = self.call_later(self.CONNECT_TIMEOUT, self._on_target_connect_timeout, sock)
+
+    def _on_target_connect(self, _mask):
+        sock = self.target_socket
+        self.cancel_timer(self._connect_timer)
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            self._close_target()
+            self._schedule_reconnect(OSError(err, errno.errorcode.get(err, str(err))))
+            return
+
+        logging.info(f"Proxy connected to target device at {self.target_host}:{self.target_port}")
+        self._target_connected = True
+        self._target_events = selectors.EVENT_WRITE
+        self._backoff = 1
+        self.metrics.target_connected(time.monotonic())
+        self.last_target_activity = time.time()
+        self._update_target_events()
+        self._request_config()
+
+    def _on_target_connect_timeout(self, sock):
+        if sock is self.target_socket and not self._target_connected:
+            self._close_target()
+            self._schedule_reconnect(TimeoutError("connect timed out"))
+
+    def _schedule_reconnect(self, error: Exception = None):
+        if not self.running:
+            return
+        logging.error(f"Failed to connect to target ({self.target_host}): {error}. Retrying in {self._backoff}s...")
+        self.call_later(self._backoff, self._connect_target)
+        self._backoff = min(self._backoff * 2, self.MAX_BACKOFF)
+
+    def _close_target(self):
+        sock = self.target_socket
+        self.target_socket = None
+        if self._target_connected:
+            self.metrics.target_disconnected(time.monotonic())
+        self._target_connected = False
+        self._target_parser.reset()
+        if self._target_head_partial:
+            # the radio only saw part of this frame, so the rest would be garbage on a new connection
+            self._target_out_bytes -= len(self._target_out.popleft())
+            self._target_head_partial = False
+        if sock is None:
+            return
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _target_lost(self, reason: str):
+        logging.warning(f"{reason}. Restarting proxy connection...")
+        self._close_target()
+        self._backoff = 1
+        self.call_later(0, self._connect_target)
+
+    def _update_target_events(self):
+        if not self._target_connected:
+            return
+        events = selectors.EVENT_READ
+        if self._target_out:
+            events |= selectors.EVENT_WRITE
+        if events != self._target_events:
+            self._selector.modify(self.target_socket, events, self._on_target_event)
+            self._target_events = events
+
+    def _on_target_event(self, mask):
+        if mask & selectors.EVENT_READ:
+            self._on_target_readable()
+        if mask & selectors.EVENT_WRITE and self._target_connected:
+            self._flush_target()
+
+    def _on_target_readable(self):
+        self.last_target_activity = time.time()
+        try:
+            received = self._target_parser.recv_into(self.target_socket, self.RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._target_lost(f"Error reading from target: {e}")
+            return
+
+        if not received:
+            self._target_lost("Target closed connection")
+            return
+
+        # Broadcast views into the parser's receive buffer, shared by every client queue. Runs of adjacent
+        # frames go out as a single slice.
+        parser = self._target_parser
+        spans = parser.frame_spans()
+        now = time.monotonic()
+        self.metrics.radio_bytes_in.add(received, now)
+        self.metrics.radio_frames_in.add(len(spans), now)
+        if self.capture:
+            timestamp = time.time()
+            for start, end in spans:
+                self.capture.write(FROM_RADIO, parser.view(start, end), timestamp)
+
+        to_broadcast = []
+        span_start = span_end = None
+        for start, end in spans:
+            if not self._handle_radio_frame(parser.view(start, end)):
                 continue
+            if start != span_end:
+                if span_start is not None:
+                    to_broadcast.append(parser.view(span_start, span_end))
+                span_start = start
+            span_end = end
+        if span_start is not None:
+            to_broadcast.append(parser.view(span_start, span_end))
 
-            current_time = time.time()
-
-            # Heartbeat Logging & Watchdog Check
-            if current_time - last_heartbeat_log > 60.0:
-                silence_duration = current_time - last_target_activity
-                logging.info(f"Proxy Heartbeat: Connected. Last data from radio {silence_duration:.1f}s ago. Clients: {len(self.clients)}")
-                last_heartbeat_log = current_time
-            
-            # Watchdog: Force reconnect if silence is too long
-            if current_time - last_target_activity > watchdog_timeout:
-                logging.warning(f"Watchdog: No data from radio for {watchdog_timeout}s. Forcing reconnect...")
-                try:
-                    self.target_socket.close()
-                except:
-                    pass
-                
-                # Reconnect logic
-                reconnected = False
-                backoff = 1
-                while self.running and not reconnected:
-                    try:
-                        self.target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        self.target_socket.connect((self.target_host, self.target_port))
-                        logging.info("Watchdog: Reconnected to target successfully.")
-                        last_target_activity = time.time() # Reset timer
-                        reconnected = True
-                    except Exception as ex:
-                        logging.error(f"Watchdog reconnect failed: {ex}. Retrying in {backoff}s...")
-                        time.sleep(backoff)
-                        backoff = min(backoff * 2, 10)
-
-            # Check for init buffer timeout
-            if not self.init_buffer_done and (current_time - start_time > self.buffer_time):
-                self.init_buffer_done = True
-                if self.init_buffer:
-                    logging.info(f"Init buffer capture finished. Size: {len(self.init_buffer)} bytes")
-
-            for sock in readable:
-                if sock is self.server_socket:
-                    try:
-                        client_socket, addr = self.server_socket.accept()
-                        logging.info(f"New proxy connection from {addr}")
-                        self.clients.append(client_socket)
-                        # Replay init buffer
-                        if self.init_buffer:
-                            try:
-                                # Send in chunks to avoid overwhelming the client's startup sequence
-                                chunk_size = 1024
-                                for i in range(0, len(self.init_buffer), chunk_size):
-                                    chunk = self.init_buffer[i:i+chunk_size]
-                                    client_socket.sendall(chunk)
-                                    time.sleep(0.05)  # 50ms delay between chunks
-                                logging.info(f"Sent {len(self.init_buffer)} bytes of cached init data to {addr}")
-                            except Exception as e:
-                                logging.error(f"Error sending init buffer to client: {e}")
-                    except Exception as e:
-                         logging.error(f"Error accepting connection: {e}")
-
-                elif sock is self.target_socket:
-                    last_target_activity = time.time() # Update activity timestamp
-                    try:
-                        data = self.target_socket.recv(16384)
-                        if not data:
-                            logging.warning("Target closed connection. Restarting proxy connection...")
-                            # Close the target socket
-                            self.target_socket.close()
-                            
-                            # Attempt to reconnect loop
-                            reconnected = False
-                            backoff = 1
-                            while self.running and not reconnected:
-                                try:
-                                    self.target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                                    self.target_socket.connect((self.target_host, self.target_port))
-                                    logging.info("Reconnected to target.")
-                                    reconnected = True
-                                    # We don't reset inputs because target_socket is updated
-                                except:
-                                    time.sleep(backoff)
-                                    backoff = min(backoff * 2, 30)
-                            
-                            if not reconnected:
-                                self.running = False # Give up
-                            break # Break the inner loop to refresh select() with new socket
-                        
-                        if not self.init_buffer_done:
-                            self.init_buffer += data
-
-                        # Broadcast to all clients
-                        for client in self.clients[:]:
-                            try:
-                                client.sendall(data)
-                            except:
-                                if client in self.clients:
-                                    self.clients.remove(client)
-                                try:
-                                    client.close()
-                                except:
-                                    pass
-                    except Exception as e:
-                        logging.error(f"Error reading from target: {e}")
-                        # We should probably attempt reconnect here too, but for simplicity let's break
-                        # and let the user restart if it's a hard fail. 
-                        # Or better, treating it as a disconnect:
-                        self.target_socket.close()
-                        # Simple reconnect attempt (blocking) - ideally this would be async but 
-                        # blocking here for a few seconds is better than crashing
-                        try:
-                            time.sleep(5)
-                            self.target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                            self.target_socket.connect((self.target_host, self.target_port))
-                            logging.info("Reconnected to target after error.")
-                        except:
-                            logging.error("Failed to reconnect immediately.")
+        if to_broadcast:
+            self._broadcast(to_broadcast)
+
+    def _send_to_target(self, frame):
+        self._target_out.append(frame)
+        self._target_out_bytes += len(frame)
+
+        # drop the oldest whole frames (never one that's half sent) to stay within the backlog
+        dropped = 0
+        first_droppable = 1 if self._target_head_partial else 0
+        while self._target_out_bytes > self.MAX_TARGET_BACKLOG and len(self._target_out) > first_droppable + 1:
+            if first_droppable:
+                frame_to_drop = self._target_out[first_droppable]
+                del self._target_out[first_droppable]
+            else:
+                frame_to_drop = self._target_out.popleft()
+            self._target_out_bytes -= len(frame_to_drop)
+            dropped += 1
+        if dropped:
+            logging.warning(f"Target backlog full, dropped {dropped} frames of client data")
+
+        self._update_target_events()
+
+    def _flush_target(self):
+        sent_bytes = sent_frames = 0
+        while self._target_out:
+            frame = self._target_out[0]
+            try:
+                sent = self.target_socket.send(frame)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                self._target_lost(f"Error sending to target: {e}")
+                return
+            if self.capture and not self._target_head_partial:
+                # captured as it goes on the wire, so the capture has what the radio saw, when it saw it
+                self.capture.write(TO_RADIO, frame)
+            self._target_out_bytes -= sent
+            sent_bytes += sent
+            if sent < len(frame):
+                self._target_out[0] = memoryview(frame)[sent:]
+                self._target_head_partial = True
+                break
+            self._target_out.popleft()
+            self._target_head_partial = False
+            sent_frames += 1
+
+        now = time.monotonic()
+        self.metrics.radio_bytes_out.add(sent_bytes, now)
+        self.metrics.radio_frames_out.add(sent_frames, now)
+        self._update_target_events()
+
+    # --- Scheduled tasks ---
+
+    # --- Radio state cache ---
+
+    CONFIG_VARIANTS = {'my_info', 'node_info', 'config', 'moduleConfig', 'channel', 'metadata', 'fileInfo',
+                       'deviceuiConfig', 'config_complete_id'}
+
+    def _request_config(self):
+        """
+        Ask the radio for a full config download to (re)fill the state cache
+        """
+        self.cancel_timer(self._refresh_timer)
+        self._refresh_timer = None
+        if not self._target_connected:
+            return
+
+        config_id = random.randint(1, 0xFFFFFFFF)
+        while config_id in (SPECIAL_NONCE_ONLY_CONFIG, SPECIAL_NONCE_ONLY_NODES):
+            config_id = random.randint(1, 0xFFFFFFFF)
+        self._own_config_id = config_id
+        self._config_requested_at = time.monotonic()
+        self.state_cache.begin_refresh()
+        self._send_to_target(want_config_frame(config_id))
+
+        self.cancel_timer(self._config_timer)
+        self._config_timer = self.call_later(self.CONFIG_TIMEOUT, self._on_config_timeout, config_id)
+
+    def _on_config_timeout(self, config_id: int):
+        if config_id == self._own_config_id:
+            logging.warning("Radio did not finish sending its config, requesting it again")
+            self._request_config()
+
+    def _schedule_config_refresh(self):
+        self.cancel_timer(self._refresh_timer)
+        self._refresh_timer = self.call_later(self.CONFIG_REFRESH_DELAY, self._request_config)
+
+    def _handle_radio_frame(self, frame) -> bool:
+        """
+        Update the state cache from a radio frame
+        :return: True if the frame should be broadcast to clients
+        """
+        from_radio = self.state_cache.update(frame)
+        if from_radio is None:
+            return True
+
+        variant = from_radio.WhichOneof('payload_variant')
+        if variant == 'rebooted':
+            self._schedule_config_refresh()
+            return True
+
+        if self._own_config_id is None or variant not in self.CONFIG_VARIANTS:
+            return True
+
+        # This is part of the download we asked for - keep it to ourselves
+        if variant == 'config_complete_id' and from_radio.config_complete_id == self._own_config_id:
+            self._own_config_id = None
+            self.cancel_timer(self._config_timer)
+            self.metrics.config_downloads.record(time.monotonic() - self._config_requested_at)
+            self._serve_pending_config_requests()
+        return False
+
+    def _serve_pending_config_requests(self):
+        requests, self._pending_config_requests = self._pending_config_requests, []
+        for client, config_id in requests:
+            self._send_config_snapshot(client, config_id)
+
+    def _send_config_snapshot(self, client: _ProxyClient, config_id: int):
+        if client.closed:
+            return
+        start = time.perf_counter()
+        frames = self.state_cache.snapshot(config_id)
+        size = sum(len(frame) for frame in frames)
+        self._send_to_client(client, frames, size, force=True)
+        elapsed = time.perf_counter() - start
+        self.metrics.config_snapshots.record(elapsed)
+        elapsed_ms = elapsed * 1000
+        logging.info(f"Sent config snapshot ({len(frames)} frames, {size} bytes) to {client.addr} "
+                     f"in {elapsed_ms:.1f}ms")
 
+    def _handle_client_frame(self, client: _ProxyClient, frame):
+        to_radio = parse_to_radio(frame)
+        if to_radio is not None:
+            variant = to_radio.WhichOneof('payload_variant')
+            if variant == 'want_config_id':
+                # Answer from the cache rather than making the radio send everything again
+                if self.state_cache.complete:
+                    self._send_config_snapshot(client, to_radio.want_config_id)
                 else:
-                    # Data from a client
-                    try:
-                        data = sock.recv(16384)
-                        if not data:
-                            if sock in self.clients:
-                                self.clients.remove(sock)
-                            sock.close()
-                        else:
-                            # Forward to target
-                            try:
-                                self.target_socket.sendall(data)
-                            except Exception as e:
-                                logging.error(f"Error sending to target: {e}. Attempting to reconnect...")
-                                # Force a reconnection attempt
-                                try:
-                                    self.target_socket.close()
-                                except:
-                                    pass
-                                
-                                # Reconnect logic
-                                reconnected = False
-                                backoff = 1
-                                while self.running and not reconnected:
-                                    try:
-                                        self.target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                                        self.target_socket.connect((self.target_host, self.target_port))
-                                        logging.info("Reconnected to target successfully.")
-                                        # Resend the data that failed
-                                        self.target_socket.sendall(data)
-                                        reconnected = True
-                                    except Exception as ex:
-                                        logging.error(f"Reconnect failed: {ex}. Retrying in {backoff}s...")
-                                        time.sleep(backoff)
-                                        backoff = min(backoff * 2, 10)
-                                
-                                if not reconnected:
-                                    self.running = False
-                    except:
-                        if sock in self.clients:
-                            self.clients.remove(sock)
-                        try:
-                            sock.close()
-                        except:
-                            pass
-
-        # Cleanup
-        if self.server_socket: 
-            try: self.server_socket.close()
-            except: pass
-        if self.target_socket: 
-            try: self.target_socket.close()
-            except: pass
-        for c in self.clients: 
-            try: c.close()
-            except: pass
+                    self._pending_config_requests.append((client, to_radio.want_config_id))
+                    if self._own_config_id is None:
+                        self._request_config()
+                return
+            if variant == 'packet' and to_radio.packet.decoded.portnum == portnums_pb2.PortNum.ADMIN_APP:
+                # admin messages can change the config, so re-read it once they've had a chance to apply
+                self._schedule_config_refresh()
+
+        self._send_to_target(frame)
+
+    def _heartbeat(self):
+        silence_duration = time.time() - self.last_target_activity
+        state = "Connected" if self._target_connected else "Reconnecting"
+        logging.info(f"Proxy Heartbeat: {state}. Last data from radio {silence_duration:.1f}s ago. Clients: {len(self.clients)}")
+        now = time.monotonic()
+        metrics = self.metrics
+        logging.info(f"Proxy traffic: radio in {metrics.radio_frames_in.rate(now):.2f} frames/s "
+                     f"({metrics.radio_bytes_in.rate(now):.0f} B/s), radio out {metrics.radio_frames_out.rate(now):.2f} "
+                     f"frames/s, {metrics.reconnects} reconnects, {metrics.downtime_secs(now):.0f}s downtime")
+        for lag in self.get_client_lag():
+            if lag['queued_bytes'] or lag['dropped_bytes']:
+                logging.info(f"Proxy client {lag['addr']} lagging: {lag['queued_bytes']} bytes queued, "
+                             f"oldest {lag['lag_secs']:.1f}s, {lag['dropped_bytes']} bytes dropped")
+        self.call_later(self.HEARTBEAT_INTERVAL, self._heartbeat)
+
+    def _watchdog(self):
+        # Force reconnect if silence is too long
+        if self._target_connected and time.time() - self.last_target_activity > self.WATCHDOG_TIMEOUT:
+            logging.warning(f"Watchdog: No data from radio for {self.WATCHDOG_TIMEOUT}s. Forcing reconnect...")
+            self.metrics.watchdog_trips += 1
+            self._target_lost("Watchdog tripped")
+
+        # Evict clients that haven't read anything in too long
+        now = time.monotonic()
+        for client in self.clients[:]:
+            if client.lag_secs(now) > self.max_client_lag:
+                logging.warning(f"Evicting proxy client {client.addr}: {client.queued_bytes} bytes queued "
+                                f"for {client.lag_secs(now):.1f}s")
+                self._close_client(client)
+
+        self.call_later(self.WATCHDOG_INTERVAL, self._watchdog)
+
+    # --- Clients ---
+
+    def _on_accept(self, _mask):
+        try:
+            client_socket, addr = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            logging.error(f"Error accepting connection: {e}")
+            return
+
+        logging.info(f"New proxy connection from {addr}")
+        client_socket.setblocking(False)
+        client = _ProxyClient(client_socket, addr)
+        self.clients.append(client)
+        self._selector.register(client_socket, selectors.EVENT_READ, lambda mask: self._on_client_event(client, mask))
+
+    def _add_local_client(self, client: _LocalProxyClient):
+        if client.closed:
+            return
+        logging.info(f"Local proxy client '{client.addr}' attached")
+        self.clients.append(client)
+
+    def _on_local_client_data(self, client: _LocalProxyClient, data: bytes):
+        if client.closed:
+            return
+        for frame in client.parser.feed(data):
+            self._handle_client_frame(client, frame)
+
+    def _on_client_event(self, client: _ProxyClient, mask):
+        if mask & selectors.EVENT_READ:
+            self._on_client_readable(client)
+        if mask & selectors.EVENT_WRITE and not client.closed:
+            self._flush_client(client)
+
+    def _on_client_readable(self, client: _ProxyClient):
+        try:
+            received = client.parser.recv_into(client.sock, self.RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close_client(client)
+            return
+
+        if not received:
+            self._close_client(client)
+            return
+
+        for frame in client.parser.frames():
+            self._handle_client_frame(client, frame)
+
+    def _broadcast(self, frames: list):
+        size = sum(len(frame) for frame in frames)
+        for client in self.clients[:]:
+            self._send_to_client(client, frames, size)
+
+    def _send_to_client(self, client: _ProxyClient, frames: list, size: int, force=False):
+        if client.closed:
+            return
+
+        if force:
+            # bypass the slow client checks, e.g. for a config snapshot the client has just asked for
+            client.enqueue(frames, size, time.monotonic())
+            self._flush_client(client)
+            return
+
+        if client.dropping and client.queued_bytes <= self.client_low_water:
+            logging.info(f"Proxy client {client.addr} caught up, resuming ({client.dropped_bytes} bytes dropped so far)")
+            client.dropping = False
+
+        if not client.dropping and client.queued_bytes + size > self.client_high_water:
+            if self.slow_client_policy == 'disconnect':
+                logging.warning(f"Disconnecting slow proxy client {client.addr}: {client.queued_bytes} bytes queued")
+                self._close_client(client)
+                return
+            logging.warning(f"Proxy client {client.addr} is lagging ({client.queued_bytes} bytes queued), dropping data")
+            client.dropping = True
+
+        if client.dropping:
+            client.dropped_bytes += size
+            return
+
+        client.enqueue(frames, size, time.monotonic())
+        # if data was already waiting, the socket is full and the selector will tell us when it drains
+        if client.queued_bytes == size:
+            self._flush_client(client)
+
+    def _flush_client(self, client: _ProxyClient):
+        if client.sock is None:
+            return  # a local client is handed frames as soon as they're queued
+        queued = client.queued_bytes
+        try:
+            client.flush()
+        except OSError:
+            self._close_client(client)
+            return
+        self.metrics.client_bytes_out.add(queued - client.queued_bytes, time.monotonic())
+
+        events = selectors.EVENT_READ
+        if client.queue:
+            events |= selectors.EVENT_WRITE
+        if events != client.events:
+            self._selector.modify(client.sock, events, self._selector.get_key(client.sock).data)
+            client.events = events
+
+    def _close_client(self, client: _ProxyClient):
+        if client.closed:
+            return
+        client.closed = True
+        if client in self.clients:
+            self.clients.remove(client)
+        if client.sock is None:
+            client.detach()
+            return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    def _drop_closed_clients(self):
+        for client in self.clients[:]:
+            if client.sock is not None and client.sock.fileno() == -1:
+                self._close_client(client)
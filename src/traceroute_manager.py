@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+
+class TraceStatus(Enum):
+    """
+    What became of a traceroute request
+    """
+    CACHED = 'cached'  # answered from a recent trace, nothing sent
+    JOINED = 'joined'  # a trace to the same target is already in flight; its result goes to this requester too
+    STARTED = 'started'  # a new trace should be sent
+    BUSY = 'busy'  # too many traces in flight, try again later
+
+
+@dataclass
+class TracedRoute:
+    target_id: str
+    route: list[int]
+    route_back: list[int]
+    traced_at: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.traced_at
+
+
+@dataclass
+class PendingTrace:
+    target_id: str
+    requesters: list[str]
+    started_at: float
+    packet_id: int | None = None
+    gateway: str | None = None
+
+
+@dataclass
+class TraceStats:
+    started: int = 0
+    joined: int = 0
+    cache_hits: int = 0
+    busy: int = 0
+    completed: int = 0
+    failed: int = 0
+    expired: int = 0
+    in_flight: int = 0
+
+
+class TracerouteManager:
+    """
+    Keeps track of the traceroutes the bot has in flight, so that:
+    - a trace that's never answered expires after request_ttl seconds, rather than being waited on forever
+    - no more than max_in_flight traces are out on the mesh at once
+    - asking for a trace to a target that's already being traced joins that trace instead of starting another
+    - a trace to the same target within cache_ttl seconds is answered from the last result, without any airtime
+    """
+    MAX_HOP_LIMIT = 7
+
+    def __init__(self, request_ttl: float = 120.0, max_in_flight: int = 2, cache_ttl: float = 600.0):
+        self.request_ttl = request_ttl
+        self.max_in_flight = max_in_flight
+        self.cache_ttl = cache_ttl
+        self.stats = TraceStats()
+        # target id -> the trace in flight to it
+        self._pending: dict[str, PendingTrace] = {}
+        # target id -> the last route traced to it
+        self._routes: dict[str, TracedRoute] = {}
+        # traces given up on, whose requesters haven't been told yet
+        self._expired: list[PendingTrace] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hop_limit_for(hops_away: int | None) -> int:
+        """
+        Enough hops to reach a node we heard from hops_away hops away, with one to spare in case the route changed.
+        If it isn't known how far away it is (None, or negative when the packet had no hopStart), the most allowed
+        """
+        if hops_away is None or hops_away < 0:
+            return TracerouteManager.MAX_HOP_LIMIT
+        return max(1, min(TracerouteManager.MAX_HOP_LIMIT, hops_away + 1))
+
+    def request(self, target_id: str, requester_id: str, gateway: str = None,
+                now: float = None) -> tuple[TraceStatus, TracedRoute | None]:
+        """
+        Ask for a trace to target_id, on behalf of requester_id
+        :return: the status, and the cached route if it's CACHED. If it's STARTED, the caller sends the
+                 traceroute (and calls sent(), or failed() if it couldn't)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire_cache(now)
+            cached = self._routes.get(target_id)
+            if cached:
+                self.stats.cache_hits += 1
+                return TraceStatus.CACHED, cached
+
+            # traces past request_ttl don't count against max_in_flight, even before the next expire() sweep.
+            # Whoever was waiting on a stale trace to this target waits on the new one instead
+            stale = self._expire_pending(now, target_id)
+            pending = self._pending.get(target_id)
+            if pending:
+                if requester_id not in pending.requesters:
+                    pending.requesters.append(requester_id)
+                self.stats.joined += 1
+                return TraceStatus.JOINED, None
+
+            if len(self._pending) >= self.max_in_flight:
+                self.stats.busy += 1
+                return TraceStatus.BUSY, None
+
+            requesters = stale.requesters if stale else []
+            if requester_id not in requesters:
+                requesters.append(requester_id)
+            self._pending[target_id] = PendingTrace(target_id, requesters, now, gateway=gateway)
+            self.stats.started += 1
+            self.stats.in_flight = len(self._pending)
+            return TraceStatus.STARTED, None
+
+    def sent(self, target_id: str, packet_id: int) -> None:
+        """
+        Record the id of the traceroute packet sent to target_id, so a failure reported against it can be matched up
+        """
+        with self._lock:
+            if target_id in self._pending:
+                self._pending[target_id].packet_id = packet_id
+
+    def target_for(self, packet_id: int) -> str | None:
+        with self._lock:
+            for pending in self._pending.values():
+                if pending.packet_id == packet_id:
+                    return pending.target_id
+        return None
+
+    def complete(self, target_id: str, route: list[int], route_back: list[int]) -> PendingTrace | None:
+        """
+        A trace to target_id came back: cache it
+        :return: the trace that was waiting on it (with everyone who asked for it), or None if nobody was
+        """
+        with self._lock:
+            pending = self._pending.pop(target_id, None)
+            if pending is None:
+                return None
+            self._routes[target_id] = TracedRoute(target_id, list(route), list(route_back), time.monotonic())
+            self.stats.completed += 1
+            self.stats.in_flight = len(self._pending)
+            return pending
+
+    def failed(self, target_id: str) -> PendingTrace | None:
+        with self._lock:
+            pending = self._pending.pop(target_id, None)
+            if pending is not None:
+                self.stats.failed += 1
+                self.stats.in_flight = len(self._pending)
+            return pending
+
+    def expire(self, now: float = None) -> list[PendingTrace]:
+        """
+        Give up on traces that haven't been answered within request_ttl
+        :return: the traces given up on
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire_pending(now)
+            expired, self._expired = self._expired, []
+            self._expire_cache(now)
+        return expired
+
+    def _expire_pending(self, now: float, keep_target: str = None) -> PendingTrace | None:
+        """
+        Drop the traces that haven't been answered within request_ttl (the caller holds the lock). They're kept
+        for expire() to hand back, except for one to keep_target, which is returned instead
+        """
+        kept = None
+        for pending in [pending for pending in self._pending.values() if pending.started_at + self.request_ttl <= now]:
+            del self._pending[pending.target_id]
+            logging.info(f"Traceroute to {pending.target_id} expired after {self.request_ttl:.0f}s without an answer")
+            self.stats.expired += 1
+            if pending.target_id == keep_target:
+                kept = pending
+            else:
+                self._expired.append(pending)
+        self.stats.in_flight = len(self._pending)
+        return kept
+
+    def _expire_cache(self, now: float) -> None:
+        for target_id in [target_id for target_id, route in self._routes.items()
+                          if route.traced_at + self.cache_ttl <= now]:
+            del self._routes[target_id]
+
+    def is_pending(self, target_id: str) -> bool:
+        with self._lock:
+            return target_id in self._pending
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from enum import IntEnum
+from typing import Callable
+
+from src.airtime import AirtimeBudget
+
+
+class Priority(IntEnum):
+    """
+    What goes out first when there's a backlog: lower values first, in the order they were submitted
+    """
+    ADMIN = 0
+    COMMAND_REPLY = 1
+    SCHEDULED_REPORT = 2
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to `burst` sends, refilling at `rate` per second
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, now: float = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now: float = None) -> float:
+        """
+        Seconds until a token is available
+        """
+        self._refill(time.monotonic() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float = None) -> None:
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+
+
+class TransmitScheduler:
+    """
+    Sends everything the bot transmits from one thread, paced by a token bucket.
+
+    Whoever wants to send (usually a handler on the receive thread) submits a callable and returns straight away,
+    so packet ingestion never waits on radio pacing. Higher priority sends jump the queue; sends of the same
+    priority go out in the order they were submitted, so multi-part replies stay in order.
+
+    With an airtime budget, a send that would take the bot over its duty cycle is held until enough of its
+    earlier airtime has aged out of the window. Scheduled reports only get REPORT_SHARE of the budget, keeping
+    the rest for replies, and are dropped rather than held: by the time there's room they'd be stale.
+    """
+    REPORT_SHARE = 0.8
+
+    def __init__(self, rate: float = 1.0, burst: float = 2.0, budget: AirtimeBudget = None):
+        """
+        :param rate: sends per second, on average
+        :param burst: sends allowed back to back after a quiet spell
+        :param budget: if set, sends are held or dropped to stay within it
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.budget = budget
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+        # (priority, seq, submitted_at, description, airtime, send)
+        self._queue = []
+        self._held_seq = None
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="transmit scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+
+    def submit(self, send: Callable[[], object], priority: Priority = Priority.COMMAND_REPLY,
+               description: str = '', airtime: float = 0.0) -> None:
+        """
+        Queue something to send
+        :param send: called on the scheduler thread when it's this one's turn
+        :param airtime: estimated seconds on air, checked against the budget
+        """
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._seq), time.monotonic(), description, airtime, send))
+            self._condition.notify()
+
+    def _budget_wait(self) -> float | None:
+        """
+        How long the next send has to be held for the airtime budget
+        :return: None if it was dropped instead, as not worth holding
+        """
+        priority, seq, _, description, airtime, _ = self._queue[0]
+        if not self.budget or not airtime:
+            return 0.0
+        is_report = priority >= Priority.SCHEDULED_REPORT
+        wait = self.budget.wait_time(airtime, self.REPORT_SHARE if is_report else 1.0)
+        if wait > 0 and (is_report or wait == math.inf):
+            heapq.heappop(self._queue)
+            self.dropped += 1
+            logging.warning(f"Dropped {description or 'packet'}: over the airtime budget")
+            return None
+        if wait > 0 and self._held_seq != seq:
+            self._held_seq = seq
+            logging.warning(f"Holding {description or 'packet'} for {wait:.0f}s: over the airtime budget")
+        return wait
+
+    def _next(self):
+        """
+        Wait for the next send that's due, or None once stopped
+        """
+        with self._condition:
+            while self.running:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                wait = self.bucket.wait_time()
+                if wait <= 0:
+                    wait = self._budget_wait()
+                    if wait is None:
+                        continue
+                    if wait <= 0:
+                        self.bucket.take()
+                        return heapq.heappop(self._queue)
+                # a higher priority send could arrive meanwhile, so look again afterwards
+                self._condition.wait(wait)
+        return None
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            priority, _, submitted_at, description, _, send = item
+            try:
+                send()
+                self.sent += 1
+                logging.debug(f"Sent {description or 'packet'} ({priority.name}) "
+                              f"after {time.monotonic() - submitted_at:.1f}s in the queue")
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Failed to send {description or 'packet'}: {e}")
@@ -2,7 +2,10 @@ import unittest
 
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
-from src.commands.command import AbstractCommand, AbstractCommandWithSubcommands
+from src.commands.command import AbstractCommand, AbstractCommandWithSubcommands, SubCommands
+from src.commands.factory import CommandFactory, CommandRegistry
+from src.commands.parsed_command import ParsedCommand
+from src.commands.ping import PingCommand
 from test.commands import CommandTestCase, CommandWSCTestCase
 from test.test_setup_data import build_test_text_packet
 
@@ -71,6 +74,47 @@ class TestAbstractCommandWithSubcommands(CommandWSCTestCase):
 
         self.assert_message_sent("Unknown command 'unknown'", self.test_nodes[1])
 
+    def test_subcommand_with_name(self):
+        handled = []
+        self.command.sub_commands['named'] = lambda packet, args, name: handled.append((args, name))
+        packet = build_test_text_packet('!test named a b', self.test_nodes[1].user.id, self.bot.my_id)
+        self.command.handle_packet(packet)
+
+        self.assertEqual(handled, [(('a', 'b'), 'named')])
+
+    def test_logged_from_parsed_command(self):
+        packet = build_test_text_packet('!test sub a b', self.test_nodes[1].user.id, self.bot.my_id)
+        command = ParsedCommand.from_packet(packet)
+
+        self.assertEqual(self.command.get_command_for_logging(command), ('test', ['sub'], 'a b'))
+        self.assertEqual(self.command.get_command_for_logging('!test sub a b'), ('test', ['sub'], 'a b'))
+        self.assertEqual(self.command.get_command_for_logging('!test'), ('test', None, None))
+
+    def test_logged_subcommand_as_sent(self):
+        self.assertEqual(self.command.get_command_for_logging('!test !sub a'), ('test', ['!sub'], 'a'))
+
+
+class TestSubCommands(unittest.TestCase):
+    def test_arity_worked_out_when_added(self):
+        sub_commands = SubCommands({'two': lambda packet, args: None})
+        sub_commands['three'] = lambda packet, args, name: None
+
+        self.assertEqual(sub_commands.arity, {'two': 2, 'three': 3})
+
+    def test_unexpected_arguments_rejected_when_added(self):
+        with self.assertRaises(ValueError):
+            SubCommands()['one'] = lambda packet: None
+
+
+class TestCommandRegistry(CommandTestCase):
+    def test_every_command_instantiated_once(self):
+        registry = CommandRegistry(self.bot)
+
+        self.assertEqual(len(registry), len(CommandFactory.commands))
+        self.assertIsInstance(registry.get('!ping'), PingCommand)
+        self.assertIs(registry.get('!ping'), registry.get('!ping'))
+        self.assertIsNone(registry.get('!nope'))
+
 
 if __name__ == '__main__':
     unittest.main()
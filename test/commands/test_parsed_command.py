@@ -0,0 +1,73 @@
+import unittest
+
+from src.commands.parsed_command import ParsedCommand
+from test.test_setup_data import build_test_text_packet
+
+
+class TestParsedCommand(unittest.TestCase):
+
+    def test_base_command_only(self):
+        command = ParsedCommand.from_text('!nodes')
+
+        self.assertEqual(command.base_command, '!nodes')
+        self.assertEqual(command.sub_command, '')
+        self.assertIsNone(command.args)
+        self.assertIsNone(command.rest)
+
+    def test_subcommand_and_args(self):
+        command = ParsedCommand.from_text('!nodes\tbusy  !AbCd  detailed ')
+
+        self.assertEqual(command.base_command, '!nodes')
+        self.assertEqual(command.sub_command, 'busy')
+        self.assertEqual(command.raw_sub_command, 'busy')
+        self.assertEqual(command.args, ('!AbCd', 'detailed'))
+        self.assertEqual(command.rest, 'busy  !AbCd  detailed')
+
+    def test_subcommand_without_args(self):
+        command = ParsedCommand.from_text('!help !tr')
+
+        self.assertEqual(command.sub_command, 'tr')
+        self.assertEqual(command.raw_sub_command, '!tr')
+        self.assertEqual(command.args, ())
+        self.assertEqual(command.rest, '!tr')
+
+    def test_only_whitespace_after_command(self):
+        command = ParsedCommand.from_text('!ping  ')
+
+        self.assertEqual(command.base_command, '!ping')
+        self.assertEqual(command.raw_sub_command, '')
+        self.assertEqual(command.rest, '')
+
+    def test_empty_message(self):
+        command = ParsedCommand.from_text('  ')
+
+        self.assertEqual(command.base_command, '')
+        self.assertIsNone(command.args)
+
+    def test_from_packet_parsed_once(self):
+        packet = build_test_text_packet('!tr now', '!0000beef', '!1234abcd', max_hops=5, hops_left=3, channel=2)
+        packet['gateway'] = 'base'
+
+        command = ParsedCommand.from_packet(packet)
+
+        self.assertIs(ParsedCommand.from_packet(packet), command)
+        self.assertEqual(command.sender_id, '!0000beef')
+        self.assertEqual(command.channel, 2)
+        self.assertEqual(command.hops_away, 2)
+        self.assertEqual(command.gateway, 'base')
+
+    def test_immutable(self):
+        command = ParsedCommand.from_text('!ping')
+
+        with self.assertRaises(AttributeError):
+            command.base_command = '!pong'
+
+    def test_of(self):
+        command = ParsedCommand.from_text('!ping')
+
+        self.assertIs(ParsedCommand.of(command), command)
+        self.assertEqual(ParsedCommand.of('!ping hi').rest, 'hi')
+
+
+if __name__ == '__main__':
+    unittest.main()
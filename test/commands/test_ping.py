@@ -32,6 +32,20 @@ class TestPingCommand(CommandTestCase):
 
         self.assert_message_sent(expected_response, self.test_nodes[1])
 
+    def test_handle_packet_keeps_message_spacing(self):
+        packet = build_test_text_packet('!ping  extra   message ', self.test_nodes[1].user.id, self.bot.my_id)
+        packet['hopStart'] = 3
+        packet['hopLimit'] = 3
+
+        self.command.handle_packet(packet)
+
+        self.assertEqual(self.mock_interface.sendText.call_args[0][0], "!pong: extra   message (ping took 0 hops)")
+
+    def test_command_for_logging(self):
+        self.assertEqual(self.command.get_command_for_logging('!ping hello  there'), ('ping', None, 'hello  there'))
+        self.assertEqual(self.command.get_command_for_logging('!ping '), ('ping', None, ''))
+        self.assertEqual(self.command.get_command_for_logging('!ping'), ('ping', None, None))
+
     def test_handle_packet_with_hop_count(self):
         packet = build_test_text_packet('!ping', self.test_nodes[1].user.id, self.bot.my_id)
         packet['hopStart'] = 3
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import Mock
+
+from src.airtime import AirtimeBudget
+from src.commands.status import StatusCommand
+from src.gateway import Gateway
+from src.ingest_queue import IngestQueue, OverflowPolicy
+from src.proxy.metrics import ProxyMetrics
+from src.rate_limiter import CommandRateLimiter
+from test.commands import CommandTestCase
+from test.test_setup_data import build_test_text_packet
+
+
+class TestStatusCommand(CommandTestCase):
+    command: StatusCommand
+
+    def setUp(self):
+        super().setUp()
+        self.command = StatusCommand(bot=self.bot)
+
+    def test_proxy_metrics_shown(self):
+        metrics = ProxyMetrics().snapshot()
+        metrics['radio_in_frames_per_sec'] = 1.25
+        metrics['reconnects'] = 2
+        self.bot.proxy = Mock()
+        self.bot.proxy.get_status.return_value = {
+            "connected": True,
+            "clients": 2,
+            "silence_secs": 4,
+            "cached_nodes": 10,
+            "client_lag": [{"addr": "a", "queued_bytes": 0, "lag_secs": 0.5, "dropped_bytes": 0}],
+            "metrics": metrics,
+        }
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn("Online, 2 clients, last radio data 4s ago", response)
+        self.assertIn("📊 Radio: 1.2/s in, 0.0/s out, 2 reconnects", response)
+        self.assertIn("max client lag 0.5s", response)
+
+    def test_one_line_per_gateway(self):
+        roof, shed = Gateway('roof', proxy=Mock()), Gateway('shed', proxy=Mock())
+        roof.proxy.get_status.return_value = "Proxy not running"
+        shed.proxy.get_status.return_value = {
+            "connected": False, "clients": 0, "silence_secs": 90, "cached_nodes": 0, "client_lag": [],
+        }
+        self.bot.gateways = [roof, shed]
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn("\n  roof: Proxy not running", response)
+        self.assertIn("\n  shed: Reconnecting, 0 clients, last radio data 90s ago", response)
+
+    def test_airtime_shown(self):
+        self.bot.airtime_budget = AirtimeBudget(duty_cycle=0.1)
+        self.bot.airtime_budget.record(36)
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn("📡 Airtime: 36s of 360s this hour (10%)", response)
+
+    def test_duplicates_shown(self):
+        node_id = self.test_nodes[1].user.id
+        for _ in range(3):
+            self.bot.duplicate_filter.is_duplicate(1, 100, node_id)
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn(f"🔁 Duplicates: 2 of 3 dropped ({self.test_nodes[1].user.short_name} 2)", response)
+
+    def test_throttled_shown(self):
+        node_id = self.test_nodes[1].user.id
+        self.bot.rate_limiter = CommandRateLimiter(sender_burst=1)
+        for _ in range(3):
+            self.bot.rate_limiter.check(node_id, now=0)
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn(f"🚦 Throttled: 2 commands ({self.test_nodes[1].user.short_name} 2)", response)
+
+    def test_ingest_queue_shown(self):
+        self.bot.ingest_queue = IngestQueue(workers=1, max_size=1, overflow=OverflowPolicy.DROP_NEWEST)
+        self.bot.ingest_queue.submit('!a', print)
+        self.bot.ingest_queue.submit('!a', print)
+        packet = build_test_text_packet('!status', self.test_nodes[1].user.id, self.bot.my_id)
+
+        self.command.handle_packet(packet)
+
+        response = self.mock_interface.sendText.call_args[0][0]
+        self.assertIn("📥 Queue: 1 waiting (peak 1), 1 dropped", response)
+
+
+if __name__ == '__main__':
+    unittest.main()
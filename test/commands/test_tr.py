@@ -0,0 +1,97 @@
+import unittest
+
+from meshtastic.protobuf import mesh_pb2
+
+from src.commands.tr import TracerouteCommand
+from test.commands import CommandTestCase
+from test.test_setup_data import build_test_text_packet
+
+
+class TestTracerouteCommand(CommandTestCase):
+    command: TracerouteCommand
+
+    def setUp(self):
+        super().setUp()
+        self.command = TracerouteCommand(bot=self.bot)
+        self.mock_interface.sendTraceRouteNoWait.return_value = mesh_pb2.MeshPacket(id=1234)
+
+    def build_packet(self, hops_away: int):
+        packet = build_test_text_packet('!tr', self.test_nodes[1].user.id, self.bot.my_id)
+        packet['hopStart'] = 3
+        packet['hopLimit'] = 3 - hops_away
+        return packet
+
+    def test_zero_hops(self):
+        self.command.handle_packet(self.build_packet(0))
+
+        self.mock_interface.sendTraceRouteNoWait.assert_not_called()
+
+    def test_starts_traceroute(self):
+        sender_id = self.test_nodes[1].user.id
+        self.command.handle_packet(self.build_packet(2))
+
+        self.mock_interface.sendTraceRouteNoWait.assert_called_once_with(sender_id, hopLimit=3)
+        self.assertTrue(self.bot.traceroutes.is_pending(sender_id))
+        self.assertEqual(self.bot.traceroutes.target_for(1234), sender_id)
+
+    def test_no_hop_start_uses_max_hop_limit(self):
+        sender_id = self.test_nodes[1].user.id
+        packet = self.build_packet(2)
+        del packet['hopStart']
+        self.command.handle_packet(packet)
+
+        self.mock_interface.sendTraceRouteNoWait.assert_called_once_with(sender_id, hopLimit=7)
+
+    def test_send_without_packet_stays_pending(self):
+        sender_id = self.test_nodes[1].user.id
+        self.mock_interface.sendTraceRouteNoWait.return_value = None
+        self.command.handle_packet(self.build_packet(2))
+
+        self.assertTrue(self.bot.traceroutes.is_pending(sender_id))
+        self.assertNotIn("Error", self.mock_interface.sendText.call_args[0][0])
+
+        route = mesh_pb2.RouteDiscovery(route=[0x1234abcd], route_back=[0x1234abcd])
+        self.bot.on_traceroute({'fromId': sender_id}, route)
+        self.assertIn(f"Trace FROM {sender_id} (1 hops)", self.mock_interface.sendText.call_args[0][0])
+
+    def test_send_error_reported(self):
+        sender_id = self.test_nodes[1].user.id
+        self.mock_interface.sendTraceRouteNoWait.side_effect = OSError("not connected")
+        self.command.handle_packet(self.build_packet(2))
+
+        self.assertEqual(self.mock_interface.sendText.call_args[0][0], "Error starting traceroute: not connected")
+        self.assertFalse(self.bot.traceroutes.is_pending(sender_id))
+
+    def test_repeat_while_running_does_not_send_again(self):
+        self.command.handle_packet(self.build_packet(2))
+        self.command.handle_packet(self.build_packet(2))
+
+        self.mock_interface.sendTraceRouteNoWait.assert_called_once()
+        self.assertIn("already running", self.mock_interface.sendText.call_args[0][0])
+
+    def test_result_sent_and_cached(self):
+        sender_id = self.test_nodes[1].user.id
+        self.command.handle_packet(self.build_packet(2))
+        route = mesh_pb2.RouteDiscovery(route=[0x1234abcd], route_back=[0x1234abcd])
+        self.bot.on_traceroute({'fromId': sender_id}, route)
+
+        self.assertIn(f"Trace TO {sender_id} (1 hops)", self.mock_interface.sendText.call_args_list[-2][0][0])
+        self.assertIn(f"Trace FROM {sender_id} (1 hops)", self.mock_interface.sendText.call_args_list[-1][0][0])
+
+        self.mock_interface.sendText.reset_mock()
+        self.command.handle_packet(self.build_packet(2))
+
+        self.mock_interface.sendTraceRouteNoWait.assert_called_once()
+        self.assertIn("min ago", self.mock_interface.sendText.call_args_list[0][0][0])
+
+    def test_failed_traceroute_reported(self):
+        sender_id = self.test_nodes[1].user.id
+        self.command.handle_packet(self.build_packet(2))
+        self.bot.on_traceroute({'fromId': self.bot.my_id, 'decoded': {'requestId': 1234}}, None)
+
+        self.assertEqual(self.mock_interface.sendText.call_args[0][0], f"Traceroute to {sender_id} failed")
+        self.assertFalse(self.bot.traceroutes.is_pending(sender_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
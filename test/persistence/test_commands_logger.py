@@ -65,6 +65,14 @@ class TestSqliteCommandLogger(unittest.TestCase):
             self.assertEqual(row[1], 'response message')
             self.assertEqual(row[3], 'AbstractResponder')
 
+    def test_log_throttled_request(self):
+        self.logger.log_throttled_request('sender1', '!nodes', 'channel', 2)
+
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT sender_id, message, scope, channel FROM throttled_requests")
+            self.assertEqual(cursor.fetchone(), ('sender1', '!nodes', 'channel', 2))
+
     def test_get_command_history(self):
         command_instance = MagicMock(spec=AbstractCommand)
         command_instance.get_command_for_logging.return_value = ('base_cmd', ['sub_cmd1', 'sub_cmd2'], 'arg1 arg2')
@@ -99,5 +107,16 @@ class TestSqliteCommandLogger(unittest.TestCase):
         self.assertIn('timestamp', history.columns)
 
 
+    def test_get_throttled_history(self):
+        self.logger.log_throttled_request('sender1', '!tr', 'sender')
+        self.logger.log_throttled_request('sender2', '!nodes', 'channel', 0)
+
+        since = datetime.now(timezone.utc) - timedelta(days=1)
+        history = self.logger.get_throttled_history(since=since, sender_id='sender1')
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history['scope'][0], 'sender')
+        self.assertEqual(len(self.logger.get_throttled_history(since=since)), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
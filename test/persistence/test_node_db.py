@@ -3,7 +3,7 @@ import unittest
 from datetime import datetime, timezone, timedelta
 
 from src.data_classes import MeshNode
-from src.persistence.node_db import SqliteNodeDB, InMemoryNodeDB
+from src.persistence.node_db import CachedNodeDB, SqliteNodeDB, InMemoryNodeDB
 
 
 class TestInMemoryNodeDB(unittest.TestCase):
@@ -112,6 +112,86 @@ class TestSqliteNodeDB(unittest.TestCase):
         self.assertEqual(len(metrics), 1)
         self.assertEqual(metrics[0].battery_level, self.device_metrics.battery_level)
 
+    def test_store_nodes(self):
+        self.db.store_user(MeshNode.User(node_id='node1', short_name='Old', long_name='Old Name'))
+        nodes = []
+        for i in (1, 2):
+            node = MeshNode()
+            node.user = MeshNode.User(node_id=f'node{i}', short_name=f'Node{i}', long_name=f'Test Node {i}')
+            node.position = self.position
+            node.device_metrics = self.device_metrics if i == 2 else None
+            nodes.append(node)
+
+        self.db.store_nodes(nodes)
+
+        self.assertEqual(self.db.get_by_id('node1').long_name, 'Test Node 1')
+        self.assertEqual(len(self.db.list_nodes()), 2)
+        self.assertEqual(self.db.get_last_position('node2').latitude, self.position.latitude)
+        self.assertIsNone(self.db.get_last_device_metrics('node1'))
+        self.assertEqual(self.db.get_last_device_metrics('node2').battery_level, 90)
+
+
+class TestCachedNodeDB(unittest.TestCase):
+    def setUp(self):
+        self.db_path = 'test_cached_node_db.sqlite'
+        self.sqlite_db = SqliteNodeDB(self.db_path)
+        self.sqlite_db.store_user(MeshNode.User(node_id='node1', short_name='Node1', long_name='Test Node 1'))
+        self.db = CachedNodeDB(self.sqlite_db)
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def test_loads_existing_users(self):
+        self.assertEqual(self.db.get_by_id('node1').long_name, 'Test Node 1')
+        self.assertEqual(self.db.get_by_short_name('node1').id, 'node1')
+        self.assertEqual(self.db.metrics()['hits'], 2)
+
+    def test_store_user_updates_cache_and_db(self):
+        self.db.store_user(MeshNode.User(node_id='node1', short_name='NewN', long_name='Renamed'))
+
+        self.assertEqual(self.db.get_by_id('node1').long_name, 'Renamed')
+        self.assertIsNone(self.db.get_by_short_name('Node1'))
+        self.assertEqual(self.db.get_by_short_name('newn').id, 'node1')
+        self.assertEqual(self.sqlite_db.get_by_id('node1').long_name, 'Renamed')
+
+    def test_unknown_id_only_queried_once(self):
+        self.assertIsNone(self.db.get_by_id('node2'))
+        self.assertIsNone(self.db.get_by_id('node2'))
+        self.assertEqual(self.db.metrics()['misses'], 1)
+
+        self.db.store_user(MeshNode.User(node_id='node2', short_name='Node2', long_name='Test Node 2'))
+        self.assertEqual(self.db.get_by_id('node2').long_name, 'Test Node 2')
+
+    def test_read_through_for_users_stored_elsewhere(self):
+        self.sqlite_db.store_user(MeshNode.User(node_id='node3', short_name='Node3', long_name='Test Node 3'))
+
+        self.assertEqual(self.db.get_by_id('node3').long_name, 'Test Node 3')
+        self.assertEqual(len(self.db.list_nodes()), 2)
+
+    def test_shared_short_name(self):
+        self.db.store_user(MeshNode.User(node_id='node2', short_name='Node1', long_name='Also Node1'))
+        self.assertEqual(self.db.get_by_short_name('Node1').id, 'node1')
+
+        # once node1 is renamed, the short name belongs to node2
+        self.db.store_user(MeshNode.User(node_id='node1', short_name='Other', long_name='Test Node 1'))
+        self.assertEqual(self.db.get_by_short_name('Node1').id, 'node2')
+
+    def test_store_nodes_updates_cache_and_db(self):
+        node = MeshNode()
+        node.user = MeshNode.User(node_id='node2', short_name='Node2', long_name='Test Node 2')
+        self.assertIsNone(self.db.get_by_id('node2'))
+
+        self.db.store_nodes([node])
+
+        self.assertEqual(self.db.get_by_short_name('node2').id, 'node2')
+        self.assertEqual(self.sqlite_db.get_by_id('node2').long_name, 'Test Node 2')
+
+    def test_positions_go_through(self):
+        position = MeshNode.Position(logged_time=datetime.now(timezone.utc), latitude=10.0, longitude=20.0)
+        self.db.store_position('node1', position)
+        self.assertEqual(self.db.get_last_position('node1').latitude, 10.0)
+
 
 if __name__ == '__main__':
     unittest.main()
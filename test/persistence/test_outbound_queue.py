@@ -0,0 +1,108 @@
+import os
+import tempfile
+import time
+import unittest
+
+from meshtastic.protobuf import mesh_pb2, portnums_pb2
+
+from src.persistence.outbound_queue import InMemoryOutboundQueue, SqliteOutboundQueue
+
+
+def text_packet(text: str, channel: int = 0) -> mesh_pb2.MeshPacket:
+    packet = mesh_pb2.MeshPacket(channel=channel)
+    packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+    packet.decoded.payload = text.encode()
+    return packet
+
+
+class OutboundQueueTests:
+    def make_queue(self, **kwargs):
+        raise NotImplementedError
+
+    def drain(self, queue) -> list[str]:
+        texts = []
+        while (entry := queue.peek()) is not None:
+            texts.append(entry.packet.decoded.payload.decode())
+            queue.remove(entry.entry_id)
+        return texts
+
+    def test_fifo_order(self):
+        queue = self.make_queue()
+        for text in ('one', 'two', 'three'):
+            self.assertTrue(queue.put(text_packet(text), '!1234abcd'))
+
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(self.drain(queue), ['one', 'two', 'three'])
+        self.assertTrue(queue.empty())
+
+    def test_peek_does_not_remove(self):
+        queue = self.make_queue()
+        queue.put(text_packet('hello'), '!1234abcd', want_ack=True, hop_limit=3)
+
+        entry = queue.peek()
+        self.assertEqual(queue.peek().entry_id, entry.entry_id)
+        self.assertEqual((entry.destination_id, entry.want_ack, entry.hop_limit), ('!1234abcd', True, 3))
+
+    def test_duplicates_not_queued(self):
+        queue = self.make_queue()
+        self.assertTrue(queue.put(text_packet('hello'), '!1234abcd'))
+        duplicate = text_packet('hello')
+        duplicate.id = 99
+        self.assertFalse(queue.put(duplicate, '!1234abcd'))
+        # same text to somewhere else is a different message
+        self.assertTrue(queue.put(text_packet('hello'), '!5678abcd'))
+        self.assertTrue(queue.put(text_packet('hello', channel=2), 4294967295))
+
+        self.assertEqual(len(queue), 3)
+
+    def test_bounded(self):
+        queue = self.make_queue(max_packets=2)
+        for text in ('one', 'two', 'three'):
+            queue.put(text_packet(text), '!1234abcd')
+
+        self.assertEqual(self.drain(queue), ['two', 'three'])
+
+    def test_expired_packets_skipped(self):
+        queue = self.make_queue()
+        queue.put(text_packet('stale'), '!1234abcd', ttl=0.01)
+        queue.put(text_packet('fresh'), '!1234abcd')
+        time.sleep(0.02)
+
+        self.assertEqual(self.drain(queue), ['fresh'])
+
+
+class TestInMemoryOutboundQueue(OutboundQueueTests, unittest.TestCase):
+    def make_queue(self, **kwargs):
+        return InMemoryOutboundQueue(**kwargs)
+
+
+class TestSqliteOutboundQueue(OutboundQueueTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'outbound_queue.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_queue(self, **kwargs):
+        return SqliteOutboundQueue(self.db_path, **kwargs)
+
+    def test_survives_restart(self):
+        self.make_queue().put(text_packet('still here'), 1234)
+
+        entry = self.make_queue().peek()
+        self.assertEqual(entry.packet.decoded.payload, b'still here')
+        self.assertEqual(entry.destination_id, 1234)
+
+    def test_queues_are_separate(self):
+        roof = SqliteOutboundQueue(self.db_path, 'roof')
+        shed = SqliteOutboundQueue(self.db_path, 'shed')
+        roof.put(text_packet('hello'), '!1234abcd')
+        shed.put(text_packet('hello'), '!1234abcd')
+
+        self.assertEqual(self.drain(roof), ['hello'])
+        self.assertEqual(self.drain(shed), ['hello'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from meshtastic.protobuf import mesh_pb2, config_pb2
+
+from src.proxy.capture import (BackgroundCaptureWriter, CaptureWriter, read_capture, capture_segments, FROM_RADIO,
+                               TO_RADIO)
+from src.proxy.framing import encode_frame, frame_payload, FrameParser
+from src.proxy.replay import CaptureReplayer
+from src.tcp_proxy import TcpProxy
+
+
+def from_radio_frame(**kwargs) -> bytes:
+    return encode_frame(mesh_pb2.FromRadio(**kwargs).SerializeToString())
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        writer = CaptureWriter(self.dir)
+        writer.write(FROM_RADIO, encode_frame(b'one'), 100.0)
+        writer.write(TO_RADIO, memoryview(encode_frame(b'two')), 100.5)
+        writer.close()
+
+        self.assertEqual(list(read_capture(self.dir)), [
+            (100.0, FROM_RADIO, encode_frame(b'one')),
+            (100.5, TO_RADIO, encode_frame(b'two')),
+        ])
+
+    def test_segments_rotate(self):
+        writer = CaptureWriter(self.dir, segment_bytes=100)
+        frames = [encode_frame(bytes([i]) * 40) for i in range(5)]
+        for i, frame in enumerate(frames):
+            writer.write(FROM_RADIO, frame, float(i))
+            time.sleep(0.001)  # segment names are timestamped
+        writer.close()
+
+        self.assertGreater(len(capture_segments(self.dir)), 1)
+        self.assertEqual([frame for _, _, frame in read_capture(self.dir)], frames)
+
+    def test_truncated_record_ignored(self):
+        writer = CaptureWriter(self.dir)
+        writer.write(FROM_RADIO, encode_frame(b'whole'), 1.0)
+        writer.write(FROM_RADIO, encode_frame(b'cut short'), 2.0)
+        path = writer.segment_path
+        writer.close()
+        os.truncate(path, os.path.getsize(path) - 3)
+
+        self.assertEqual([frame for _, _, frame in read_capture(path)], [encode_frame(b'whole')])
+
+    def test_background_writer(self):
+        writer = BackgroundCaptureWriter(CaptureWriter(self.dir))
+        frame = bytearray(encode_frame(b'one'))
+        writer.write(FROM_RADIO, memoryview(frame), 100.0)
+        frame[4:] = b'two'  # the proxy reuses its buffers once write() returns
+        writer.close()
+
+        self.assertEqual(list(read_capture(self.dir)), [(100.0, FROM_RADIO, encode_frame(b'one'))])
+        self.assertEqual(writer.frames_written, 1)
+
+    def test_slow_disk_does_not_block_writes(self):
+        capture = CaptureWriter(self.dir)
+        writing, release = threading.Event(), threading.Event()
+
+        def slow_write(*args):
+            writing.set()
+            release.wait(5)
+
+        with patch.object(capture, 'write', side_effect=slow_write):
+            writer = BackgroundCaptureWriter(capture, max_queued=2)
+            writer.write(FROM_RADIO, encode_frame(b'first'))
+            self.assertTrue(writing.wait(5))
+
+            start = time.monotonic()
+            for _ in range(4):
+                writer.write(FROM_RADIO, encode_frame(b'more'))
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(writer.dropped, 2)
+            release.set()
+            writer.close()
+
+
+class TestProxyCapture(unittest.TestCase):
+    def setUp(self):
+        self.proxy = TcpProxy(target_host='127.0.0.1')
+        self.proxy._selector = Mock()
+        self.proxy.capture = Mock()
+        self.proxy.target_socket, self.radio = socket.socketpair()
+        self.proxy.target_socket.setblocking(False)
+        self.proxy._target_connected = True
+
+    def tearDown(self):
+        self.proxy.target_socket.close()
+        self.radio.close()
+
+    def test_to_radio_captured_when_sent(self):
+        frame = encode_frame(b'to radio')
+        self.proxy._send_to_target(frame)
+        self.proxy.capture.write.assert_not_called()
+
+        self.proxy._flush_target()
+        self.proxy.capture.write.assert_called_once_with(TO_RADIO, frame)
+        self.assertEqual(self.radio.recv(100), frame)
+
+    def test_dropped_backlog_not_captured(self):
+        frames = [encode_frame(bytes([i]) * 400) for i in range(200)]
+        for frame in frames:
+            self.proxy._send_to_target(frame)
+        self.proxy._flush_target()
+
+        # the oldest frames were dropped without ever going to the radio
+        captured = [call.args[1] for call in self.proxy.capture.write.call_args_list]
+        first = frames.index(captured[0])
+        self.assertGreater(first, 0)
+        self.assertEqual(captured, frames[first:first + len(captured)])
+
+
+class TestCaptureReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.replayer = None
+        self.proxy = None
+
+    def tearDown(self):
+        if self.proxy:
+            self.proxy.stop()
+            self.proxy.thread.join(timeout=5)
+        if self.replayer:
+            self.replayer.stop()
+        self.tmp.cleanup()
+
+    def write_capture(self, packets: int, interval: float = 0.0, delay: float = 0.0) -> list[bytes]:
+        writer = CaptureWriter(self.tmp.name)
+        config = [
+            from_radio_frame(my_info=mesh_pb2.MyNodeInfo(my_node_num=0x11111111)),
+            from_radio_frame(config=config_pb2.Config(lora=config_pb2.Config.LoRaConfig(hop_limit=3))),
+            from_radio_frame(node_info=mesh_pb2.NodeInfo(num=0x11111111)),
+            from_radio_frame(config_complete_id=12345),
+        ]
+        for frame in config:
+            writer.write(FROM_RADIO, frame, 1000.0)
+        packet_frames = [from_radio_frame(packet=mesh_pb2.MeshPacket(id=i + 1)) for i in range(packets)]
+        for i, frame in enumerate(packet_frames):
+            writer.write(FROM_RADIO, frame, 1000.0 + delay + (i + 1) * interval)
+        writer.close()
+        return packet_frames
+
+    def test_replay_through_proxy(self):
+        # the packets come a second after the config download, giving the client time to connect
+        packet_frames = self.write_capture(packets=200, delay=1.0)
+        self.replayer = CaptureReplayer(self.tmp.name, port=0, speed=1.0)
+        self.replayer.start()
+
+        capture_dir = os.path.join(self.tmp.name, 'proxy_capture')
+        self.proxy = TcpProxy('127.0.0.1', self.replayer.port, '127.0.0.1', 0, capture_dir=capture_dir)
+        self.proxy.start()
+        deadline = time.time() + 5
+        while not self.proxy.listen_port and time.time() < deadline:
+            time.sleep(0.01)
+        client = socket.create_connection(('127.0.0.1', self.proxy.listen_port))
+        try:
+            client.settimeout(5)
+            parser = FrameParser()
+            received = []
+            while len(received) < len(packet_frames):
+                received.extend(bytes(f) for f in parser.feed(client.recv(65536)))
+        finally:
+            client.close()
+
+        # the replayed config download was taken as the proxy's own, so only the packets were broadcast
+        self.assertEqual(received, packet_frames)
+        self.assertTrue(self.proxy.state_cache.complete)
+
+        self.proxy.stop()
+        self.proxy.thread.join(timeout=5)
+        captured = list(read_capture(capture_dir))
+        self.assertEqual([f for _, d, f in captured if d == FROM_RADIO][-len(packet_frames):], packet_frames)
+        want_config = mesh_pb2.ToRadio.FromString(frame_payload(next(f for _, d, f in captured if d == TO_RADIO)))
+        self.assertTrue(want_config.want_config_id)
+
+    def time_replay(self, speed: float) -> float:
+        self.write_capture(packets=3, interval=0.2)
+        self.replayer = CaptureReplayer(self.tmp.name, port=0, speed=speed)
+        self.replayer.CONFIG_WAIT = 0
+        self.replayer.start()
+
+        start = time.monotonic()
+        with socket.create_connection(('127.0.0.1', self.replayer.port)) as sock:
+            sock.settimeout(5)
+            parser = FrameParser()
+            received = []
+            while len(received) < 7:
+                received.extend(parser.feed(sock.recv(65536)))
+        return time.monotonic() - start
+
+    def test_replay_keeps_original_pacing(self):
+        self.assertGreaterEqual(self.time_replay(speed=1.0), 0.55)
+
+    def test_replay_as_fast_as_possible(self):
+        self.assertLess(self.time_replay(speed=0), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import socket
+import unittest
+
+from src.proxy.framing import FrameParser, encode_frame, frame_payload, MAX_TO_FROM_RADIO_SIZE
+
+
+class TestFraming(unittest.TestCase):
+    def setUp(self):
+        self.parser = FrameParser()
+
+    def test_encode_frame(self):
+        self.assertEqual(encode_frame(b'abc'), b'\x94\xc3\x00\x03abc')
+        self.assertEqual(frame_payload(encode_frame(b'abc')), b'abc')
+
+    def test_encode_frame_too_long(self):
+        with self.assertRaises(ValueError):
+            encode_frame(b'x' * (MAX_TO_FROM_RADIO_SIZE + 1))
+
+    def test_multiple_frames_in_one_feed(self):
+        frames = [encode_frame(b'one'), encode_frame(b'two'), encode_frame(b'')]
+        self.assertEqual(self.parser.feed(b''.join(frames)), frames)
+        self.assertEqual(self.parser.pending_bytes, 0)
+
+    def test_frame_split_across_feeds(self):
+        frame = encode_frame(b'x' * 200)
+        for i in range(len(frame) - 1):
+            self.assertEqual(self.parser.feed(frame[i:i + 1]), [])
+        self.assertEqual(self.parser.feed(frame[-1:]), [frame])
+
+    def test_skips_noise_between_frames(self):
+        frame = encode_frame(b'payload')
+        data = b'INFO | log line\r\n' + bytes([0xC3] * 32) + frame + b'\x94\x00' + frame
+        self.assertEqual(self.parser.feed(data), [frame, frame])
+        self.assertEqual(self.parser.bytes_skipped, len(data) - 2 * len(frame))
+
+    def test_resyncs_after_oversized_length(self):
+        frame = encode_frame(b'payload')
+        self.assertEqual(self.parser.feed(b'\x94\xc3\xff\xff' + frame), [frame])
+
+    def test_reset_discards_partial_frame(self):
+        frame = encode_frame(b'payload')
+        self.parser.feed(frame[:5])
+        self.parser.reset()
+        self.assertEqual(self.parser.feed(frame), [frame])
+
+    def test_recv_into(self):
+        frames = [encode_frame(b'one'), encode_frame(b'two')]
+        sender, receiver = socket.socketpair()
+        with sender, receiver:
+            sender.sendall(b''.join(frames) + frames[0][:3])
+            received = self.parser.recv_into(receiver, 1024)
+
+        self.assertEqual(received, 2 * len(frames[0]) + 3)
+        self.assertEqual(self.parser.frames(), frames)
+        self.assertEqual(self.parser.pending_bytes, 3)
+
+    def test_frames_survive_block_rollover(self):
+        parser = FrameParser(block_size=64)
+        frame = encode_frame(b'x' * 20)
+        held = parser.feed(frame + frame[:10])
+        # this doesn't fit in the first block, so a new one is started with the partial frame carried over
+        held += parser.feed(frame[10:] + frame)
+
+        self.assertEqual([bytes(f) for f in held], [frame] * 3)
+        self.assertEqual(parser.pending_bytes, 0)
+
+    def test_adjacent_frame_spans(self):
+        frames = [encode_frame(b'one'), encode_frame(b'two')]
+        sender, receiver = socket.socketpair()
+        with sender, receiver:
+            sender.sendall(b'noise' + b''.join(frames))
+            self.parser.recv_into(receiver, 1024)
+
+        (start1, end1), (start2, end2) = self.parser.frame_spans()
+        self.assertEqual(end1, start2)
+        self.assertEqual(self.parser.view(start1, end2), b''.join(frames))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from src.proxy.loadtest import run_load_test, percentiles, format_report
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_percentiles(self):
+        result = percentiles([float(i) for i in range(1, 101)])
+        self.assertEqual(result, {"p50": 51.0, "p90": 91.0, "p99": 100.0, "max": 100.0})
+        self.assertEqual(percentiles([]), {})
+
+    def test_short_run(self):
+        report = run_load_test(clients=3, slow_clients=1, slow_rate=1000, rate=100, size=100, duration=1.0,
+                               drain=0.5)
+
+        sent = report['radio']['packets_sent']
+        self.assertGreater(sent, 50)
+        fast = report['fast_clients']
+        self.assertEqual(fast['received'], sent * 2)
+        self.assertEqual(fast['missed'], 0)
+        self.assertIn('p99', fast['latency_ms'])
+        self.assertLess(report['slow_clients']['received'], sent)
+        self.assertGreater(report['proxy']['rss_peak_mb'], 0)
+        self.assertIn("Fast clients (2)", format_report(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import Mock
+
+from src.proxy.metrics import RateCounter, ProxyMetrics, format_prometheus, format_bot_prometheus, MetricsServer
+
+
+class TestRateCounter(unittest.TestCase):
+    def test_rate_over_complete_seconds(self):
+        counter = RateCounter(window=5)
+        for second in range(100, 105):
+            counter.add(8, second + 0.5)
+
+        # the current second (104) is partial, so only 100-103 count
+        self.assertEqual(counter.rate(104.9), 8 * 4 / 4)
+        self.assertEqual(counter.total, 40)
+
+    def test_old_buckets_expire(self):
+        counter = RateCounter(window=5)
+        counter.add(100, 100.0)
+        self.assertEqual(counter.rate(101.0), 25.0)
+        self.assertEqual(counter.rate(200.0), 0.0)
+        # reusing the bucket for a later second starts it from zero
+        counter.add(1, 105.0)
+        self.assertEqual(counter.rate(106.0), 0.25)
+
+
+class TestProxyMetrics(unittest.TestCase):
+    def test_reconnects_and_downtime(self):
+        metrics = ProxyMetrics()
+        metrics._down_since = 0.0
+        metrics.target_connected(2.0)
+        metrics.target_disconnected(10.0)
+        metrics.target_connected(13.0)
+        metrics.target_disconnected(20.0)
+
+        self.assertEqual(metrics.reconnects, 1)
+        self.assertEqual(metrics.downtime_secs(21.0), 2.0 + 3.0 + 1.0)
+
+    def test_duration_stats(self):
+        metrics = ProxyMetrics()
+        metrics.config_snapshots.record(0.002)
+        metrics.config_snapshots.record(0.004)
+        self.assertEqual(metrics.snapshot()['config_snapshots'],
+                         {'count': 2, 'last_ms': 4.0, 'max_ms': 4.0, 'mean_ms': 3.0})
+
+
+def make_status():
+    return {
+        "connected": True,
+        "clients": 1,
+        "silence_secs": 3,
+        "cached_nodes": 12,
+        "client_lag": [{"addr": "127.0.0.1:5000", "queued_bytes": 100, "lag_secs": 1.5, "dropped_bytes": 0}],
+        "metrics": ProxyMetrics().snapshot(),
+    }
+
+
+class TestMetricsExport(unittest.TestCase):
+    def test_format_prometheus(self):
+        text = format_prometheus(make_status())
+        self.assertIn("meshtastic_proxy_connected 1.0\n", text)
+        self.assertIn("meshtastic_proxy_watchdog_trips 0.0\n", text)
+        self.assertIn("meshtastic_proxy_config_snapshots_count 0.0\n", text)
+        self.assertIn('meshtastic_proxy_client_lag_seconds{client="127.0.0.1:5000"} 1.5\n', text)
+
+    def test_format_bot_prometheus(self):
+        text = format_bot_prometheus({"ingest": {"depth": 3, "dropped": 0}})
+        self.assertEqual(text, "meshtastic_bot_ingest_depth 3.0\nmeshtastic_bot_ingest_dropped 0.0\n")
+
+        text = format_bot_prometheus({"pipeline": {"persist": {"latency": {"count": 2, "buckets": {"0.01": 2}}}}})
+        self.assertIn('meshtastic_bot_pipeline_persist_latency_count 2.0\n', text)
+        self.assertIn('meshtastic_bot_pipeline_persist_latency_bucket{le="0.01"} 2.0\n', text)
+
+        text = format_bot_prometheus({"duplicates": {"suppressed_by_node": {"!0000beef": 3}}})
+        self.assertEqual(text, 'meshtastic_bot_duplicates_suppressed_by_node{node="!0000beef"} 3.0\n')
+
+    def test_metrics_server(self):
+        proxy = Mock()
+        proxy.get_status.return_value = make_status()
+        server = MetricsServer(proxy, port=0)
+        server.start()
+        try:
+            base = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+                self.assertIn("meshtastic_proxy_cached_nodes 12.0", response.read().decode())
+            with urllib.request.urlopen(f"{base}/status", timeout=5) as response:
+                self.assertEqual(json.loads(response.read())['clients'], 1)
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{base}/other", timeout=5)
+        finally:
+            server.stop()
+
+    def test_metrics_server_bot_metrics(self):
+        proxy = Mock()
+        proxy.get_status.return_value = make_status()
+        server = MetricsServer(proxy, port=0)
+        server.bot_metrics = lambda: {"ingest": {"depth": 7}}
+        server.start()
+        try:
+            base = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+                self.assertIn("meshtastic_bot_ingest_depth 7.0\n", response.read().decode())
+            with urllib.request.urlopen(f"{base}/status/bot", timeout=5) as response:
+                self.assertEqual(json.loads(response.read()), {"ingest": {"depth": 7}})
+        finally:
+            server.stop()
+
+    def test_metrics_server_labels_gateways(self):
+        proxies = {name: Mock() for name in ('roof', 'shed')}
+        for proxy in proxies.values():
+            proxy.get_status.return_value = make_status()
+        server = MetricsServer(proxies, port=0)
+        server.start()
+        try:
+            base = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+                text = response.read().decode()
+            self.assertIn('meshtastic_proxy_connected{gateway="roof"} 1.0\n', text)
+            self.assertIn('meshtastic_proxy_client_lag_seconds{gateway="shed",client="127.0.0.1:5000"} 1.5\n', text)
+            with urllib.request.urlopen(f"{base}/status", timeout=5) as response:
+                self.assertEqual(set(json.loads(response.read())), {'roof', 'shed'})
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
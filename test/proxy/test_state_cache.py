@@ -0,0 +1,117 @@
+import unittest
+
+from meshtastic.protobuf import mesh_pb2, config_pb2, portnums_pb2, channel_pb2
+
+from src.proxy.framing import encode_frame, frame_payload
+from src.proxy.state_cache import RadioStateCache, SPECIAL_NONCE_ONLY_CONFIG, SPECIAL_NONCE_ONLY_NODES
+
+
+def from_radio_frame(**kwargs) -> bytes:
+    return encode_frame(mesh_pb2.FromRadio(**kwargs).SerializeToString())
+
+
+def decode(frame) -> mesh_pb2.FromRadio:
+    return mesh_pb2.FromRadio.FromString(frame_payload(frame))
+
+
+class TestRadioStateCache(unittest.TestCase):
+    my_node_num = 0x11111111
+
+    def setUp(self):
+        self.cache = RadioStateCache()
+
+    def load_config(self, nodes=(0x11111111, 0x22222222, 0x33333333)):
+        self.cache.begin_refresh()
+        frames = [
+            from_radio_frame(my_info=mesh_pb2.MyNodeInfo(my_node_num=self.my_node_num)),
+            from_radio_frame(channel=channel_pb2.Channel(index=1)),
+            from_radio_frame(channel=channel_pb2.Channel(index=0)),
+            from_radio_frame(config=config_pb2.Config(lora=config_pb2.Config.LoRaConfig(hop_limit=3))),
+            from_radio_frame(config=config_pb2.Config(device=config_pb2.Config.DeviceConfig())),
+            *[from_radio_frame(node_info=mesh_pb2.NodeInfo(num=num, user=mesh_pb2.User(id=f"!{num:08x}")))
+              for num in nodes],
+            from_radio_frame(config_complete_id=1),
+        ]
+        for frame in frames:
+            self.cache.update(frame)
+
+    def variants(self, frames):
+        return [decode(f).WhichOneof('payload_variant') for f in frames]
+
+    def test_incomplete_until_config_complete(self):
+        self.cache.update(from_radio_frame(my_info=mesh_pb2.MyNodeInfo(my_node_num=self.my_node_num)))
+        self.assertFalse(self.cache.complete)
+        self.load_config()
+        self.assertTrue(self.cache.complete)
+
+    def test_snapshot_order_and_nonce(self):
+        self.load_config()
+        frames = self.cache.snapshot(1234)
+
+        self.assertEqual(self.variants(frames), ['my_info', 'node_info', 'channel', 'channel', 'config', 'config',
+                                                 'node_info', 'node_info', 'config_complete_id'])
+        # own node first, channels sorted by index
+        self.assertEqual(decode(frames[1]).node_info.num, self.my_node_num)
+        self.assertEqual(decode(frames[2]).channel.index, 0)
+        self.assertEqual(decode(frames[-1]).config_complete_id, 1234)
+
+    def test_special_nonces(self):
+        self.load_config()
+        self.assertNotIn('node_info', self.variants(self.cache.snapshot(SPECIAL_NONCE_ONLY_CONFIG))[2:])
+        self.assertEqual(self.variants(self.cache.snapshot(SPECIAL_NONCE_ONLY_NODES)),
+                         ['my_info', 'node_info', 'node_info', 'node_info', 'config_complete_id'])
+
+    def test_deduplicates_by_key(self):
+        self.load_config()
+        self.load_config()
+        self.assertEqual(self.cache.node_count, 3)
+        self.assertEqual(len(self.cache.snapshot(1)), 9)
+
+    def test_refresh_prunes_removed_nodes(self):
+        self.load_config()
+        self.load_config(nodes=(0x11111111, 0x22222222))
+        self.assertEqual(self.cache.node_count, 2)
+
+    def test_nodeinfo_packet_adds_new_node(self):
+        self.load_config()
+        user = mesh_pb2.User(id='!44444444', long_name='New Node', short_name='NEW')
+        packet = mesh_pb2.MeshPacket(rx_time=1700000000)
+        setattr(packet, 'from', 0x44444444)
+        packet.decoded.portnum = portnums_pb2.PortNum.NODEINFO_APP
+        packet.decoded.payload = user.SerializeToString()
+        self.cache.update(from_radio_frame(packet=packet))
+
+        self.assertEqual(self.cache.node_count, 4)
+        nodes = [decode(f).node_info for f in self.cache.snapshot(1) if decode(f).HasField('node_info')]
+        new_node = next(n for n in nodes if n.num == 0x44444444)
+        self.assertEqual(new_node.user.long_name, 'New Node')
+        self.assertEqual(new_node.last_heard, 1700000000)
+
+    def test_other_packets_update_last_heard_only_for_known_nodes(self):
+        self.load_config()
+        for node_num in (0x22222222, 0x55555555):
+            packet = mesh_pb2.MeshPacket(rx_time=1700000001)
+            setattr(packet, 'from', node_num)
+            packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+            self.cache.update(from_radio_frame(packet=packet))
+
+        self.assertEqual(self.cache.node_count, 3)
+        nodes = {decode(f).node_info.num: decode(f).node_info
+                 for f in self.cache.snapshot(1) if decode(f).HasField('node_info')}
+        self.assertEqual(nodes[0x22222222].last_heard, 1700000001)
+
+    def test_last_heard_updates_throttled(self):
+        self.load_config()
+        for rx_time in (1700000001, 1700000002):
+            packet = mesh_pb2.MeshPacket(rx_time=rx_time)
+            setattr(packet, 'from', 0x22222222)
+            packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+            self.cache.update(from_radio_frame(packet=packet))
+
+        nodes = {decode(f).node_info.num: decode(f).node_info
+                 for f in self.cache.snapshot(1) if decode(f).HasField('node_info')}
+        self.assertEqual(nodes[0x22222222].last_heard, 1700000001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import re
+import unittest
+
+from src.responders.message_reaction_responder import MessageReactionResponder
+from src.responders.responder_factory import ResponderRegistry
+from test.responders import ResponderTestCase
+
+REACTION = "src.responders.message_reaction_responder.MessageReactionResponder"
+
+
+class TestResponderRegistry(ResponderTestCase):
+
+    def build_registry(self, *triggers: list[re.Pattern]) -> ResponderRegistry:
+        return ResponderRegistry(self.bot, [
+            {"class": REACTION, "trigger_regex": patterns, "args": [str(i)]} for i, patterns in enumerate(triggers)
+        ])
+
+    def test_default_responders(self):
+        registry = ResponderRegistry(self.bot)
+
+        self.assertIsInstance(registry.match("Testing 123"), MessageReactionResponder)
+        self.assertIsInstance(registry.match("test"), MessageReactionResponder)
+        self.assertIsNone(registry.match("tested"))
+        self.assertIsNone(registry.match("hello"))
+
+    def test_responders_instantiated_once(self):
+        registry = ResponderRegistry(self.bot)
+
+        self.assertIs(registry.match("test"), registry.match("testing 1 2 3"))
+
+    def test_first_matching_responder_wins(self):
+        registry = self.build_registry(
+            [re.compile(r"^hello$")],
+            [re.compile(r"^hel"), re.compile(r"^bye")],
+            [re.compile(r"^h")],
+        )
+
+        self.assertEqual(registry.match("hello").emoji, "0")
+        self.assertEqual(registry.match("help").emoji, "1")
+        self.assertEqual(registry.match("bye").emoji, "1")
+        self.assertEqual(registry.match("hi").emoji, "2")
+        self.assertIsNone(registry.match("yo"))
+
+    def test_flags_kept_per_pattern(self):
+        registry = self.build_registry([re.compile(r"^abc$")], [re.compile(r"^ABC$", re.IGNORECASE)])
+
+        self.assertEqual(registry.match("abc").emoji, "0")
+        self.assertEqual(registry.match("aBc").emoji, "1")
+
+    def test_patterns_with_groups_tried_in_order(self):
+        registry = self.build_registry(
+            [re.compile(r"^(\w)\1$")],
+            [re.compile(r"^a")],
+            [re.compile(r"^(?P<word>b+)$")],
+        )
+
+        self.assertEqual(registry.match("aa").emoji, "0")
+        self.assertEqual(registry.match("ab").emoji, "1")
+        self.assertEqual(registry.match("bbb").emoji, "2")
+        self.assertIsNone(registry.match("c"))
+
+    def test_ignores_case_like_re(self):
+        registry = self.build_registry([re.compile(r"^ok$", re.IGNORECASE)], [re.compile(r"^ok")])
+
+        self.assertEqual(registry.match("OK").emoji, "0")
+        # the Kelvin sign is a K, ignoring case
+        self.assertEqual(registry.match("o\u212a").emoji, "0")
+        self.assertEqual(registry.match("okay").emoji, "1")
+        self.assertIsNone(registry.match("Okay"))
+
+    def test_literal_prefix(self):
+        prefix = ResponderRegistry._literal_prefix
+
+        self.assertEqual(prefix(re.compile(r"^test .*$")), "test ")
+        self.assertEqual(prefix(re.compile(r"testing")), "testing")
+        self.assertEqual(prefix(re.compile(r"^tests?$")), "test")
+        self.assertEqual(prefix(re.compile(r"^ab{2}")), "a")
+        self.assertEqual(prefix(re.compile(r"^a+b")), "a")
+        self.assertEqual(prefix(re.compile(r"^hi\.")), "hi")
+        self.assertEqual(prefix(re.compile(r"^hi|^bye")), "")
+        self.assertEqual(prefix(re.compile(r"^caf\u00e9")), "caf")
+        self.assertEqual(prefix(re.compile("^café")), "café")
+        self.assertEqual(prefix(re.compile("^café", re.IGNORECASE)), "caf")
+        self.assertEqual(prefix(re.compile("^a b", re.VERBOSE)), "")
+
+    def test_no_responders(self):
+        registry = self.build_registry()
+
+        self.assertEqual(len(registry), 0)
+        self.assertIsNone(registry.match("test"))
+
+
+if __name__ == '__main__':
+    unittest.main()
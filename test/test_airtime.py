@@ -0,0 +1,70 @@
+import math
+import unittest
+
+from meshtastic.protobuf import config_pb2
+
+from src.airtime import AirtimeBudget, lora_airtime, data_payload_size
+
+
+class TestLoraAirtime(unittest.TestCase):
+    def test_matches_semtech_calculator(self):
+        # SF7, 125kHz, CR4/5, 8 symbol preamble, 10 byte payload
+        self.assertAlmostEqual(lora_airtime(10, 125, 7, 5, preamble_symbols=8), 0.041216, places=6)
+
+    def test_low_data_rate_optimisation(self):
+        # SF12 at 125kHz has 32ms symbols, so each symbol carries fewer bits
+        self.assertAlmostEqual(lora_airtime(10, 125, 12, 5, preamble_symbols=8), 0.991232, places=6)
+
+    def test_slower_presets_take_longer(self):
+        budget = AirtimeBudget()
+        long_fast = budget.estimate(50)
+        budget.set_lora_config(config_pb2.Config.LoRaConfig(
+            use_preset=True, modem_preset=config_pb2.Config.LoRaConfig.ModemPreset.SHORT_FAST))
+        self.assertEqual(budget.preset, 'SHORT_FAST')
+        self.assertLess(budget.estimate(50), long_fast / 4)
+
+    def test_custom_lora_settings(self):
+        budget = AirtimeBudget()
+        budget.set_lora_config(config_pb2.Config.LoRaConfig(use_preset=False, bandwidth=125, spread_factor=12,
+                                                            coding_rate=8))
+        self.assertEqual((budget.preset, budget.spread_factor), ('custom', 12))
+
+    def test_data_payload_size(self):
+        self.assertEqual(data_payload_size(b'hello'), 9)
+        self.assertGreater(data_payload_size('👍'.encode(), reply_id=1234, emoji=True), data_payload_size('👍'.encode()))
+
+
+class TestAirtimeBudget(unittest.TestCase):
+    def setUp(self):
+        # 10 seconds of airtime in a 100 second window
+        self.budget = AirtimeBudget(duty_cycle=0.1, window=100)
+
+    def test_sliding_window(self):
+        self.budget.record(4, now=0)
+        self.budget.record(3, now=50)
+        self.assertEqual(self.budget.used_secs(now=60), 7)
+        self.assertEqual(self.budget.used_secs(now=100), 3)
+        self.assertEqual(self.budget.used_secs(now=150), 0)
+        self.assertEqual(self.budget.total_secs, 7)
+
+    def test_wait_time(self):
+        self.budget.record(4, now=0)
+        self.budget.record(5, now=50)
+
+        self.assertEqual(self.budget.wait_time(1, now=60), 0)
+        # needs the first send to age out
+        self.assertEqual(self.budget.wait_time(2, now=60), 40)
+        # needs both
+        self.assertEqual(self.budget.wait_time(6, now=60), 90)
+        # a smaller share of the budget has to wait longer
+        self.assertEqual(self.budget.wait_time(1, share=0.5, now=60), 90)
+        self.assertEqual(self.budget.wait_time(11, now=60), math.inf)
+
+    def test_status(self):
+        self.budget.record(2.5)
+        status = self.budget.status()
+        self.assertEqual((status['used_secs'], status['limit_secs'], status['used_percent']), (2.5, 10, 25))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
+from unittest.mock import Mock
 
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
 
 from src.base_feature import AbstractBaseFeature
+from src.transmit_scheduler import Priority
 from test.test_setup_data import build_test_text_packet, get_test_bot
 
 
@@ -51,6 +53,30 @@ class TestAbstractBaseFeature(unittest.TestCase):
         self.feature.react_in_dm(packet, "👍")
         self.mock_interface.sendReaction.assert_called_once_with("👍", messageId=packet['id'], destinationId=sender.user.id)
 
+    def test_message_in_dm_scheduled(self):
+        self.bot.transmit_scheduler = Mock()
+        admin = self.test_admin_nodes[0]
+        self.feature.message_in_dm(admin.user.id, "Test message")
+
+        # nothing is sent until the scheduler gets to it
+        self.mock_interface.sendText.assert_not_called()
+        send, priority = self.bot.transmit_scheduler.submit.call_args[0][:2]
+        self.assertEqual(priority, Priority.ADMIN)
+        send()
+        self.mock_interface.sendText.assert_called_once_with("Test message", destinationId=admin.user.id,
+                                                             wantAck=True)
+
+    def test_long_message_sent_in_parts(self):
+        sender = self.test_non_admin_nodes[1]
+        message = '\n'.join(f"Line {i}: " + 'x' * 40 for i in range(20))
+        self.feature.message_in_dm(sender.user.id, message)
+
+        sent = [call[0][0] for call in self.mock_interface.sendText.call_args_list]
+        self.assertGreater(len(sent), 1)
+        self.assertTrue(all(len(part.encode('utf-8')) <= AbstractBaseFeature.MAX_MESSAGE_BYTES for part in sent))
+        self.assertTrue(sent[0].startswith(f"(1/{len(sent)}) Line 0:"))
+        self.assertIn("Line 19:", sent[-1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,14 @@
 import unittest
+from datetime import datetime, timezone
 from unittest import skipIf
 from unittest.mock import MagicMock, patch
 
 from src.bot import MeshtasticBot
+from src.commands.parsed_command import ParsedCommand
+from src.data_classes import MeshNode
+from src.persistence.node_db import InMemoryNodeDB
+from src.persistence.node_info import InMemoryNodeInfoStore
+from src.rate_limiter import CommandRateLimiter
 
 
 class TestMeshtasticBot(unittest.TestCase):
@@ -20,6 +26,192 @@ class TestMeshtasticBot(unittest.TestCase):
         mock_pub.subscribe.assert_any_call(self.bot.on_node_updated, "meshtastic.node.updated")
         mock_pub.subscribe.assert_any_call(self.bot.on_connection, "meshtastic.connection.established")
 
+    @patch('src.bot.LocalProxyInterface')
+    @patch('src.bot.AutoReconnectTcpInterface')
+    def test_connect_attached_to_proxy(self, mock_tcp_interface, mock_local_interface):
+        self.bot.proxy = MagicMock()
+        self.bot.attach_to_proxy = True
+        self.bot.connect()
+
+        mock_tcp_interface.assert_not_called()
+        self.assertEqual(mock_local_interface.call_args[0][0], self.bot.proxy)
+        self.assertIs(self.bot.interface, mock_local_interface.return_value)
+
+    def test_routing_packet_fed_to_delivery_tracker(self):
+        self.bot.delivery_tracker = MagicMock()
+        self.bot.my_id = '!1234abcd'
+        packet = {
+            'fromId': '!0000beef',
+            'toId': '!1234abcd',
+            'decoded': {'portnum': 'ROUTING_APP', 'requestId': 42, 'routing': {'errorReason': 'NO_RESPONSE'}},
+        }
+        with patch('src.bot.dump_packet'):
+            try:
+                self.bot.on_receive(packet, self.bot.interface)
+            except Exception:
+                pass  # only the routing feed matters here
+
+        self.bot.delivery_tracker.on_routing_packet.assert_called_once_with(42, 'NO_RESPONSE', False)
+
+    def test_received_packets_go_through_ingest_queue(self):
+        self.bot.ingest_queue = MagicMock()
+        packet = {'fromId': '!0000beef'}
+        self.bot._ingest_receive(packet, self.bot.interface)
+
+        self.bot.ingest_queue.submit.assert_called_once_with('!0000beef', self.bot.on_receive, packet,
+                                                             self.bot.interface)
+
+    def test_text_message_answered_in_respond_stage(self):
+        self.bot.my_id = '!1234abcd'
+        self.bot.node_db = MagicMock()
+        self.bot.node_info = MagicMock()
+        self.bot.handle_private_message = MagicMock()
+        packet = {
+            'from': 0xbeef, 'fromId': '!0000beef', 'toId': '!1234abcd', 'id': 7,
+            'decoded': {'portnum': 'TEXT_MESSAGE_APP', 'text': '!ping'},
+        }
+        with patch('src.bot.dump_packet') as mock_dump:
+            self.bot.on_receive(packet, self.bot.interface)
+            mock_dump.assert_called_once_with(packet)
+
+        self.bot.handle_private_message.assert_called_once_with(packet)
+        self.assertEqual(packet[ParsedCommand.PACKET_KEY].base_command, '!ping')
+        self.bot.node_info.node_packet_received.assert_called_once_with('!0000beef', 'TEXT_MESSAGE_APP')
+        timings = self.bot.get_metrics()['pipeline']
+        self.assertEqual([stage for stage, metrics in timings.items() if metrics['latency']['count']],
+                         ['decode', 'dedupe', 'persist', 'upload', 'dispatch', 'respond'])
+
+    def test_respond_stage_goes_through_on_receive_text(self):
+        self.bot.node_db = MagicMock()
+        self.bot.node_info = MagicMock()
+        self.bot.on_receive_text = MagicMock()
+        packet = {
+            'from': 0xbeef, 'fromId': '!0000beef', 'toId': '^all', 'id': 8,
+            'decoded': {'portnum': 'TEXT_MESSAGE_APP', 'text': 'hello'},
+        }
+        with patch('src.bot.dump_packet'):
+            self.bot.on_receive(packet, self.bot.interface)
+
+        self.bot.on_receive_text.assert_called_once_with(packet, self.bot.interface)
+
+    def test_duplicate_packet_handled_once(self):
+        self.bot.node_db = MagicMock()
+        self.bot.node_info = MagicMock()
+        self.bot.storage_apis = [MagicMock()]
+        packet = {'from': 0xbeef, 'fromId': '!0000beef', 'toId': '^all', 'id': 7,
+                  'decoded': {'portnum': 'POSITION_APP'}}
+        with patch('src.bot.dump_packet') as mock_dump:
+            self.bot.on_receive(dict(packet), self.bot.interface)
+            self.bot.on_receive(dict(packet), self.bot.interface)
+            mock_dump.assert_called_once()
+
+        self.bot.node_info.node_packet_received.assert_called_once()
+        self.bot.storage_apis[0].store_raw_packet.assert_called_once()
+        self.assertEqual(self.bot.duplicate_filter.suppressed_by_node['!0000beef'], 1)
+
+    def test_node_update_stored(self):
+        self.bot.node_db = MagicMock()
+        self.bot.node_info = MagicMock()
+        self.bot.storage_apis = [MagicMock()]
+        node = {'num': 0xbeef, 'user': {'id': '!0000beef', 'longName': 'Beef', 'shortName': 'BEEF'},
+                'lastHeard': 1700000000}
+
+        self.bot.synced_interfaces.add(self.bot.interface)
+        self.bot.on_node_updated(node, self.bot.interface)
+
+        stored = self.bot.node_db.store_node.call_args[0][0]
+        self.assertEqual(stored.user.id, '!0000beef')
+        self.bot.storage_apis[0].store_node.assert_called_once_with(stored)
+
+    def test_commands_rate_limited(self):
+        self.bot.my_id = '!1234abcd'
+        self.bot.node_db = MagicMock()
+        self.bot.command_logger = MagicMock()
+        self.bot.commands = MagicMock()
+        self.bot.rate_limiter = CommandRateLimiter(sender_rate=1 / 60, sender_burst=1)
+        packet = {'fromId': '!0000beef', 'toId': '!1234abcd', 'decoded': {'text': '!nodes'}}
+
+        for _ in range(3):
+            self.bot.handle_private_message(packet)
+
+        self.bot.commands.get.return_value.handle_packet.assert_called_once_with(packet)
+        self.bot.command_logger.log_throttled_request.assert_called_with('!0000beef', '!nodes', 'sender', None)
+        self.assertEqual(self.bot.command_logger.log_throttled_request.call_count, 2)
+        # told to slow down once
+        self.bot.interface.sendText.assert_called_once()
+        self.assertIn("Slow down", self.bot.interface.sendText.call_args[0][0])
+
+    def test_public_commands_rate_limited_by_channel(self):
+        self.bot.node_db = MagicMock()
+        self.bot.command_logger = MagicMock()
+        self.bot.commands = MagicMock()
+        self.bot.rate_limiter = CommandRateLimiter(channel_rate=1 / 60, channel_burst=1)
+
+        for sender in ('!0000beef', '!0000cafe'):
+            self.bot.handle_public_message({'fromId': sender, 'toId': '^all', 'channel': 1,
+                                            'decoded': {'text': '!nodes'}})
+
+        self.bot.commands.get.return_value.handle_packet.assert_called_once()
+        self.bot.command_logger.log_throttled_request.assert_called_once_with('!0000cafe', '!nodes', 'channel', 1)
+
+    def test_admins_not_rate_limited(self):
+        self.bot.my_id = '!1234abcd'
+        self.bot.admin_nodes = ['!0000beef']
+        self.bot.node_db = MagicMock()
+        self.bot.command_logger = MagicMock()
+        self.bot.commands = MagicMock()
+        self.bot.rate_limiter = CommandRateLimiter(sender_rate=1 / 60, sender_burst=1)
+        packet = {'fromId': '!0000beef', 'toId': '!1234abcd', 'decoded': {'text': '!admin'}}
+
+        self.bot.handle_private_message(packet)
+        self.bot.handle_private_message(packet)
+
+        self.assertEqual(self.bot.commands.get.return_value.handle_packet.call_count, 2)
+
+    def test_node_db_replay_synced_in_bulk_once_connected(self):
+        self.bot.node_db = InMemoryNodeDB()
+        self.bot.node_info = InMemoryNodeInfoStore()
+        self.bot.node_db.store_nodes = MagicMock(wraps=self.bot.node_db.store_nodes)
+        self.bot.node_db.store_user(MeshNode.User('!0000beef', 'Beef', 'BEEF'))
+        self.bot.node_info.update_last_heard('!0000beef', datetime.fromtimestamp(1700000000, tz=timezone.utc))
+        self.bot.interface.nodes = {
+            # unchanged since it was last stored
+            '!0000beef': {'num': 0xbeef, 'user': {'id': '!0000beef', 'longName': 'Beef', 'shortName': 'BEEF'},
+                          'lastHeard': 1700000000},
+            # heard from since
+            '!0000cafe': {'num': 0xcafe, 'user': {'id': '!0000cafe', 'longName': 'Cafe', 'shortName': 'CAFE'},
+                          'lastHeard': 1700000000},
+            # renamed
+            '!0000f00d': {'num': 0xf00d, 'user': {'id': '!0000f00d', 'longName': 'Food', 'shortName': 'FOOD'},
+                          'lastHeard': 1700000000},
+            '!0000d00d': {'num': 0xd00d, 'lastHeard': 1700000000},
+        }
+        self.bot.node_db.store_user(MeshNode.User('!0000f00d', 'Fud', 'FUD'))
+        self.bot.node_info.update_last_heard('!0000f00d', datetime.fromtimestamp(1700000000, tz=timezone.utc))
+
+        # while connecting, the library replays every node
+        for node in self.bot.interface.nodes.values():
+            self.bot.on_node_updated(node, self.bot.interface)
+        self.bot.node_db.store_nodes.assert_not_called()
+
+        changed = self.bot.sync_nodes(self.bot.interface)
+
+        self.assertEqual([node.user.id for node in changed], ['!0000cafe', '!0000f00d'])
+        self.bot.node_db.store_nodes.assert_called_once_with(changed)
+        self.assertEqual(self.bot.node_db.get_by_id('!0000f00d').short_name, 'FOOD')
+        self.assertEqual(self.bot.sync_nodes(self.bot.interface), [])
+
+    def test_synced_nodes_uploaded_in_chunks(self):
+        storage_api = MagicMock()
+        storage_api.store_nodes_one_by_one.side_effect = len
+        self.bot.storage_apis = [storage_api]
+        self.bot.node_upload_chunk_size = 2
+        nodes = [MeshNode.from_dict({'user': {'id': f'!0000000{i}'}}) for i in range(5)]
+
+        self.bot._upload_nodes(nodes)
+
+        self.assertEqual([len(call.args[0]) for call in storage_api.store_nodes_one_by_one.call_args_list], [2, 2, 1])
+
     def test_disconnect(self):
         self.bot.disconnect()
         self.bot.interface.close.assert_called_once()
@@ -0,0 +1,138 @@
+import itertools
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from meshtastic.protobuf import mesh_pb2
+
+from src.delivery_tracker import DeliveryTracker
+from src.tcp_interface import AutoReconnectTcpInterface
+
+
+class TestDeliveryTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = DeliveryTracker(ack_timeout=0.2, max_attempts=3, backoff=0.05)
+        self.tracker.start()
+        self.packet_ids = itertools.count(100)
+        self.sent = []
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def send(self):
+        packet = mesh_pb2.MeshPacket(id=next(self.packet_ids))
+        self.sent.append(packet.id)
+        return packet
+
+    def test_ack_resolves_future(self):
+        delivery = self.tracker.send(self.send, '!1234abcd')
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+
+        self.assertTrue(delivery.result(1))
+        self.assertEqual(delivery.attempts, 1)
+        self.assertIsNotNone(delivery.latency)
+        self.assertEqual(self.tracker.pending, 0)
+
+    def test_nak_is_retried(self):
+        delivery = self.tracker.send(self.send, '!1234abcd')
+        resent = threading.Event()
+        first_id = delivery.packet_id
+        self.tracker.on_routing_packet(first_id, 'NO_ROUTE')
+
+        for _ in range(50):
+            if len(self.sent) == 2:
+                resent.set()
+                break
+            resent.wait(0.02)
+        self.assertTrue(resent.is_set())
+        self.assertFalse(delivery.done)
+        self.assertNotEqual(delivery.packet_id, first_id)
+
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+        self.assertTrue(delivery.result(1))
+        self.assertEqual(delivery.attempts, 2)
+        self.assertEqual(self.tracker.retries, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        delivery = self.tracker.send(self.send, '!1234abcd')
+
+        self.assertFalse(delivery.result(5))
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(self.tracker.failed, 1)
+
+    def test_implicit_ack_is_not_delivery(self):
+        delivery = self.tracker.send(self.send, '!1234abcd')
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE', from_own_radio=True)
+
+        self.assertFalse(delivery.done)
+        self.assertEqual(self.tracker.pending, 1)
+
+    def test_unknown_request_id_ignored(self):
+        self.tracker.on_routing_packet(999, 'NONE')
+        self.assertEqual(self.tracker.delivered, 0)
+
+    def test_sends_through_submit(self):
+        submit = MagicMock()
+        delivery = self.tracker.send(self.send, '!1234abcd', submit=submit)
+        self.assertEqual(self.sent, [])
+
+        submit.call_args[0][0]()
+        self.assertEqual(self.sent, [delivery.packet_id])
+
+    def test_done_callback(self):
+        finished = []
+        delivery = self.tracker.send(self.send, '!1234abcd', description="DM")
+        delivery.add_done_callback(finished.append)
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+
+        self.assertEqual(finished, [delivery])
+
+    def test_stats(self):
+        self.assertIsNone(self.tracker.stats()['delivered_percent'])
+        for _ in range(3):
+            delivery = self.tracker.send(self.send, '!1234abcd')
+            self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+        self.tracker.max_attempts = 1
+        delivery = self.tracker.send(self.send, '!1234abcd')
+        self.tracker.on_routing_packet(delivery.packet_id, 'MAX_RETRANSMIT')
+
+        stats = self.tracker.stats()
+        self.assertEqual(stats['delivered'], 3)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['delivered_percent'], 75.0)
+        self.assertIn('p50', stats['latency_secs'])
+
+    def test_send_without_packet_is_retried(self):
+        sends = []
+        delivery = self.tracker.send(lambda: sends.append(1), '!1234abcd')
+
+        self.assertFalse(delivery.result(5))
+        self.assertIsNone(delivery.packet_id)
+        self.assertEqual(len(sends), 3)
+        self.assertEqual(self.tracker.pending, 0)
+
+    def test_dm_sent_through_tcp_interface(self):
+        interface = AutoReconnectTcpInterface(hostname='localhost', connectNow=False)
+        with patch.object(interface, '_sendToRadio') as send_to_radio:
+            delivery = self.tracker.send(
+                lambda: interface.sendText('hello', destinationId=0x1234abcd, wantAck=True), '!1234abcd')
+
+        self.assertEqual(send_to_radio.call_args[0][0].packet.id, delivery.packet_id)
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+        self.assertTrue(delivery.result(1))
+
+    def test_dm_queued_by_tcp_interface(self):
+        interface = AutoReconnectTcpInterface(hostname='localhost', connectNow=False)
+        with patch.object(interface, '_writeBytes', side_effect=BrokenPipeError()), \
+                patch.object(interface, '_shutdown_and_call_error_handler'):
+            delivery = self.tracker.send(
+                lambda: interface.sendText('hello', destinationId=0x1234abcd, wantAck=True), '!1234abcd')
+
+        # acknowledged once the queued packet is replayed
+        self.assertEqual(interface.packet_queue.peek().packet.id, delivery.packet_id)
+        self.tracker.on_routing_packet(delivery.packet_id, 'NONE')
+        self.assertTrue(delivery.result(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
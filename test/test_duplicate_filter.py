@@ -0,0 +1,66 @@
+import unittest
+
+from src.duplicate_filter import DuplicateFilter
+
+
+class TestDuplicateFilter(unittest.TestCase):
+    def setUp(self):
+        self.filter = DuplicateFilter(ttl=60, max_entries=3)
+
+    def test_repeat_is_duplicate(self):
+        self.assertFalse(self.filter.is_duplicate(1, 100, '!00000001', now=0))
+        self.assertTrue(self.filter.is_duplicate(1, 100, '!00000001', now=1))
+        # same id from another node is a different packet
+        self.assertFalse(self.filter.is_duplicate(2, 100, '!00000002', now=1))
+
+        self.assertEqual(self.filter.suppressed, 1)
+        self.assertEqual(self.filter.suppressed_by_node, {'!00000001': 1})
+
+    def test_no_packet_id(self):
+        self.assertFalse(self.filter.is_duplicate(1, 0, now=0))
+        self.assertFalse(self.filter.is_duplicate(1, 0, now=0))
+        self.assertEqual(len(self.filter), 0)
+
+    def test_expires_after_ttl_since_last_seen(self):
+        self.filter.is_duplicate(1, 100, now=0)
+        self.assertTrue(self.filter.is_duplicate(1, 100, now=50))
+        # seen again at 50, so remembered until 110
+        self.assertTrue(self.filter.is_duplicate(1, 100, now=100))
+        self.assertFalse(self.filter.is_duplicate(1, 100, now=161))
+
+    def test_least_recently_seen_evicted_at_cap(self):
+        for packet_id in (100, 101, 102):
+            self.filter.is_duplicate(1, packet_id, now=0)
+        self.filter.is_duplicate(1, 100, now=1)
+        self.filter.is_duplicate(1, 103, now=2)
+
+        self.assertEqual(len(self.filter), 3)
+        self.assertEqual(self.filter.evicted, 1)
+        self.assertTrue(self.filter.is_duplicate(1, 100, now=3))
+        self.assertFalse(self.filter.is_duplicate(1, 101, now=3))
+
+    def test_metrics(self):
+        self.filter.is_duplicate(1, 100, now=0)
+        self.filter.is_duplicate(1, 100, now=0)
+
+        metrics = self.filter.metrics()
+        self.assertEqual(metrics['entries'], 1)
+        self.assertEqual(metrics['seen'], 2)
+        self.assertEqual(metrics['suppressed'], 1)
+        self.assertEqual(metrics['approx_bytes'], DuplicateFilter.BYTES_PER_ENTRY)
+        self.assertEqual(metrics['suppressed_by_node'], {'1': 1})
+
+    def test_per_node_counts_bounded(self):
+        self.filter = DuplicateFilter(ttl=60, max_entries=100, max_nodes=2)
+        for from_num, copies in ((1, 3), (2, 1), (3, 2)):
+            for _ in range(copies + 1):
+                self.filter.is_duplicate(from_num, 100, f'!0000000{from_num}', now=0)
+
+        # the least recently suppressed node is forgotten
+        self.assertEqual(self.filter.suppressed_by_node, {'!00000002': 1, '!00000003': 2})
+        self.assertEqual(self.filter.top_suppressed(1), [('!00000003', 2)])
+        self.assertEqual(self.filter.suppressed, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
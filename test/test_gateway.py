@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.bot import MeshtasticBot
+from src.gateway import Gateway, parse_gateway_targets
+
+
+class TestParseGatewayTargets(unittest.TestCase):
+    def test_single_host(self):
+        self.assertEqual(parse_gateway_targets("10.0.0.5"), [("10.0.0.5", "10.0.0.5", 4403)])
+
+    def test_named_hosts_and_ports(self):
+        self.assertEqual(parse_gateway_targets("roof=10.0.0.5, shed=10.0.0.6:4404,"),
+                         [("roof", "10.0.0.5", 4403), ("shed", "10.0.0.6", 4404)])
+
+    def test_empty(self):
+        self.assertEqual(parse_gateway_targets(""), [])
+
+    def test_ipv6(self):
+        self.assertEqual(parse_gateway_targets("roof=[fd00::5]:4404,fd00::6,[fd00::7]"),
+                         [("roof", "fd00::5", 4404), ("fd00::6", "fd00::6", 4403), ("fd00::7", "fd00::7", 4403)])
+
+    def test_invalid(self):
+        for value in ("10.0.0.5:port", "10.0.0.5:70000", "[fd00::5", "[fd00::5]4404", "roof=", ":4404"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_gateway_targets(value)
+
+
+class TestMultipleGateways(unittest.TestCase):
+    def setUp(self):
+        self.bot = MeshtasticBot(address="localhost")
+        self.roof = Gateway('roof')
+        self.roof.interface = MagicMock()
+        self.roof.my_nodenum = 0x1
+        self.shed = Gateway('shed', port=4404)
+        self.shed.interface = MagicMock()
+        self.shed.my_nodenum = 0x2
+        self.bot.gateways = [self.roof, self.shed]
+        self.bot.interface = self.roof.interface
+        self.bot.my_nodenum = 0x1
+        self.bot.my_id = '!1'
+
+    def test_my_id(self):
+        self.assertEqual(self.shed.my_id, '!2')
+        self.assertIsNone(Gateway('new').my_id)
+
+    def test_is_my_id(self):
+        self.assertTrue(self.bot.is_my_id('!1'))
+        self.assertTrue(self.bot.is_my_id('!2'))
+        self.assertFalse(self.bot.is_my_id('!3'))
+
+    def test_packets_tagged_with_gateway(self):
+        packet = {'fromId': '!3', 'toId': '!2'}
+        self.bot.handle_private_message = MagicMock()
+        self.bot.on_receive_text(packet, self.shed.interface)
+
+        self.assertEqual(packet['gateway'], 'shed')
+        self.bot.handle_private_message.assert_called_once_with(packet)
+
+    def test_interface_for(self):
+        self.assertIs(self.bot.interface_for({'gateway': 'shed'}), self.shed.interface)
+        self.assertIs(self.bot.interface_for({'gateway': 'gone'}), self.roof.interface)
+        self.assertIs(self.bot.interface_for({}), self.roof.interface)
+
+    def test_secondary_connection_keeps_primary_identity(self):
+        interface = self.shed.interface
+        interface.localNode.nodeNum = 0x22
+        self.bot.on_connection(interface)
+
+        self.assertEqual(self.shed.my_nodenum, 0x22)
+        self.assertEqual(self.bot.my_id, '!1')
+
+    def test_disconnect_closes_every_gateway(self):
+        self.bot.disconnect()
+        self.roof.interface.close.assert_called_once()
+        self.shed.interface.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
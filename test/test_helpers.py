@@ -1,7 +1,7 @@
 import unittest
 from datetime import datetime, timedelta, timezone
 
-from src.helpers import pretty_print_last_heard
+from src.helpers import pretty_print_last_heard, split_message
 
 
 class TestPrettyPrintLastHeard(unittest.TestCase):
@@ -56,5 +56,36 @@ class TestPrettyPrintLastHeard(unittest.TestCase):
         self.assertEqual(pretty_print_last_heard(future_time), "0s ago")
 
 
+class TestSplitMessage(unittest.TestCase):
+    def test_short_message_unchanged(self):
+        self.assertEqual(split_message("hello\nworld", 233), ["hello\nworld"])
+
+    def test_split_between_lines(self):
+        lines = [f"Node {i}: last heard {i}m ago" for i in range(20)]
+        parts = split_message('\n'.join(lines), 100)
+
+        self.assertTrue(all(len(part.encode('utf-8')) <= 100 for part in parts))
+        self.assertTrue(parts[0].startswith(f"(1/{len(parts)}) Node 0:"))
+        # numbering aside, every line is there, whole and in order
+        rejoined = '\n'.join(part.split(') ', 1)[1] for part in parts)
+        self.assertEqual(rejoined, '\n'.join(lines))
+
+    def test_long_line_split_between_words(self):
+        parts = split_message(' '.join(['word'] * 50), 60)
+        self.assertTrue(all(len(part.encode('utf-8')) <= 60 for part in parts))
+        self.assertTrue(all(part.endswith('word') for part in parts))
+
+    def test_multibyte_characters_not_cut(self):
+        parts = split_message('👍' * 100, 50)
+        self.assertTrue(all(len(part.encode('utf-8')) <= 50 for part in parts))
+        self.assertEqual(''.join(part.split(') ', 1)[1] for part in parts), '👍' * 100)
+
+    def test_numbering_width(self):
+        parts = split_message('\n'.join(['x' * 20] * 30), 30)
+        self.assertEqual(len(parts), 30)
+        self.assertTrue(parts[-1].startswith("(30/30) "))
+        self.assertTrue(all(len(part) <= 30 for part in parts))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+
+from src.ingest_queue import IngestQueue, OverflowPolicy
+
+
+class TestIngestQueue(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        self.release = threading.Event()
+
+    def handle(self, name):
+        self.handled.append(name)
+
+    def blocking_handle(self, name):
+        self.release.wait(5)
+        self.handled.append(name)
+
+    def test_handled_on_worker(self):
+        queue = IngestQueue(workers=2)
+        queue.start()
+        threads = []
+        done = threading.Event()
+        queue.submit('!a', lambda: (threads.append(threading.current_thread().name), done.set()))
+
+        self.assertTrue(done.wait(5))
+        queue.stop()
+        self.assertTrue(threads[0].startswith("ingest worker"))
+
+    def test_same_key_in_order(self):
+        queue = IngestQueue(workers=4)
+        for i in range(50):
+            queue.submit('!a', self.handle, i)
+        queue.start()
+        queue.stop()
+
+        self.assertEqual(self.handled, list(range(50)))
+        self.assertEqual(queue.metrics()['processed'], 50)
+
+    def test_submit_does_not_wait_for_handler(self):
+        queue = IngestQueue(workers=1)
+        queue.start()
+        start = time.monotonic()
+        for i in range(5):
+            queue.submit('!a', self.blocking_handle, i)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        self.release.set()
+        queue.stop()
+        self.assertEqual(len(self.handled), 5)
+
+    def test_drop_oldest(self):
+        queue = IngestQueue(workers=1, max_size=3, overflow=OverflowPolicy.DROP_OLDEST)
+        for i in range(5):
+            self.assertTrue(queue.submit('!a', self.handle, i))
+        queue.start()
+        queue.stop()
+
+        self.assertEqual(self.handled, [2, 3, 4])
+        self.assertEqual(queue.metrics()['dropped'], 2)
+        self.assertEqual(queue.metrics()['high_water'], 3)
+
+    def test_drop_newest(self):
+        queue = IngestQueue(workers=1, max_size=3, overflow=OverflowPolicy.DROP_NEWEST)
+        results = [queue.submit('!a', self.handle, i) for i in range(5)]
+        queue.start()
+        queue.stop()
+
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(self.handled, [0, 1, 2])
+
+    def test_block_waits_for_room(self):
+        queue = IngestQueue(workers=1, max_size=1, overflow=OverflowPolicy.BLOCK, block_timeout=5)
+        queue.start()
+        queue.submit('!a', self.blocking_handle, 0)
+        # wait for the worker to take the first one, so the second fills the queue
+        while queue.depth:
+            time.sleep(0.01)
+        queue.submit('!a', self.handle, 1)
+        threading.Timer(0.1, self.release.set).start()
+
+        start = time.monotonic()
+        self.assertTrue(queue.submit('!a', self.handle, 2))
+        self.assertGreater(time.monotonic() - start, 0.05)
+        queue.stop()
+        self.assertEqual(self.handled, [0, 1, 2])
+
+    def test_errors_counted(self):
+        queue = IngestQueue(workers=1)
+        queue.submit('!a', lambda: 1 / 0)
+        queue.submit('!a', self.handle, 'after')
+        queue.start()
+        queue.stop()
+
+        self.assertEqual(queue.metrics()['errors'], 1)
+        self.assertEqual(self.handled, ['after'])
+
+
+if __name__ == '__main__':
+    unittest.main()
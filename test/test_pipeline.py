@@ -0,0 +1,129 @@
+import threading
+import unittest
+
+from src.pipeline import LatencyHistogram, Pipeline, StageConfig, parse_stage_config
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.record(0.002)
+        for _ in range(10):
+            histogram.record(0.3)
+
+        self.assertEqual(histogram.percentile(50), 0.0025)
+        self.assertEqual(histogram.percentile(99), 0.3)
+        stats = histogram.as_dict()
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['buckets']['0.0025'], 90)
+        self.assertEqual(stats['buckets']['+Inf'], 100)
+
+    def test_empty(self):
+        self.assertEqual(LatencyHistogram().as_dict()['p50_ms'], 0.0)
+
+
+class TestParseStageConfig(unittest.TestCase):
+    def test_parse(self):
+        config = parse_stage_config("upload=async:4, dedupe=off,respond=sync")
+        self.assertEqual(config['upload'], StageConfig(run_async=True, workers=4))
+        self.assertFalse(config['dedupe'].enabled)
+        self.assertEqual(config['respond'], StageConfig())
+
+    def test_empty(self):
+        self.assertEqual(parse_stage_config(''), {})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_stage_config("upload=later")
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.ran = []
+
+    def stage(self, name, result=None):
+        def handler(ctx):
+            self.ran.append(name)
+            ctx.data[name] = True
+            return result
+        return handler
+
+    def test_stages_in_order(self):
+        pipeline = Pipeline()
+        pipeline.add_stage('a', {'packet': self.stage('a')})
+        pipeline.add_stage('b', {'packet': self.stage('b'), 'node': self.stage('b node')})
+        pipeline.add_stage('c', {'node': self.stage('c')})
+
+        ctx = pipeline.process('packet', {})
+        self.assertEqual(self.ran, ['a', 'b'])
+        self.assertEqual(ctx.data, {'a': True, 'b': True})
+        self.assertEqual(pipeline.metrics()['a']['latency']['count'], 1)
+        self.assertEqual(pipeline.metrics()['c']['latency']['count'], 0)
+
+    def test_stage_can_stop_pipeline(self):
+        pipeline = Pipeline()
+        pipeline.add_stage('a', {'packet': self.stage('a', False)})
+        pipeline.add_stage('b', {'packet': self.stage('b')})
+
+        pipeline.process('packet', {})
+        self.assertEqual(self.ran, ['a'])
+        self.assertEqual(pipeline.metrics()['a']['stopped'], 1)
+
+    def test_disabled_stage_skipped(self):
+        pipeline = Pipeline(parse_stage_config("a=off"))
+        pipeline.add_stage('a', {'packet': self.stage('a')})
+        pipeline.add_stage('b', {'packet': self.stage('b')})
+
+        pipeline.process('packet', {})
+        self.assertEqual(self.ran, ['b'])
+
+    def test_errors_counted(self):
+        def fail(ctx):
+            raise RuntimeError("boom")
+
+        pipeline = Pipeline()
+        pipeline.add_stage('a', {'packet': fail})
+        pipeline.add_stage('b', {'packet': self.stage('b')})
+        pipeline.add_stage('c', {'packet': fail}, required=True)
+        pipeline.add_stage('d', {'packet': self.stage('d')})
+
+        pipeline.process('packet', {})
+        self.assertEqual(self.ran, ['b'])
+        self.assertEqual(pipeline.metrics()['a']['errors'], 1)
+        self.assertEqual(pipeline.metrics()['c']['errors'], 1)
+
+    def test_async_stage_does_not_hold_up_the_rest(self):
+        release = threading.Event()
+        done = threading.Event()
+
+        def slow(ctx):
+            release.wait(5)
+            self.ran.append('slow')
+            done.set()
+
+        pipeline = Pipeline()
+        pipeline.add_stage('slow', {'packet': slow}, default=StageConfig(run_async=True))
+        pipeline.add_stage('b', {'packet': self.stage('b')})
+        pipeline.start()
+        try:
+            pipeline.process('packet', {}, key='!a')
+            self.assertEqual(self.ran, ['b'])
+            release.set()
+            self.assertTrue(done.wait(5))
+            self.assertEqual(self.ran, ['b', 'slow'])
+            self.assertIn('queue', pipeline.metrics()['slow'])
+        finally:
+            pipeline.stop()
+
+    def test_async_stage_runs_inline_until_started(self):
+        pipeline = Pipeline()
+        pipeline.add_stage('a', {'packet': self.stage('a')}, default=StageConfig(run_async=True))
+        pipeline.add_stage('b', {'packet': self.stage('b')})
+
+        pipeline.process('packet', {})
+        self.assertEqual(self.ran, ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from src.rate_limiter import CommandRateLimiter
+
+
+class TestCommandRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.limiter = CommandRateLimiter(sender_rate=1 / 10, sender_burst=2, channel_rate=1 / 5, channel_burst=3,
+                                          cooldown_notice_interval=60, max_buckets=100)
+
+    def test_sender_burst_then_throttled(self):
+        self.assertTrue(self.limiter.check('!a', now=0).allowed)
+        self.assertTrue(self.limiter.check('!a', now=0).allowed)
+
+        decision = self.limiter.check('!a', now=1)
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.scope, 'sender')
+        self.assertAlmostEqual(decision.retry_after, 9)
+        # other senders have their own bucket
+        self.assertTrue(self.limiter.check('!b', now=1).allowed)
+        # and it refills
+        self.assertTrue(self.limiter.check('!a', now=10).allowed)
+
+    def test_channel_limit_shared_by_senders(self):
+        for sender in ('!a', '!b', '!c'):
+            self.assertTrue(self.limiter.check(sender, channel=0, now=0).allowed)
+
+        decision = self.limiter.check('!d', channel=0, now=0)
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.scope, 'channel')
+        # other channels, and DMs, aren't affected
+        self.assertTrue(self.limiter.check('!d', channel=1, now=0).allowed)
+        self.assertTrue(self.limiter.check('!e', now=0).allowed)
+
+    def test_throttled_channel_request_uses_no_sender_tokens(self):
+        for sender in ('!a', '!b', '!c'):
+            self.limiter.check(sender, channel=0, now=0)
+        self.limiter.check('!d', channel=0, now=0)
+        self.limiter.check('!d', channel=0, now=0)
+
+        self.assertTrue(self.limiter.check('!d', now=0).allowed)
+        self.assertTrue(self.limiter.check('!d', now=0).allowed)
+
+    def test_cooldown_notice_rate_limited(self):
+        self.limiter.check('!a', now=0)
+        self.limiter.check('!a', now=0)
+
+        self.assertTrue(self.limiter.check('!a', now=1).notify)
+        self.assertFalse(self.limiter.check('!a', now=2).notify)
+        self.assertFalse(self.limiter.check('!a', now=9).notify)
+        # a minute on, with a full bucket again
+        self.assertTrue(self.limiter.check('!a', now=61).allowed)
+        self.assertTrue(self.limiter.check('!a', now=61).allowed)
+        self.assertTrue(self.limiter.check('!a', now=61).notify)
+
+        self.assertEqual(self.limiter.notices_sent, 2)
+
+    def test_metrics(self):
+        self.limiter.check('!a', now=0)
+        self.limiter.check('!a', now=0)
+        self.limiter.check('!a', now=0)
+
+        self.assertEqual(self.limiter.metrics(), {
+            "allowed": 2,
+            "throttled": {"sender": 1, "channel": 0},
+            "cooldown_notices": 1,
+            "tracked": 2,
+        })
+        self.assertEqual(self.limiter.throttled_by_sender, {'!a': 1})
+
+    def test_buckets_bounded(self):
+        limiter = CommandRateLimiter(max_buckets=2)
+        for sender in ('!a', '!b', '!c'):
+            limiter.check(sender, now=0)
+
+        self.assertEqual(limiter.metrics()["tracked"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from meshtastic.protobuf import mesh_pb2
+
+from src.api.StorageAPI import StorageAPIWrapper
+from src.commands.parsed_command import ParsedCommand
+from src.data_classes import MeshNode
+
+
+class TestStorageAPIRawPacket(unittest.TestCase):
+    def setUp(self):
+        self.bot = MagicMock()
+        self.bot.my_nodenum = 0x1234abcd
+        self.api = StorageAPIWrapper(self.bot, 'http://localhost')
+
+    def test_stored_packet_is_sanitised(self):
+        packet = {
+            'fromId': '!0000beef',
+            'raw': mesh_pb2.MeshPacket(id=7, channel=1),
+            'gateway': 'home',
+            'decoded': {'portnum': 'TEXT_MESSAGE_APP', 'text': '!ping', 'payload': b'!ping'},
+        }
+        packet[ParsedCommand.PACKET_KEY] = ParsedCommand.from_text('!ping')
+        with patch.object(self.api, '_post') as mock_post:
+            self.api.store_raw_packet(packet)
+
+        stored = mock_post.call_args[1]['json']
+        self.assertNotIn('raw', stored)
+        self.assertNotIn('gateway', stored)
+        self.assertNotIn(ParsedCommand.PACKET_KEY, stored)
+        self.assertEqual(stored['channel'], 1)
+        self.assertEqual(stored['decoded']['payload'], 'IXBpbmc=')
+
+    def test_packet_left_alone(self):
+        # the bot is still handling the same packet on another thread
+        raw = mesh_pb2.MeshPacket(id=7)
+        packet = {'fromId': '!0000beef', 'raw': raw, 'gateway': 'home',
+                  'decoded': {'portnum': 'POSITION_APP', 'payload': b'\x01', 'raw': raw}}
+        with patch.object(self.api, '_post'):
+            self.api.store_raw_packet(packet)
+
+        self.assertIs(packet['raw'], raw)
+        self.assertIs(packet['decoded']['raw'], raw)
+        self.assertEqual(packet['gateway'], 'home')
+        self.assertEqual(packet['decoded']['payload'], b'\x01')
+
+
+class TestStorageAPINodes(unittest.TestCase):
+    def setUp(self):
+        self.api = StorageAPIWrapper(MagicMock(), 'http://localhost')
+
+    def test_nodes_posted_one_by_one_over_one_session(self):
+        nodes = [MeshNode.from_dict({'user': {'id': f'!0000000{i}'}}) for i in range(3)]
+        with patch.object(self.api, '_post', side_effect=[None, Exception("timed out"), None]) as mock_post, \
+                patch('src.api.StorageAPI.requests.Session') as mock_session:
+            stored = self.api.store_nodes_one_by_one(nodes)
+
+        # the failed node is skipped
+        self.assertEqual(stored, 2)
+        self.assertEqual([call.kwargs['json']['id'] for call in mock_post.call_args_list],
+                         ['!00000000', '!00000001', '!00000002'])
+        session = mock_session.return_value.__enter__.return_value
+        self.assertTrue(all(call.kwargs['session'] is session for call in mock_post.call_args_list))
+
+
+if __name__ == '__main__':
+    unittest.main()
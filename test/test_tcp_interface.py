@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import patch
+
+from src.tcp_interface import AutoReconnectTcpInterface
+
+
+class TestAutoReconnectTcpInterfaceSendPacket(unittest.TestCase):
+    def setUp(self):
+        self.interface = AutoReconnectTcpInterface(hostname='localhost', connectNow=False)
+
+    def test_sent_packet_returned(self):
+        with patch.object(self.interface, '_sendToRadio') as send_to_radio:
+            packet = self.interface.sendText('hello', destinationId=0x1234)
+
+        send_to_radio.assert_called_once()
+        self.assertNotEqual(packet.id, 0)
+        self.assertEqual(send_to_radio.call_args[0][0].packet.id, packet.id)
+        self.assertTrue(self.interface.packet_queue.empty())
+
+    def test_packet_queued_during_replay_returned(self):
+        self.interface._replay_thread = object()
+        with patch.object(self.interface, '_sendToRadio') as send_to_radio:
+            packet = self.interface.sendText('hello', destinationId=0x1234)
+
+        send_to_radio.assert_not_called()
+        self.assertNotEqual(packet.id, 0)
+        self.assertEqual(self.interface.packet_queue.peek().packet.id, packet.id)
+
+    def test_packet_queued_after_failed_send_returned(self):
+        with patch.object(self.interface, '_writeBytes', side_effect=BrokenPipeError()), \
+                patch.object(self.interface, '_shutdown_and_call_error_handler'):
+            packet = self.interface.sendText('hello', destinationId=0x1234)
+
+        self.assertNotEqual(packet.id, 0)
+        self.assertEqual(self.interface.packet_queue.peek().packet.id, packet.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,358 @@
+import socket
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from meshtastic.protobuf import mesh_pb2, config_pb2, portnums_pb2
+
+from src.persistence.outbound_queue import InMemoryOutboundQueue
+from src.proxy.framing import encode_frame, FrameParser, frame_payload
+from src.tcp_interface import LocalProxyInterface
+from src.tcp_proxy import TcpProxy, _ProxyClient
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def recv_exactly(sock: socket.socket, length: int, timeout=5.0) -> bytes:
+    sock.settimeout(timeout)
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def recv_frames(sock: socket.socket, count: int, timeout=5.0) -> list[bytes]:
+    sock.settimeout(timeout)
+    parser = FrameParser()
+    frames = []
+    while len(frames) < count:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        frames.extend(parser.feed(chunk))
+    return frames
+
+
+def from_radio_frame(**kwargs) -> bytes:
+    return encode_frame(mesh_pb2.FromRadio(**kwargs).SerializeToString())
+
+
+def to_radio_frame(**kwargs) -> bytes:
+    return encode_frame(mesh_pb2.ToRadio(**kwargs).SerializeToString())
+
+
+class TestTcpProxy(unittest.TestCase):
+    def setUp(self):
+        # a fake radio for the proxy to connect to
+        self.radio_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.radio_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.radio_server.bind(('127.0.0.1', 0))
+        self.radio_server.listen(5)
+        self.radio_server.settimeout(5.0)
+
+        self.proxy = TcpProxy(target_host='127.0.0.1', target_port=self.radio_server.getsockname()[1],
+                              listen_host='127.0.0.1', listen_port=0)
+        self.proxy.start()
+        self.accept_radio()
+
+        self.clients = []
+
+    def tearDown(self):
+        self.proxy.stop()
+        self.proxy.thread.join(timeout=5)
+        for sock in self.clients + [self.radio, self.radio_server]:
+            sock.close()
+
+    def accept_radio(self):
+        self.radio, _ = self.radio_server.accept()
+        self.assertTrue(wait_for(lambda: self.proxy.get_status()['connected']))
+        # the proxy asks for the config as soon as it connects
+        want_config = mesh_pb2.ToRadio.FromString(frame_payload(recv_frames(self.radio, 1)[0]))
+        self.config_id = want_config.want_config_id
+        self.assertTrue(self.config_id)
+
+    def send_config(self, nodes=(0x11111111, 0x22222222)):
+        self.radio.sendall(b''.join([
+            from_radio_frame(my_info=mesh_pb2.MyNodeInfo(my_node_num=nodes[0])),
+            from_radio_frame(config=config_pb2.Config(lora=config_pb2.Config.LoRaConfig(hop_limit=3))),
+            *[from_radio_frame(node_info=mesh_pb2.NodeInfo(num=num, user=mesh_pb2.User(id=f"!{num:08x}")))
+              for num in nodes],
+            from_radio_frame(config_complete_id=self.config_id),
+        ]))
+        self.assertTrue(wait_for(lambda: self.proxy.state_cache.complete))
+
+    def connect_client(self) -> socket.socket:
+        client = socket.create_connection(('127.0.0.1', self.proxy.listen_port))
+        self.clients.append(client)
+        self.assertTrue(wait_for(lambda: len(self.proxy.clients) == len(self.clients)))
+        return client
+
+    def test_broadcast_to_all_clients(self):
+        client1 = self.connect_client()
+        client2 = self.connect_client()
+
+        frame = encode_frame(b'hello clients')
+        self.radio.sendall(frame)
+
+        self.assertEqual(recv_exactly(client1, len(frame)), frame)
+        self.assertEqual(recv_exactly(client2, len(frame)), frame)
+
+    def test_partial_frames_held_until_complete(self):
+        client = self.connect_client()
+        frame = encode_frame(b'split across two reads')
+
+        self.radio.sendall(b'debug log line\n' + frame[:6])
+        time.sleep(0.1)
+        self.radio.sendall(frame[6:])
+
+        # the log output is skipped and the frame arrives whole
+        self.assertEqual(recv_exactly(client, len(frame)), frame)
+
+    def test_client_data_forwarded_to_target(self):
+        client = self.connect_client()
+        frame = encode_frame(b'to the radio')
+        client.sendall(bytes([0xC3] * 32) + frame)
+
+        self.assertEqual(recv_exactly(self.radio, len(frame)), frame)
+
+    def test_client_writes_not_interleaved(self):
+        client1 = self.connect_client()
+        client2 = self.connect_client()
+        frame1 = encode_frame(b'a' * 100)
+        frame2 = encode_frame(b'b' * 100)
+
+        # each client sends half a frame, then the other half
+        client1.sendall(frame1[:50])
+        client2.sendall(frame2[:50])
+        time.sleep(0.1)
+        client1.sendall(frame1[50:])
+        client2.sendall(frame2[50:])
+
+        received = recv_exactly(self.radio, len(frame1) + len(frame2))
+        self.assertIn(received, (frame1 + frame2, frame2 + frame1))
+
+    def test_reconnects_when_target_closes(self):
+        client = self.connect_client()
+        self.radio.close()
+
+        self.accept_radio()
+
+        frame = encode_frame(b'back again')
+        self.radio.sendall(frame)
+        self.assertEqual(recv_exactly(client, len(frame)), frame)
+
+    def test_config_served_from_cache(self):
+        self.send_config()
+        client = self.connect_client()
+        client.sendall(bytes([0xC3] * 32) + to_radio_frame(want_config_id=1234))
+
+        frames = [mesh_pb2.FromRadio.FromString(frame_payload(f)) for f in recv_frames(client, 5)]
+        variants = [f.WhichOneof('payload_variant') for f in frames]
+        self.assertEqual(variants, ['my_info', 'node_info', 'config', 'node_info', 'config_complete_id'])
+        self.assertEqual(frames[-1].config_complete_id, 1234)
+
+        # the request was not passed on to the radio
+        self.radio.settimeout(0.2)
+        with self.assertRaises(socket.timeout):
+            self.radio.recv(1024)
+
+    def test_config_request_waits_for_cache(self):
+        client = self.connect_client()
+        client.sendall(to_radio_frame(want_config_id=99))
+        time.sleep(0.1)
+        self.send_config()
+
+        frames = recv_frames(client, 5)
+        self.assertEqual(mesh_pb2.FromRadio.FromString(frame_payload(frames[-1])).config_complete_id, 99)
+
+    def test_own_config_download_not_broadcast(self):
+        client = self.connect_client()
+        self.send_config()
+        packet_frame = from_radio_frame(packet=mesh_pb2.MeshPacket(id=42))
+        self.radio.sendall(packet_frame)
+
+        # the first thing the client sees is the packet, not the proxy's config download
+        self.assertEqual(recv_frames(client, 1), [packet_frame])
+
+    def test_status(self):
+        self.connect_client()
+        self.send_config()
+        status = self.proxy.get_status()
+        self.assertTrue(status['connected'])
+        self.assertEqual(status['clients'], 1)
+        self.assertEqual(status['cached_nodes'], 2)
+        metrics = status['metrics']
+        self.assertEqual(metrics['reconnects'], 0)
+        self.assertEqual(metrics['config_downloads']['count'], 1)
+        self.assertGreater(metrics['radio_in_frames_total'], 0)
+        self.assertEqual(metrics['radio_out_frames_total'], 1)  # the proxy's own want_config
+
+    def test_wait_until_listening(self):
+        self.assertTrue(self.proxy.wait_until_listening(timeout=1))
+
+    def attach_local(self):
+        local = self.proxy.attach_local_client('test')
+        self.assertTrue(wait_for(lambda: local in self.proxy.clients))
+        return local
+
+    def test_local_client_receives_frames(self):
+        local = self.attach_local()
+        frames = [encode_frame(b'one'), encode_frame(b'two')]
+        self.radio.sendall(b''.join(frames))
+
+        # runs of frames are split back into one frame each
+        self.assertEqual([bytes(local.get_frame(timeout=5)) for _ in frames], frames)
+        self.assertEqual(local.queued_bytes, 0)
+
+    def test_local_client_sends_frames(self):
+        local = self.attach_local()
+        frame = encode_frame(b'to the radio')
+        local.send(bytes([0xC3] * 32) + frame)
+
+        self.assertEqual(recv_exactly(self.radio, len(frame)), frame)
+
+    def test_local_client_config_from_cache(self):
+        self.send_config()
+        local = self.attach_local()
+        local.send(to_radio_frame(want_config_id=77))
+
+        frames = [mesh_pb2.FromRadio.FromString(frame_payload(local.get_frame(timeout=5))) for _ in range(5)]
+        self.assertEqual(frames[-1].config_complete_id, 77)
+
+    def test_local_client_detach(self):
+        local = self.attach_local()
+        self.proxy.detach_local_client(local)
+
+        self.assertIsNone(local.get_frame(timeout=5))
+        self.assertTrue(local.closed)
+        self.assertNotIn(local, self.proxy.clients)
+        with self.assertRaises(ConnectionError):
+            local.send(encode_frame(b'too late'))
+
+    def test_local_proxy_interface(self):
+        self.send_config()
+
+        interface = LocalProxyInterface(self.proxy)
+        try:
+            self.assertEqual(interface.myInfo.my_node_num, 0x11111111)
+            self.assertIn(0x22222222, interface.nodesByNum)
+
+            interface.sendText("hello mesh")
+            to_radio = mesh_pb2.ToRadio.FromString(frame_payload(recv_frames(self.radio, 1)[0]))
+            self.assertEqual(to_radio.packet.decoded.payload, b'hello mesh')
+        finally:
+            interface.close()
+        self.assertTrue(wait_for(lambda: not self.proxy.clients))
+
+    def test_local_proxy_interface_replays_queued_packets(self):
+        self.send_config()
+        queue = InMemoryOutboundQueue()
+        for text in ('first', 'second'):
+            packet = mesh_pb2.MeshPacket()
+            packet.decoded.portnum = portnums_pb2.PortNum.TEXT_MESSAGE_APP
+            packet.decoded.payload = text.encode()
+            queue.put(packet, '!22222222')
+
+        with patch.object(LocalProxyInterface, 'REPLAY_INTERVAL', 0.2):
+            interface = LocalProxyInterface(self.proxy, packet_queue=queue)
+            try:
+                # sent while the backlog is replaying, so it goes out after it
+                interface.sendText("third", destinationId='!22222222')
+                self.radio.settimeout(5)
+                parser = FrameParser()
+                payloads = []
+                while len(payloads) < 3:
+                    for frame in parser.feed(self.radio.recv(65536)):
+                        to_radio = mesh_pb2.ToRadio.FromString(frame_payload(frame))
+                        if to_radio.HasField('packet'):
+                            payloads.append(to_radio.packet.decoded.payload)
+            finally:
+                interface.close()
+
+        self.assertEqual(payloads, [b'first', b'second', b'third'])
+        self.assertTrue(queue.empty())
+
+    def test_reconnect_counted(self):
+        self.radio.close()
+        self.accept_radio()
+        self.assertTrue(wait_for(lambda: self.proxy.metrics.reconnects == 1))
+        self.assertGreater(self.proxy.metrics.downtime_secs(time.monotonic()), 0)
+
+
+class TestTcpProxySlowClients(unittest.TestCase):
+    def setUp(self):
+        self.proxy = TcpProxy(target_host='127.0.0.1', client_high_water=4096, client_low_water=1024)
+        self.proxy._selector = Mock()
+
+        self.fast_client, self.fast_peer = self.make_client()
+        self.slow_client, self.slow_peer = self.make_client()
+
+    def tearDown(self):
+        for sock in (self.fast_client.sock, self.fast_peer, self.slow_client.sock, self.slow_peer):
+            sock.close()
+
+    def make_client(self):
+        proxy_side, peer = socket.socketpair()
+        proxy_side.setblocking(False)
+        client = _ProxyClient(proxy_side, ('127.0.0.1', proxy_side.fileno()))
+        self.proxy.clients.append(client)
+        return client, peer
+
+    def fill_slow_client(self):
+        # broadcast until the slow client's socket buffers fill and its queue hits the high water mark
+        chunk = encode_frame(b'x' * 500)
+        for _ in range(10000):
+            self.proxy._broadcast([chunk])
+            self.fast_peer.setblocking(False)
+            try:
+                while self.fast_peer.recv(65536):
+                    pass
+            except BlockingIOError:
+                pass
+            if self.slow_client.dropping or self.slow_client.closed:
+                return
+        self.fail("Slow client never hit the high water mark")
+
+    def test_drop_policy_drops_data_for_slow_client_only(self):
+        self.fill_slow_client()
+
+        self.assertTrue(self.slow_client.dropping)
+        self.assertGreater(self.slow_client.dropped_bytes, 0)
+        self.assertLessEqual(self.slow_client.queued_bytes, self.proxy.client_high_water)
+        self.assertFalse(self.fast_client.dropping)
+        self.assertEqual(self.fast_client.queued_bytes, 0)
+        self.assertIn(self.slow_client, self.proxy.clients)
+
+    def test_disconnect_policy_evicts_slow_client(self):
+        self.proxy.slow_client_policy = 'disconnect'
+        self.fill_slow_client()
+
+        self.assertTrue(self.slow_client.closed)
+        self.assertNotIn(self.slow_client, self.proxy.clients)
+        self.assertIn(self.fast_client, self.proxy.clients)
+
+    def test_client_lag_reported(self):
+        self.fill_slow_client()
+
+        lag = {entry['addr']: entry for entry in self.proxy.get_client_lag()}
+        slow_lag = lag[f"127.0.0.1:{self.slow_client.sock.fileno()}"]
+        self.assertGreater(slow_lag['queued_bytes'], 0)
+        self.assertGreater(slow_lag['dropped_bytes'], 0)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            TcpProxy(target_host='127.0.0.1', slow_client_policy='ignore')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import time
+import unittest
+
+from src.traceroute_manager import TracerouteManager, TraceStatus
+
+
+class TestTracerouteManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = TracerouteManager(request_ttl=60, max_in_flight=2, cache_ttl=300)
+
+    def test_start_and_complete(self):
+        status, cached = self.manager.request('!target01', '!asker001')
+        self.assertEqual(status, TraceStatus.STARTED)
+        self.assertIsNone(cached)
+        self.assertTrue(self.manager.is_pending('!target01'))
+
+        pending = self.manager.complete('!target01', [1, 2], [2, 1])
+        self.assertEqual(pending.requesters, ['!asker001'])
+        self.assertFalse(self.manager.is_pending('!target01'))
+
+    def test_identical_requests_coalesce(self):
+        self.manager.request('!target01', '!asker001')
+        status, _ = self.manager.request('!target01', '!asker002')
+        self.assertEqual(status, TraceStatus.JOINED)
+
+        pending = self.manager.complete('!target01', [], [])
+        self.assertEqual(pending.requesters, ['!asker001', '!asker002'])
+        self.assertEqual(self.manager.stats.started, 1)
+
+    def test_in_flight_cap(self):
+        self.manager.request('!target01', '!asker001')
+        self.manager.request('!target02', '!asker001')
+        status, _ = self.manager.request('!target03', '!asker001')
+        self.assertEqual(status, TraceStatus.BUSY)
+
+        self.manager.failed('!target01')
+        status, _ = self.manager.request('!target03', '!asker001')
+        self.assertEqual(status, TraceStatus.STARTED)
+
+    def test_repeat_answered_from_cache(self):
+        self.manager.request('!target01', '!asker001')
+        self.manager.complete('!target01', [1, 2], [3])
+
+        status, cached = self.manager.request('!target01', '!asker002')
+        self.assertEqual(status, TraceStatus.CACHED)
+        self.assertEqual(cached.route, [1, 2])
+        self.assertEqual(cached.route_back, [3])
+
+    def test_cache_expires(self):
+        self.manager.request('!target01', '!asker001')
+        self.manager.complete('!target01', [1], [])
+
+        self.manager.expire(time.monotonic() + 301)
+        status, _ = self.manager.request('!target01', '!asker001')
+        self.assertEqual(status, TraceStatus.STARTED)
+
+    def test_unanswered_requests_expire(self):
+        self.manager.request('!target01', '!asker001')
+        self.assertEqual(self.manager.expire(), [])
+
+        expired = self.manager.expire(time.monotonic() + 61)
+        self.assertEqual([pending.target_id for pending in expired], ['!target01'])
+        self.assertFalse(self.manager.is_pending('!target01'))
+        self.assertEqual(self.manager.stats.expired, 1)
+        # an answer arriving after it was given up on is ignored
+        self.assertIsNone(self.manager.complete('!target01', [], []))
+
+    def test_not_busy_after_ttl(self):
+        self.manager.request('!target01', '!asker001')
+        self.manager.request('!target02', '!asker001')
+        later = time.monotonic() + 61
+
+        # no expire() sweep yet, but the stale traces no longer count against the cap
+        status, _ = self.manager.request('!target03', '!asker002', now=later)
+        self.assertEqual(status, TraceStatus.STARTED)
+        self.assertEqual(self.manager.stats.in_flight, 1)
+
+        # their requesters are still told at the next sweep
+        expired = self.manager.expire(later)
+        self.assertEqual(sorted(pending.target_id for pending in expired), ['!target01', '!target02'])
+        self.assertEqual(self.manager.expire(later), [])
+
+    def test_stale_trace_requesters_carried_over(self):
+        self.manager.request('!target01', '!asker001')
+        status, _ = self.manager.request('!target01', '!asker002', now=time.monotonic() + 61)
+        self.assertEqual(status, TraceStatus.STARTED)
+        self.assertEqual(self.manager.stats.expired, 1)
+
+        pending = self.manager.complete('!target01', [], [])
+        self.assertEqual(pending.requesters, ['!asker001', '!asker002'])
+        self.assertEqual(self.manager.expire(time.monotonic() + 61), [])
+
+    def test_failure_matched_by_packet_id(self):
+        self.manager.request('!target01', '!asker001')
+        self.manager.sent('!target01', 1234)
+
+        self.assertEqual(self.manager.target_for(1234), '!target01')
+        self.assertIsNone(self.manager.target_for(5678))
+
+    def test_hop_limit(self):
+        self.assertEqual(TracerouteManager.hop_limit_for(1), 2)
+        self.assertEqual(TracerouteManager.hop_limit_for(6), 7)
+        self.assertEqual(TracerouteManager.hop_limit_for(9), 7)
+
+    def test_hop_limit_when_distance_unknown(self):
+        self.assertEqual(TracerouteManager.hop_limit_for(None), 7)
+        self.assertEqual(TracerouteManager.hop_limit_for(-3), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import threading
+import time
+import unittest
+
+from src.airtime import AirtimeBudget
+from src.transmit_scheduler import Priority, TokenBucket, TransmitScheduler
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2.0, burst=2)
+        now = time.monotonic()
+        for _ in range(2):
+            self.assertEqual(bucket.wait_time(now), 0)
+            bucket.take(now)
+
+        self.assertAlmostEqual(bucket.wait_time(now), 0.5, places=2)
+        self.assertEqual(bucket.wait_time(now + 0.5), 0)
+
+    def test_never_more_than_burst(self):
+        bucket = TokenBucket(rate=10.0, burst=1)
+        bucket.wait_time(time.monotonic() + 100)
+        self.assertEqual(bucket.tokens, 1)
+
+
+class TestTransmitScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TransmitScheduler(rate=20.0, burst=1)
+        self.sent = []
+        self.done = threading.Event()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def send(self, name: str, last=False):
+        def _send():
+            self.sent.append((name, time.monotonic()))
+            if last:
+                self.done.set()
+        return _send
+
+    def test_priority_order(self):
+        # queue everything before the thread starts, so it all competes for the first slot
+        self.scheduler.submit(self.send('report'), Priority.SCHEDULED_REPORT)
+        self.scheduler.submit(self.send('reply 1'))
+        self.scheduler.submit(self.send('admin'), Priority.ADMIN)
+        self.scheduler.submit(self.send('reply 2'))
+        self.scheduler.submit(self.send('last', last=True), Priority.SCHEDULED_REPORT)
+        self.scheduler.start()
+
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual([name for name, _ in self.sent], ['admin', 'reply 1', 'reply 2', 'report', 'last'])
+
+    def test_submit_does_not_wait_for_pacing(self):
+        self.scheduler.start()
+        start = time.monotonic()
+        for i in range(5):
+            self.scheduler.submit(self.send(str(i), last=i == 4))
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        self.assertTrue(self.done.wait(5))
+        times = [t for _, t in self.sent]
+        # 20/s with no burst: at least 50ms apart, give or take timer slop
+        self.assertGreaterEqual(times[-1] - times[0], 4 * 0.045)
+
+    def test_failed_send_does_not_stop_the_scheduler(self):
+        def fail():
+            raise OSError("radio gone")
+
+        self.scheduler.start()
+        self.scheduler.submit(fail)
+        self.scheduler.submit(self.send('after', last=True))
+
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.scheduler.failed, 1)
+        self.assertEqual(self.scheduler.sent, 1)
+
+
+class TestTransmitSchedulerBudget(unittest.TestCase):
+    def setUp(self):
+        # 1 second of airtime a second, so it ages out quickly
+        self.budget = AirtimeBudget(duty_cycle=1.0, window=1.0)
+        self.scheduler = TransmitScheduler(rate=100.0, burst=10, budget=self.budget)
+        self.sent = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def send(self, name: str, airtime: float):
+        def _send():
+            self.sent.append(name)
+            self.budget.record(airtime)
+        return _send
+
+    def submit(self, name: str, airtime: float, priority=Priority.COMMAND_REPLY):
+        self.scheduler.submit(self.send(name, airtime), priority, name, airtime)
+
+    def test_replies_held_until_budget_frees_up(self):
+        self.budget.record(0.9)
+        self.submit('reply', 0.5)
+        start = time.monotonic()
+        self.scheduler.start()
+
+        while not self.sent and time.monotonic() - start < 5:
+            time.sleep(0.01)
+        self.assertEqual(self.sent, ['reply'])
+        self.assertGreater(time.monotonic() - start, 0.8)
+
+    def test_reports_dropped_over_their_share(self):
+        self.budget.record(0.5)
+        self.submit('report', 0.4, Priority.SCHEDULED_REPORT)
+        self.submit('reply', 0.4)
+        self.scheduler.start()
+
+        deadline = time.monotonic() + 5
+        while not self.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.sent, ['reply'])
+        self.assertEqual(self.scheduler.dropped, 1)
+
+    def test_too_big_for_budget_dropped(self):
+        self.submit('huge', 2.0)
+        self.submit('small', 0.1, Priority.SCHEDULED_REPORT)
+        self.scheduler.start()
+
+        deadline = time.monotonic() + 5
+        while not self.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.sent, ['small'])
+        self.assertEqual(self.scheduler.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()